@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Mide el tiempo de arranque de la aplicación por etapas.
+
+Cada medición se hace en un intérprete nuevo (los módulos importados en una
+corrida no benefician a la siguiente) y se informa la mediana de varias
+repeticiones:
+
+    - importar interfaz.py (todo lo necesario antes de mostrar la ventana)
+    - verificar las dependencias como lo hace main.py
+    - indexar el mosaico sin manifiesto y con el manifiesto ya guardado
+    - primer cuadro de la ventana (sólo si hay pantalla disponible)
+    - primer panorama 360° (incluye las importaciones diferidas y el mapeo
+      de las teselas que toca el cálculo)
+
+Uso:
+    python benchmarks/bench_arranque.py [--datos datos] [--repeticiones 5]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRELUDIO = "import sys, time; sys.path.insert(0, {raiz!r})\n{preparacion}\ninicio = time.perf_counter()\n"
+FINAL = "\nprint(time.perf_counter() - inicio)"
+
+# Código medido por etapa; la preparación (antes de iniciar el reloj) se
+# indica en PREPARACION
+ETAPAS = {
+    'importar interfaz': "import interfaz",
+    'verificar dependencias': "main.verificar_dependencias()",
+    'indexar mosaico': "MosaicoDEM({datos!r})",
+    'primer cuadro': ("import tkinter as tk\n"
+                      "from interfaz import InterfazHorizonte\n"
+                      "root = tk.Tk(); app = InterfazHorizonte(root); root.update()"),
+    'primer panorama 360°': ("from horizonte import cargar_mosaico, calcular_horizonte_360\n"
+                             "m, t, b = cargar_mosaico({datos!r})\n"
+                             "calcular_horizonte_360(-1.2544, -78.6269, m, t, b)"),
+}
+
+PREPARACION = {
+    'verificar dependencias': "import main",
+    'indexar mosaico': "from mosaico import MosaicoDEM",
+}
+
+
+def medir(codigo, repeticiones, antes=None, preparacion='', **formato):
+    """Mediana en segundos de ejecutar el código en intérpretes nuevos"""
+    programa = PRELUDIO.format(raiz=RAIZ, preparacion=preparacion) + codigo.format(**formato) + FINAL
+    tiempos = []
+    for _ in range(repeticiones):
+        if antes is not None:
+            antes()
+        salida = subprocess.run([sys.executable, '-c', programa], capture_output=True, text=True, cwd=RAIZ)
+        if salida.returncode != 0:
+            return None
+        tiempos.append(float(salida.stdout.strip().splitlines()[-1]))
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de arranque por etapas")
+    parser.add_argument('--datos', default=os.path.join(RAIZ, 'datos'), help="Directorio con las teselas .hgt")
+    parser.add_argument('--repeticiones', type=int, default=5, help="Repeticiones por etapa")
+    args = parser.parse_args()
+
+    # Copia del directorio con enlaces simbólicos para medir el manifiesto sin tocar datos/
+    directorio = tempfile.mkdtemp(prefix='bench_arranque_')
+    try:
+        for nombre in os.listdir(args.datos):
+            if nombre.lower().endswith('.hgt'):
+                os.symlink(os.path.abspath(os.path.join(args.datos, nombre)), os.path.join(directorio, nombre))
+        manifiesto = os.path.join(directorio, '.manifiesto_teselas.json')
+
+        def sin_manifiesto():
+            if os.path.exists(manifiesto):
+                os.remove(manifiesto)
+
+        resultados = []
+        for nombre, codigo in ETAPAS.items():
+            preparacion = PREPARACION.get(nombre, '')
+            if nombre == 'indexar mosaico':
+                resultados.append(('indexar mosaico (sin manifiesto)',
+                                   medir(codigo, args.repeticiones, sin_manifiesto, preparacion, datos=directorio)))
+                resultados.append(('indexar mosaico (con manifiesto)',
+                                   medir(codigo, args.repeticiones, None, preparacion, datos=directorio)))
+            else:
+                resultados.append((nombre, medir(codigo, args.repeticiones, None, preparacion, datos=directorio)))
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    for nombre, segundos in resultados:
+        valor = "no disponible" if segundos is None else f"{segundos * 1000:8.1f} ms"
+        print(f"{nombre:<36}{valor}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
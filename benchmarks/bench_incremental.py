@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compara PanoramaIncremental con calcular_panorama desde cero.
+
+Escenarios (360 azimuts, 200 pasos):
+
+    - barrido de distancia_max (mismo observador)
+    - barrido de altura del observador
+    - seguimiento de una ruta: observadores cada --espaciado metros
+
+Para cada uno informa el tiempo medio por panorama de ambos métodos y el
+error del ángulo del horizonte respecto al cálculo completo.
+
+Uso:
+    python benchmarks/bench_incremental.py [--datos datos] [--espaciado 30]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from horizonte import cargar_mosaico, calcular_panorama
+from incremental import PanoramaIncremental
+
+LAT, LON = -1.2544, -78.6269  # Ambato
+
+# Paso de la grilla de distancias con los valores por defecto (100 km, 200 pasos)
+PASO = (100000 - 100) / 199
+
+
+def medir(consultas, fuente):
+    """Tiempo medio (ms) de cada método y error (máximo, percentil 99) en grados"""
+    mosaico, transform, bounds = fuente
+    incremental = PanoramaIncremental(mosaico, transform, bounds)
+    calcular_panorama(LAT, LON, mosaico, transform, bounds)  # calentamiento
+
+    inicio = time.perf_counter()
+    exactos = [calcular_panorama(lat, lon, mosaico, transform, bounds, distancia_max=distancia,
+                                 pasos=int(round((distancia - 100) / incremental.paso)) + 1,
+                                 altura_observador=altura)
+               for lat, lon, distancia, altura in consultas]
+    t_completo = (time.perf_counter() - inicio) / len(consultas)
+
+    inicio = time.perf_counter()
+    aproximados = [incremental.calcular(lat, lon, distancia_max=distancia, altura_observador=altura)
+                   for lat, lon, distancia, altura in consultas]
+    t_incremental = (time.perf_counter() - inicio) / len(consultas)
+
+    errores = np.concatenate([np.abs(a.angulos - e.angulos) for a, e in zip(aproximados, exactos)])
+    return t_completo * 1000, t_incremental * 1000, errores.max(), np.percentile(errores, 99), \
+        incremental.estadisticas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Panorama incremental frente a cálculo completo")
+    parser.add_argument('--datos', default=os.path.join(RAIZ, 'datos'), help="Directorio con las teselas .hgt")
+    parser.add_argument('--espaciado', type=float, default=30.0, help="Metros entre puntos de la ruta")
+    parser.add_argument('--puntos', type=int, default=100, help="Puntos de la ruta")
+    args = parser.parse_args()
+    fuente = cargar_mosaico(args.datos)
+
+    # Las distancias caen en la grilla de PASO para comparar igual con igual
+    escenarios = {
+        'distancia_max': [(LAT, LON, 100 + PASO * (199 - k), 0.0) for k in range(0, 100, 5)]
+                         + [(LAT, LON, 100 + PASO * (199 + 5 * k), 0.0) for k in range(1, 11)],
+        'altura': [(LAT, LON, 100000, float(h)) for h in range(0, 200, 10)],
+        'ruta': [(LAT + k * args.espaciado / 111320.0 * math.cos(0.5),
+                  LON + k * args.espaciado / 111320.0 * math.sin(0.5), 100000, 2.0)
+                 for k in range(args.puntos)],
+    }
+    print(f"{'escenario':<16}{'completo':>12}{'incremental':>14}{'aceleración':>13}{'error máx':>11}{'error p99':>11}")
+    for nombre, consultas in escenarios.items():
+        t_completo, t_incremental, maximo, p99, estadisticas = medir(consultas, fuente)
+        print(f"{nombre:<16}{t_completo:>9.2f} ms{t_incremental:>11.2f} ms{t_completo / t_incremental:>12.1f}x"
+              f"{maximo:>10.3f}°{p99:>10.3f}°  {estadisticas}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Compara la precisión y el costo de los modos de muestreo del panorama.
+
+La referencia es un muestreo denso (un cuarto de celda) en dos versiones: con
+la celda más cercana (la lectura del modo uniforme) y con interpolación
+bilineal (la del modo adaptativo). Contra la referencia de su misma lectura el
+error de un modo mide sólo lo que su muestreo se salta; contra la otra incluye
+además la diferencia entre ambas lecturas del terreno. Para cada modo se
+informa el error medio y máximo del ángulo del horizonte contra las dos
+referencias, las muestras leídas por dirección y el tiempo de cálculo.
+
+Uso:
+    python benchmarks/bench_muestreo.py [--datos datos] [--azimuts 360]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from horizonte import (cargar_mosaico, calcular_panorama, elevacion_observador, puntos_en_rayos,
+                       muestrear_elevaciones, tabla_caida, distancias_adaptativas,
+                       RADIO_TIERRA, CANDIDATOS_REFINAMIENTO, PUNTOS_REFINAMIENTO)
+
+OBSERVADORES = {
+    'Ambato': (-1.2544, -78.6269),
+    'Chimborazo (ladera)': (-1.5100, -78.8800),
+    'Guayaquil': (-2.1894, -79.8891),
+}
+
+
+def referencia_densa(lat, lon, mosaico, transform, bounds, azimuts, distancia_max, interpolacion='cercano'):
+    """Ángulos del horizonte con pasos de un cuarto de celda ('cercano' o 'bilineal')"""
+    celda = np.radians(mosaico.resolucion) * RADIO_TIERRA
+    distancias = np.arange(100.0, distancia_max, celda / 4)
+    caida = tabla_caida(distancias)
+    alt_observador = elevacion_observador(lat, lon, mosaico, transform, bounds)
+    angulos = np.empty(len(azimuts))
+    bloque = max(1, (1 << 20) // len(distancias))
+    for inicio in range(0, len(azimuts), bloque):
+        lats, lons = puntos_en_rayos(lat, lon, azimuts[inicio:inicio + bloque], distancias)
+        alturas = muestrear_elevaciones(lats, lons, mosaico, transform, interpolacion=interpolacion)
+        pendientes = (alturas - caida - alt_observador) / distancias
+        angulos[inicio:inicio + bloque] = np.degrees(np.arctan(np.nanmax(pendientes, axis=1)))
+    return angulos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precisión y costo de los modos de muestreo")
+    parser.add_argument('--datos', default='datos', help="Directorio con las teselas .hgt")
+    parser.add_argument('--azimuts', type=int, default=360, help="Direcciones por panorama")
+    parser.add_argument('--distancia', type=float, default=100, help="Distancia máxima en km")
+    args = parser.parse_args()
+
+    mosaico, transform, bounds = cargar_mosaico(args.datos)
+    distancia_max = args.distancia * 1000
+    n_adaptativo = (len(distancias_adaptativas(distancia_max, mosaico.resolucion))
+                    + CANDIDATOS_REFINAMIENTO * PUNTOS_REFINAMIENTO)
+    modos = [
+        ('uniforme 200', {'pasos': 200}, 200),
+        ('uniforme 1000', {'pasos': 1000}, 1000),
+        ('adaptativo', {'adaptativo': True}, n_adaptativo),
+    ]
+
+    print(f"{'':<47}{'── cercano ──':>22}{'── bilineal ──':>22}")
+    print(f"{'observador':<22}{'modo':<16}{'muestras':>9}{'err. medio':>12}{'err. máx':>10}"
+          f"{'err. medio':>12}{'err. máx':>10}{'tiempo':>9}")
+    for nombre, (lat, lon) in OBSERVADORES.items():
+        azimuts = np.linspace(0, 360, args.azimuts, endpoint=False)
+        referencias = [referencia_densa(lat, lon, mosaico, transform, bounds, azimuts, distancia_max, interpolacion)
+                       for interpolacion in ('cercano', 'bilineal')]
+        for modo, opciones, muestras in modos:
+            inicio = time.perf_counter()
+            panorama = calcular_panorama(lat, lon, mosaico, transform, bounds, pasos_azimut=args.azimuts,
+                                         distancia_max=distancia_max, **opciones)
+            transcurrido = time.perf_counter() - inicio
+            errores = ''.join(f"{np.mean(error):>11.4f}°{np.max(error):>9.3f}°" for error in
+                              (np.abs(panorama.angulos - referencia) for referencia in referencias))
+            print(f"{nombre:<22}{modo:<16}{muestras:>9}{errores}{transcurrido:>8.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Compara la proyección local del observador con el geodésico en los rayos.
+
+Para 360 azimuts x 200 pasos informa:
+
+    - error de posición frente al geodésico exacto en cada muestra
+      (nodos=None) de la interpolación entre nodos (por defecto) y de la
+      proyección local, a 100 y 300 km y a varias latitudes
+    - tiempo de puntos_en_rayos y de calcular_panorama con cada método, y la
+      diferencia del ángulo del horizonte, sobre las teselas de ejemplo
+
+Uso:
+    python benchmarks/bench_proyeccion.py [--datos datos] [--repeticiones 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from horizonte import (ajustar_proyeccion_local, cargar_mosaico, calcular_panorama, obtener_geodesico,
+                       puntos_en_rayos)
+
+LAT, LON = -1.2544, -78.6269  # Ambato
+AZIMUTS = np.linspace(0, 360, 360, endpoint=False)
+
+
+def error_posicion(lat, lon, distancia_max, **opciones):
+    """Distancia en metros (máxima, percentil 99) a las posiciones exactas"""
+    distancias = np.linspace(100, distancia_max, 200)
+    lats_e, lons_e = puntos_en_rayos(lat, lon, AZIMUTS, distancias, nodos=None)
+    lats, lons = puntos_en_rayos(lat, lon, AZIMUTS, distancias, **opciones)
+    _, _, errores = obtener_geodesico().inv(lons_e.ravel(), lats_e.ravel(), lons.ravel(), lats.ravel())
+    return errores.max(), np.percentile(errores, 99)
+
+
+def cronometrar(funcion, repeticiones):
+    """Tiempo medio en ms"""
+    funcion()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proyección local frente a geodésico por rayo")
+    parser.add_argument('--datos', default=os.path.join(RAIZ, 'datos'), help="Directorio con las teselas .hgt")
+    parser.add_argument('--repeticiones', type=int, default=20, help="Repeticiones de cada medición")
+    args = parser.parse_args()
+
+    print("Error de posición frente al geodésico exacto (máximo / p99, metros)")
+    print(f"{'latitud':>8}{'distancia':>11}{'nodos':>22}{'proyección local':>22}")
+    for lat in (LAT, 45.0, 70.0):
+        for distancia_max in (100000, 300000):
+            nodos = error_posicion(lat, LON, distancia_max)
+            local = error_posicion(lat, LON, distancia_max, local=True)
+            print(f"{lat:>8.2f}{distancia_max / 1000:>8.0f} km{nodos[0]:>12.3f} /{nodos[1]:>7.3f}"
+                  f"{local[0]:>12.3f} /{local[1]:>7.3f}")
+
+    distancias = np.linspace(100, 100000, 200)
+    t_nodos = cronometrar(lambda: puntos_en_rayos(LAT, LON, AZIMUTS, distancias), args.repeticiones)
+    t_local = cronometrar(lambda: puntos_en_rayos(LAT, LON, AZIMUTS, distancias, local=True), args.repeticiones)
+    # Observador nuevo en cada llamada: incluye el ajuste de la proyección
+    desplazamientos = iter(np.arange(1, 10 ** 6) * 1e-6)
+    t_ajuste = cronometrar(lambda: puntos_en_rayos(LAT + next(desplazamientos), LON, AZIMUTS, distancias,
+                                                   local=True), args.repeticiones)
+    print("\npuntos_en_rayos (360 x 200)")
+    print(f"  geodésico con nodos        {t_nodos:8.3f} ms")
+    print(f"  proyección local en caché  {t_local:8.3f} ms  ({t_nodos / t_local:.1f}x)")
+    print(f"  proyección local nueva     {t_ajuste:8.3f} ms  ({t_nodos / t_ajuste:.1f}x)")
+
+    mosaico, transform, bounds = cargar_mosaico(args.datos)
+    t_geodesico = cronometrar(lambda: calcular_panorama(LAT, LON, mosaico, transform, bounds), args.repeticiones)
+    t_proyeccion = cronometrar(lambda: calcular_panorama(LAT, LON, mosaico, transform, bounds,
+                                                         proyeccion_local=True), args.repeticiones)
+    exacto = calcular_panorama(LAT, LON, mosaico, transform, bounds)
+    local = calcular_panorama(LAT, LON, mosaico, transform, bounds, proyeccion_local=True)
+    diferencia = np.abs(exacto.angulos - local.angulos)
+    print("\ncalcular_panorama (360 x 200, 100 km)")
+    print(f"  geodésico con nodos        {t_geodesico:8.3f} ms")
+    print(f"  proyección local           {t_proyeccion:8.3f} ms  ({t_geodesico / t_proyeccion:.1f}x)")
+    print(f"  diferencia del horizonte   máx {diferencia.max():.4f}°  media {diferencia.mean():.5f}°")
+    print(f"  proyecciones en caché      {ajustar_proyeccion_local.cache_info().currsize}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
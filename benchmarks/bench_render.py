@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Mide el render de panoramas a PNG sin interfaz (render.py).
+
+Calcula los panoramas de unos observadores reproducibles sobre las teselas de
+ejemplo y los dibuja en lote, separando el tiempo del dibujo en el arreglo
+RGBA y el de la escritura del PNG. Con --matplotlib compara además con una
+figura de matplotlib por imagen (backend Agg).
+
+Uso:
+    python benchmarks/bench_render.py [--datos datos] [--imagenes 500] [--ancho 720 --alto 240]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from horizonte import cargar_mosaico, calcular_panorama
+from render import RenderizadorPanorama, escribir_png
+
+
+def figura_matplotlib(panorama, ruta, ancho, alto):
+    """Una figura por imagen, como haría un script con pyplot"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    figura, ejes = plt.subplots(figsize=(ancho / 100, alto / 100), dpi=100)
+    ejes.fill_between(panorama.azimuts, panorama.angulos, -5, color='#5f7350')
+    ejes.plot(panorama.azimuts, panorama.angulos, color='#191e19', linewidth=1)
+    ejes.set_xlim(0, 360)
+    figura.savefig(ruta)
+    plt.close(figura)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render de panoramas a PNG en lote")
+    parser.add_argument('--datos', default=os.path.join(RAIZ, 'datos'), help="Directorio con las teselas .hgt")
+    parser.add_argument('--observadores', type=int, default=20, help="Panoramas distintos")
+    parser.add_argument('--imagenes', type=int, default=500, help="Imágenes a dibujar")
+    parser.add_argument('--ancho', type=int, default=720, help="Ancho en píxeles")
+    parser.add_argument('--alto', type=int, default=240, help="Alto en píxeles")
+    parser.add_argument('--matplotlib', action='store_true', help="Comparar con una figura de matplotlib por imagen")
+    args = parser.parse_args()
+
+    mosaico, transform, bounds = cargar_mosaico(args.datos)
+    generador = np.random.default_rng(1)
+    panoramas = [calcular_panorama(generador.uniform(-2.5, -0.5), generador.uniform(-79.5, -78.0),
+                                   mosaico, transform, bounds)
+                 for _ in range(args.observadores)]
+    renderizador = RenderizadorPanorama(args.ancho, args.alto, distancia_max=100000)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        inicio = time.perf_counter()
+        imagenes = [renderizador.renderizar(p.azimuts, p.angulos, p.distancias, p.elevaciones)
+                    for p in (panoramas[i % len(panoramas)] for i in range(args.imagenes))]
+        t_dibujo = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for i, imagen in enumerate(imagenes):
+            escribir_png(os.path.join(directorio, f"{i}.png"), imagen)
+        t_png = time.perf_counter() - inicio
+        tamano = np.mean([os.path.getsize(os.path.join(directorio, f"{i}.png")) for i in range(len(imagenes))])
+
+        print(f"{args.imagenes} imágenes de {args.ancho}x{args.alto}")
+        print(f"  dibujo   {t_dibujo / args.imagenes * 1000:7.2f} ms/imagen")
+        print(f"  PNG      {t_png / args.imagenes * 1000:7.2f} ms/imagen  ({tamano / 1024:.1f} KiB)")
+        print(f"  total    {args.imagenes / (t_dibujo + t_png):7.1f} imágenes/s")
+
+        if args.matplotlib:
+            cantidad = min(args.imagenes, 50)
+            inicio = time.perf_counter()
+            for i in range(cantidad):
+                figura_matplotlib(panoramas[i % len(panoramas)], os.path.join(directorio, f"m{i}.png"),
+                                  args.ancho, args.alto)
+            print(f"  matplotlib {cantidad / (time.perf_counter() - inicio):5.1f} imágenes/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
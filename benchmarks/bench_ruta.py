@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Compara el modo ruta (ruta.calcular_ruta) con calcular_horizonte_360 punto a punto.
+
+Remuestrea una ruta de ejemplo al este de Ambato cada --espaciado metros y
+calcula todos sus puntos de ambas formas en el proceso actual. Informa el
+tiempo por punto, la aceleración y el error del ángulo del horizonte del modo
+ruta respecto al cálculo completo de cada punto.
+
+Uso:
+    python benchmarks/bench_ruta.py [--datos datos] [--espaciado 25] [--trabajadores 0]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from horizonte import cargar_mosaico, calcular_horizonte_360
+from ruta import calcular_ruta, remuestrear_ruta
+
+# Ambato -> Pelileo -> Baños
+VERTICES = [(-1.2544, -78.6269), (-1.3300, -78.5430), (-1.3960, -78.4240)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Modo ruta frente a calcular_horizonte_360 punto a punto")
+    parser.add_argument('--datos', default=os.path.join(RAIZ, 'datos'), help="Directorio con las teselas .hgt")
+    parser.add_argument('--espaciado', type=float, default=25.0, help="Metros entre puntos de la ruta")
+    parser.add_argument('--puntos', type=int, default=400, help="Puntos de la ruta a calcular")
+    parser.add_argument('--trabajadores', type=int, default=0, help="Procesos del modo ruta (0 = en proceso)")
+    args = parser.parse_args()
+
+    lats, lons, _ = remuestrear_ruta(VERTICES, args.espaciado)
+    lats, lons = lats[:args.puntos], lons[:args.puntos]
+    puntos = [{'nombre': str(i), 'lat': float(lat), 'lon': float(lon), 'altura': 2.0}
+              for i, (lat, lon) in enumerate(zip(lats, lons))]
+
+    mosaico, transform, bounds = cargar_mosaico(args.datos)
+    calcular_horizonte_360(lats[0], lons[0], mosaico, transform, bounds)  # calentamiento
+    inicio = time.perf_counter()
+    exactos = [calcular_horizonte_360(p['lat'], p['lon'], mosaico, transform, bounds, altura_observador=2.0)[1]
+               for p in puntos]
+    t_punto = (time.perf_counter() - inicio) / len(puntos)
+
+    inicio = time.perf_counter()
+    resultados = sorted(calcular_ruta(puntos, directorio=args.datos, trabajadores=args.trabajadores),
+                        key=lambda resultado: resultado[0]['indice'])
+    t_ruta = (time.perf_counter() - inicio) / len(puntos)
+
+    errores = np.concatenate([np.abs(panorama.angulos - exacto)
+                              for (_, panorama, _), exacto in zip(resultados, exactos)])
+    print(f"{len(puntos)} puntos cada {args.espaciado:g} m")
+    print(f"punto a punto  {t_punto * 1000:8.2f} ms/punto")
+    print(f"modo ruta      {t_ruta * 1000:8.2f} ms/punto  ({t_punto / t_ruta:.1f}x)")
+    print(f"error          máx {errores.max():.3f}°  p99 {np.percentile(errores, 99):.3f}°  "
+          f"medio {errores.mean():.4f}°")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga del servidor de horizontes, enteramente en localhost.
+
+Levanta servidor.ServidorHorizonte en un puerto libre dentro del mismo
+proceso y lo consulta con clientes HTTP/1.1 concurrentes (keep-alive):
+
+    - frío: observadores distintos, todos calculados
+    - caché: los mismos observadores otra vez
+    - coalescencia: muchos clientes piden el mismo observador nuevo a la vez
+    - lista: un POST con todos los observadores nuevos
+
+Uso:
+    python benchmarks/bench_servidor.py [--clientes 32] [--observadores 256] [--trabajadores N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from servidor import ServidorHorizonte
+
+
+async def consultar(lector, escritor, metodo, ruta, cuerpo=b''):
+    """Envía una consulta por una conexión abierta y devuelve (estado, JSON)"""
+    escritor.write(f"{metodo} {ruta} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(cuerpo)}\r\n\r\n"
+                   .encode('latin-1') + cuerpo)
+    await escritor.drain()
+    estado = int((await lector.readline()).split()[1])
+    largo = 0
+    while True:
+        linea = await lector.readline()
+        if linea in (b'\r\n', b''):
+            break
+        nombre, _, valor = linea.decode('latin-1').partition(':')
+        if nombre.lower() == 'content-length':
+            largo = int(valor)
+    return estado, json.loads(await lector.readexactly(largo))
+
+
+async def cliente(puerto, rutas, origenes):
+    """Un cliente keep-alive que consulta sus rutas en orden"""
+    lector, escritor = await asyncio.open_connection('127.0.0.1', puerto)
+    try:
+        for ruta in rutas:
+            estado, respuesta = await consultar(lector, escritor, 'GET', ruta)
+            origenes.append(respuesta.get('origen', f'error {estado}'))
+    finally:
+        escritor.close()
+        await escritor.wait_closed()
+
+
+async def ronda(puerto, rutas, clientes):
+    """Reparte las rutas entre los clientes y devuelve (segundos, orígenes)"""
+    origenes = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(puerto, rutas[i::clientes], origenes) for i in range(clientes)))
+    return time.perf_counter() - inicio, origenes
+
+
+def informar(nombre, segundos, origenes):
+    conteo = {origen: origenes.count(origen) for origen in sorted(set(origenes))}
+    print(f"{nombre:<16}{len(origenes):>6} consultas {segundos * 1000:9.1f} ms "
+          f"{len(origenes) / segundos:9.1f} consultas/s  {conteo}")
+
+
+def observadores(cantidad, semilla):
+    """Observadores reproducibles en el área de las teselas de ejemplo (centro del Ecuador)"""
+    generador = np.random.default_rng(semilla)
+    return [(round(generador.uniform(-2.5, -0.5), 5), round(generador.uniform(-79.5, -78.0), 5))
+            for _ in range(cantidad)]
+
+
+async def principal(args):
+    servidor = ServidorHorizonte(args.datos, args.trabajadores)
+    abierto = await servidor.escuchar('127.0.0.1', 0)
+    puerto = abierto.sockets[0].getsockname()[1]
+    try:
+        # Calentamiento: arranca los trabajadores y su geodésico
+        await ronda(puerto, ["/panorama?lat=-1.2544&lon=-78.6269"], 1)
+
+        rutas = [f"/panorama?lat={lat}&lon={lon}" for lat, lon in observadores(args.observadores, 1)]
+        informar('frío', *await ronda(puerto, rutas, args.clientes))
+        informar('caché', *await ronda(puerto, rutas, args.clientes))
+        informar('coalescencia', *await ronda(puerto, ["/panorama?lat=-1.9&lon=-78.9"] * args.clientes,
+                                              args.clientes))
+
+        cuerpo = json.dumps([{'lat': lat, 'lon': lon} for lat, lon in observadores(args.observadores, 2)]).encode()
+        lector, escritor = await asyncio.open_connection('127.0.0.1', puerto)
+        inicio = time.perf_counter()
+        _, respuestas = await consultar(lector, escritor, 'POST', '/panorama', cuerpo)
+        informar('lista (POST)', time.perf_counter() - inicio,
+                 [respuesta.get('origen', 'error') for respuesta in respuestas])
+        _, estado = await consultar(lector, escritor, 'GET', '/estado')
+        escritor.close()
+        await escritor.wait_closed()
+        print(f"estado: {json.dumps(estado)}")
+    finally:
+        abierto.close()
+        await asyncio.sleep(0.01)  # Deja que los manejadores vean el cierre de sus clientes
+        servidor.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor de horizontes")
+    parser.add_argument('--datos', default=os.path.join(RAIZ, 'datos'), help="Directorio con las teselas .hgt")
+    parser.add_argument('--clientes', type=int, default=32, help="Conexiones concurrentes")
+    parser.add_argument('--observadores', type=int, default=256, help="Observadores distintos por ronda")
+    parser.add_argument('--trabajadores', type=int, default=None, help="Procesos del servidor")
+    args = parser.parse_args()
+    asyncio.run(principal(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Suite de rendimiento reproducible de los núcleos del horizonte.
+
+Usa las teselas de datos/ y observadores fijos: Ambato, Quito y Guayaquil
+(los de main.mostrar_informacion_inicial) más una muestra aleatoria con
+semilla fija. Mide:
+
+    - carga de teselas (indexar el mosaico, mapear una tesela, rasterio)
+    - latencia de un perfil (calcular_horizonte)
+    - latencia del panorama 360° a varias resoluciones y modos
+    - rendimiento por lotes (lote.calcular_lote) en el proceso y en paralelo
+    - memoria residente máxima (RSS)
+
+Los resultados se escriben como JSON y, si se indica una base, se comparan
+con ella: cada métrica de tiempo informa la razón actual/base y se marca
+como regresión si empeora más que la tolerancia.
+
+Uso:
+    python benchmarks/suite.py -o resultados.json
+    python benchmarks/suite.py --base base.json --tolerancia 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from horizonte import cargar_mosaico, cargar_elevacion, calcular_horizonte, calcular_panorama, elevacion_observador
+from lote import calcular_lote
+from mosaico import MosaicoDEM
+
+# Observadores de main.mostrar_informacion_inicial
+OBSERVADORES_FIJOS = {
+    'Ambato': (-1.2544, -78.6269),
+    'Quito': (-0.1807, -78.4678),
+    'Guayaquil': (-2.1894, -79.8890),
+}
+
+SEMILLA = 20240601
+
+# (nombre, opciones de calcular_panorama)
+PANORAMAS = [
+    ('90', {'pasos_azimut': 90}),
+    ('360', {'pasos_azimut': 360}),
+    ('1440', {'pasos_azimut': 1440}),
+    ('360_adaptativo', {'pasos_azimut': 360, 'adaptativo': True}),
+    ('360_piramide', {'pasos_azimut': 360, 'piramide': True}),
+]
+
+
+def observadores_aleatorios(mosaico, transform, bounds, cantidad, semilla=SEMILLA):
+    """Puntos uniformes sobre el mosaico con datos de elevación, reproducibles por semilla"""
+    generador = np.random.default_rng(semilla)
+    puntos = []
+    while len(puntos) < cantidad:
+        lat = generador.uniform(mosaico.lat_min + 0.5, mosaico.lat_max - 0.5)
+        lon = generador.uniform(mosaico.lon_min + 0.5, mosaico.lon_max - 0.5)
+        try:
+            elevacion_observador(lat, lon, mosaico, transform, bounds)
+        except Exception:
+            continue
+        puntos.append((round(lat, 5), round(lon, 5)))
+    return puntos
+
+
+def estadisticas(tiempos):
+    """Resumen en milisegundos de una lista de duraciones en segundos"""
+    ms = np.asarray(tiempos) * 1000.0
+    return {
+        'mediana_ms': round(float(np.median(ms)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'min_ms': round(float(ms.min()), 3),
+        'muestras': len(ms),
+    }
+
+
+def cronometrar(funcion, repeticiones):
+    """Ejecuta la función una vez de calentamiento y devuelve las duraciones siguientes"""
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def rss_maximo_mb():
+    """Memoria residente máxima del proceso y de sus hijos terminados (MB)"""
+    escala = 1024.0 if sys.platform != 'darwin' else 1024.0 * 1024.0
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / escala
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / escala
+    return round(propio, 1), round(hijos, 1)
+
+
+def medir_carga(datos, repeticiones):
+    """Tiempo de indexar el mosaico y de mapear y recorrer teselas por primera vez"""
+    resultados = {'indexar_mosaico': estadisticas(cronometrar(lambda: MosaicoDEM(datos), repeticiones))}
+
+    def primera_lectura():
+        mosaico = MosaicoDEM(datos)
+        indice = next(i for i, ruta in enumerate(mosaico._rutas_por_indice) if ruta is not None)
+        return int(mosaico.tesela(indice).max())
+    resultados['mapear_tesela'] = estadisticas(cronometrar(primera_lectura, repeticiones))
+
+    ruta = sorted(MosaicoDEM(datos).rutas.values())[0]
+    resultados['rasterio_tesela'] = estadisticas(cronometrar(lambda: cargar_elevacion(ruta), repeticiones))
+    return resultados
+
+
+def medir_perfiles(fuente, observadores, repeticiones):
+    """Latencia de calcular_horizonte (1000 pasos, 100 km) en 8 azimuts por observador"""
+    mosaico, transform, bounds = fuente
+    tiempos = []
+    for lat, lon in observadores:
+        for azimut in range(0, 360, 45):
+            tiempos += cronometrar(lambda: calcular_horizonte(lat, lon, mosaico, transform, bounds, azimut),
+                                   repeticiones)
+    return estadisticas(tiempos)
+
+
+def medir_panoramas(fuente, observadores, repeticiones):
+    """Latencia del panorama 360° para cada resolución y modo de PANORAMAS"""
+    mosaico, transform, bounds = fuente
+    resultados = {}
+    for nombre, opciones in PANORAMAS:
+        tiempos = []
+        for lat, lon in observadores:
+            tiempos += cronometrar(lambda: calcular_panorama(lat, lon, mosaico, transform, bounds, **opciones),
+                                   repeticiones)
+        resultados[nombre] = estadisticas(tiempos)
+    return resultados
+
+
+def medir_lote(datos, observadores, trabajadores):
+    """Puntos por segundo de calcular_lote (360 azimuts, 200 pasos, 100 km)"""
+    puntos = [{'nombre': str(i), 'lat': lat, 'lon': lon, 'altura': 0.0}
+              for i, (lat, lon) in enumerate(observadores)]
+    inicio = time.perf_counter()
+    errores = sum(error is not None for _, _, error in
+                  calcular_lote(puntos, directorio=datos, trabajadores=trabajadores))
+    transcurrido = time.perf_counter() - inicio
+    return {'puntos': len(puntos), 'errores': errores, 'segundos': round(transcurrido, 3),
+            'puntos_por_segundo': round(len(puntos) / transcurrido, 2)}
+
+
+def metadatos():
+    """Entorno de la corrida, para saber si dos resultados son comparables"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'maquina': platform.machine(),
+        'procesadores': os.cpu_count(),
+        'semilla': SEMILLA,
+    }
+
+
+def metricas_tiempo(resultados, prefijo=''):
+    """Aplana los resultados a {ruta: valor} con las métricas comparables"""
+    planas = {}
+    for clave, valor in resultados.items():
+        ruta = f"{prefijo}{clave}"
+        if isinstance(valor, dict):
+            planas.update(metricas_tiempo(valor, ruta + '.'))
+        elif clave in ('mediana_ms', 'puntos_por_segundo', 'rss_mb'):
+            planas[ruta] = valor
+    return planas
+
+
+def comparar(actual, base, tolerancia):
+    """
+    Compara dos corridas métrica por métrica.
+
+    Returns:
+        list: Tuplas (metrica, base, actual, razon, regresion); para
+              puntos_por_segundo mayor es mejor, para el resto menor es mejor
+    """
+    filas = []
+    planas_base = metricas_tiempo(base['resultados'])
+    for metrica, valor in metricas_tiempo(actual['resultados']).items():
+        anterior = planas_base.get(metrica)
+        if not anterior or not valor:
+            continue
+        razon = valor / anterior
+        mayor_es_mejor = metrica.endswith('puntos_por_segundo')
+        regresion = razon < 1.0 / (1.0 + tolerancia) if mayor_es_mejor else razon > 1.0 + tolerancia
+        filas.append((metrica, anterior, valor, razon, regresion))
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de rendimiento de los núcleos del horizonte")
+    parser.add_argument('-o', '--salida', help="Archivo JSON de resultados")
+    parser.add_argument('--base', help="Resultados JSON anteriores con los que comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.10,
+                        help="Empeoramiento relativo que se considera regresión (0.10 = 10%%)")
+    parser.add_argument('--datos', default=os.path.join(RAIZ, 'datos'), help="Directorio con las teselas .hgt")
+    parser.add_argument('--aleatorios', type=int, default=12, help="Observadores aleatorios adicionales")
+    parser.add_argument('--lote', type=int, default=64, help="Observadores del lote")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Repeticiones por medición")
+    parser.add_argument('--trabajadores', type=int, default=None, help="Procesos para el lote paralelo")
+    args = parser.parse_args()
+
+    fuente = cargar_mosaico(args.datos)
+    observadores = list(OBSERVADORES_FIJOS.values()) + observadores_aleatorios(*fuente, args.aleatorios)
+    lote = observadores_aleatorios(*fuente, args.lote, semilla=SEMILLA + 1)
+
+    resultados = {}
+    etapas = [
+        ('carga', lambda: medir_carga(args.datos, args.repeticiones)),
+        ('perfil', lambda: medir_perfiles(fuente, list(OBSERVADORES_FIJOS.values()), args.repeticiones)),
+        ('panorama', lambda: medir_panoramas(fuente, observadores, args.repeticiones)),
+        ('lote_en_proceso', lambda: medir_lote(args.datos, lote, 0)),
+        ('lote_paralelo', lambda: medir_lote(args.datos, lote, args.trabajadores)),
+    ]
+    for nombre, etapa in etapas:
+        print(f"  {nombre}...", file=sys.stderr)
+        resultados[nombre] = etapa()
+    propio, hijos = rss_maximo_mb()
+    resultados['memoria'] = {'proceso': {'rss_mb': propio}, 'trabajadores': {'rss_mb': hijos}}
+
+    corrida = {'meta': metadatos(), 'observadores': observadores, 'resultados': resultados}
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(corrida, archivo, indent=2, ensure_ascii=False)
+
+    regresiones = 0
+    if args.base:
+        with open(args.base, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        print(f"{'métrica':<46}{'base':>12}{'actual':>12}{'razón':>8}")
+        for metrica, anterior, valor, razon, regresion in comparar(corrida, base, args.tolerancia):
+            marca = '  REGRESIÓN' if regresion else ''
+            print(f"{metrica:<46}{anterior:>12.3f}{valor:>12.3f}{razon:>8.2f}{marca}")
+            regresiones += regresion
+        print(f"{regresiones} regresiones (tolerancia {args.tolerancia:.0%})")
+    else:
+        for metrica, valor in metricas_tiempo(resultados).items():
+            print(f"{metrica:<46}{valor:>12.3f}")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Caché persistente de panoramas de horizonte.
+
+Combina un LRU en memoria con un directorio opcional en disco. La clave
+incluye la celda del DEM donde está el observador (las coordenadas se
+ajustan al centro de esa celda antes de calcular), la resolución azimutal y
+de distancia, la distancia máxima, las opciones del modelo y una huella de
+las teselas que alcanza el cálculo, de modo que reemplazar un archivo de
+datos/ invalida las entradas afectadas.
+"""
+
+import hashlib
+import math
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from horizonte import calcular_panorama, Panorama, COEFICIENTE_REFRACCION
+from instrumentacion import instrumentacion
+from mosaico import MosaicoDEM
+
+# Metros por grado de latitud (aproximado, suficiente para acotar ventanas)
+METROS_POR_GRADO = 111320.0
+
+
+class CacheHorizonte:
+    """
+    Caché LRU en memoria y en disco para resultados de calcular_panorama.
+
+    Los contadores aciertos, aciertos_disco, fallos y desalojos se pueden
+    consultar con estadisticas().
+    """
+
+    def __init__(self, directorio=None, capacidad=256):
+        """
+        Args:
+            directorio (str): Directorio para la caché en disco (None = sólo memoria)
+            capacidad (int): Número máximo de panoramas en memoria
+        """
+        self.directorio = directorio
+        self.capacidad = capacidad
+        self._memoria = OrderedDict()
+        # (matriz, huella) de la última matriz en memoria resumida: retiene una sola
+        self._huella_arreglo = None
+        self.aciertos = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.desalojos = 0
+        if directorio is not None:
+            os.makedirs(directorio, exist_ok=True)
+
+    def estadisticas(self):
+        """Devuelve los contadores de la caché como diccionario"""
+        return {
+            'aciertos': self.aciertos,
+            'aciertos_disco': self.aciertos_disco,
+            'fallos': self.fallos,
+            'desalojos': self.desalojos,
+            'entradas': len(self._memoria),
+        }
+
+    def limpiar(self):
+        """Vacía la caché en memoria (la caché en disco se conserva)"""
+        self._memoria.clear()
+
+    def _huella(self, lat, lon, elevacion, distancia_max):
+        """Huella de los datos de elevación que puede tocar el cálculo"""
+        if isinstance(elevacion, MosaicoDEM):
+            margen_lat = distancia_max / METROS_POR_GRADO
+            margen_lon = margen_lat / max(math.cos(math.radians(lat)), 1e-6)
+            return elevacion.huella(lat - margen_lat, lat + margen_lat,
+                                    lon - margen_lon, lon + margen_lon)
+
+        # Matriz en memoria: se resume su contenido una vez mientras siga siendo la misma
+        if self._huella_arreglo is None or self._huella_arreglo[0] is not elevacion:
+            resumen = hashlib.blake2b(np.ascontiguousarray(elevacion).view(np.uint8), digest_size=16)
+            self._huella_arreglo = (elevacion, resumen.hexdigest())
+        return self._huella_arreglo[1]
+
+    def _celda(self, lat, lon, elevacion, transform):
+        """Devuelve (fila, columna, lat, lon) del centro de la celda del observador"""
+        if isinstance(elevacion, MosaicoDEM):
+            return elevacion.centro_celda(lat, lon)
+        columna, fila = ~transform * (lon, lat)
+        fila, columna = int(math.floor(fila)), int(math.floor(columna))
+        lon_centro, lat_centro = transform * (columna + 0.5, fila + 0.5)
+        return fila, columna, lat_centro, lon_centro
+
+    def _ruta(self, clave):
+        """Ruta del archivo de disco correspondiente a una clave"""
+        nombre = hashlib.sha1(repr(clave).encode()).hexdigest()
+        return os.path.join(self.directorio, nombre + '.npz')
+
+    def _recordar(self, clave, panorama):
+        """Guarda en memoria respetando la capacidad"""
+        for arreglo in panorama:
+            arreglo.flags.writeable = False
+        self._memoria[clave] = panorama
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.capacidad:
+            self._memoria.popitem(last=False)
+            self.desalojos += 1
+
+    def clave(self, lat, lon, elevacion, transform, pasos_azimut=360, pasos=200, distancia_max=100000,
+              altura_observador=0.0, curvatura=True, refraccion=COEFICIENTE_REFRACCION, piramide=False,
+              adaptativo=False, proyeccion_local=False):
+        """
+        Clave de caché de un cálculo y centro de la celda del observador.
+
+        Returns:
+            tuple: (clave, lat_centro, lon_centro); el panorama de la clave es
+                   el calculado desde (lat_centro, lon_centro)
+        """
+        fila, columna, lat_centro, lon_centro = self._celda(lat, lon, elevacion, transform)
+        clave = (fila, columna, int(pasos_azimut), 0 if piramide or adaptativo else int(pasos),
+                 float(distancia_max), float(altura_observador), bool(curvatura),
+                 float(refraccion) if curvatura else 0.0, bool(piramide), bool(adaptativo), bool(proyeccion_local),
+                 self._huella(lat_centro, lon_centro, elevacion, distancia_max))
+        return clave, lat_centro, lon_centro
+
+    def buscar(self, clave):
+        """
+        Busca un panorama en memoria y luego en disco.
+
+        Returns:
+            Panorama: Resultado guardado, o None si no está (cuenta como fallo)
+        """
+        panorama = self._memoria.get(clave)
+        if panorama is not None:
+            self._memoria.move_to_end(clave)
+            self.aciertos += 1
+            instrumentacion.contar('cache_aciertos')
+            return panorama
+
+        if self.directorio is not None:
+            ruta = self._ruta(clave)
+            if os.path.exists(ruta):
+                try:
+                    with np.load(ruta) as datos:
+                        panorama = Panorama(*(datos[campo] for campo in Panorama._fields))
+                except Exception:
+                    instrumentacion.contar('excepciones_silenciadas')
+                    panorama = None
+                if panorama is not None:
+                    self.aciertos_disco += 1
+                    instrumentacion.contar('cache_aciertos_disco')
+                    self._recordar(clave, panorama)
+                    return panorama
+
+        self.fallos += 1
+        instrumentacion.contar('cache_fallos')
+        return None
+
+    def guardar(self, clave, panorama):
+        """Guarda un panorama calculado en memoria y, si hay directorio, en disco"""
+        self._recordar(clave, panorama)
+        if self.directorio is not None:
+            try:
+                # Escritura atómica: un lector concurrente nunca ve un archivo a medias
+                temporal = self._ruta(clave) + f'.{os.getpid()}.tmp'
+                with open(temporal, 'wb') as archivo:
+                    np.savez(archivo, **panorama._asdict())
+                os.replace(temporal, self._ruta(clave))
+            except Exception:
+                # La caché en disco es opcional; el resultado ya está en memoria
+                instrumentacion.contar('excepciones_silenciadas')
+
+    def calcular_panorama(self, lat, lon, elevacion, transform, bounds, pasos_azimut=360, pasos=200,
+                          distancia_max=100000, altura_observador=0.0, curvatura=True,
+                          refraccion=COEFICIENTE_REFRACCION, piramide=False, adaptativo=False,
+                          proyeccion_local=False):
+        """
+        Igual que horizonte.calcular_panorama pero consultando primero la caché.
+
+        El observador se ajusta al centro de su celda del DEM, así que todas las
+        coordenadas de una misma celda comparten resultado.
+
+        Returns:
+            Panorama: Resultado (los arreglos devueltos no deben modificarse)
+        """
+        clave, lat_centro, lon_centro = self.clave(lat, lon, elevacion, transform, pasos_azimut, pasos,
+                                                   distancia_max, altura_observador, curvatura, refraccion,
+                                                   piramide, adaptativo, proyeccion_local)
+        panorama = self.buscar(clave)
+        if panorama is not None:
+            return panorama
+
+        panorama = calcular_panorama(lat_centro, lon_centro, elevacion, transform, bounds,
+                                     pasos_azimut=pasos_azimut, pasos=pasos, distancia_max=distancia_max,
+                                     altura_observador=altura_observador, curvatura=curvatura,
+                                     refraccion=refraccion, piramide=piramide, adaptativo=adaptativo,
+                                     proyeccion_local=proyeccion_local)
+        self.guardar(clave, panorama)
+        return panorama
+
+    def calcular_horizonte_360(self, lat, lon, elevacion, transform, bounds, pasos_azimut=360,
+                               distancia_max=100000, altura_observador=0.0, curvatura=True,
+                               refraccion=COEFICIENTE_REFRACCION, adaptativo=False, proyeccion_local=False):
+        """
+        Igual que horizonte.calcular_horizonte_360 pero consultando primero la caché.
+
+        Returns:
+            tuple: (azimuts, angulos_horizonte) arreglos con los azimuts y ángulos máximos
+        """
+        panorama = self.calcular_panorama(lat, lon, elevacion, transform, bounds,
+                                          pasos_azimut=pasos_azimut, pasos=200,
+                                          distancia_max=distancia_max,
+                                          altura_observador=altura_observador,
+                                          curvatura=curvatura, refraccion=refraccion,
+                                          adaptativo=adaptativo, proyeccion_local=proyeccion_local)
+        return panorama.azimuts, panorama.angulos
@@ -0,0 +1,148 @@
+"""
+Cuenca visual (viewshed) desde un observador sobre el mosaico de teselas.
+
+En lugar de trazar un rayo por cada celda objetivo, se trazan rayos desde el
+observador hacia cada celda del perímetro de la ventana de cálculo; con esa
+densidad todas las celdas interiores quedan atravesadas por al menos un
+rayo. A lo largo de cada rayo se mantiene el máximo acumulado de la tangente
+del ángulo de elevación (igual que en el motor del horizonte) y una celda es
+visible si su ángulo alcanza ese máximo.
+
+La geometría se resuelve en el plano local del observador (equirectangular
+con la escala de su latitud), con la misma corrección de curvatura y
+refracción que horizonte.calcular_panorama.
+"""
+
+import math
+
+import numpy as np
+
+from horizonte import tabla_caida, RADIO_TIERRA, COEFICIENTE_REFRACCION, MUESTRAS_POR_BLOQUE
+from mosaico import MosaicoDEM
+
+# Valores del raster de visibilidad
+NO_VISIBLE = 0
+VISIBLE = 1
+SIN_DATOS = 255
+
+
+def _perimetro(radio_filas, radio_columnas):
+    """Desplazamientos (fila, columna) de todas las celdas del borde de la ventana"""
+    columnas = np.arange(-radio_columnas, radio_columnas + 1)
+    filas = np.arange(-radio_filas + 1, radio_filas)
+    df = np.concatenate([np.full(len(columnas), -radio_filas), np.full(len(columnas), radio_filas),
+                         filas, filas])
+    dc = np.concatenate([columnas, columnas,
+                         np.full(len(filas), -radio_columnas), np.full(len(filas), radio_columnas)])
+    return df, dc
+
+
+def calcular_cuenca_visual(lat, lon, mosaico, distancia_max=100000, altura_observador=0.0,
+                           altura_objetivo=0.0, curvatura=True, refraccion=COEFICIENTE_REFRACCION):
+    """
+    Calcula qué celdas del mosaico son visibles desde un observador.
+
+    Args:
+        lat (float): Latitud del observador
+        lon (float): Longitud del observador
+        mosaico (MosaicoDEM): Mosaico de teselas
+        distancia_max (float): Radio de cálculo en metros
+        altura_observador (float): Altura del observador sobre el terreno
+        altura_objetivo (float): Altura sobre el terreno del punto que se quiere ver
+        curvatura (bool): Corregir por curvatura terrestre y refracción
+        refraccion (float): Coeficiente de refracción atmosférica
+
+    Returns:
+        tuple: (visibilidad, transform) donde visibilidad es un raster uint8
+               (VISIBLE, NO_VISIBLE o SIN_DATOS fuera del radio o sin datos)
+               y transform es la transformación afín de la ventana
+    """
+    if not isinstance(mosaico, MosaicoDEM):
+        raise ValueError("La cuenca visual requiere un mosaico de teselas")
+
+    fila0, columna0, lat0, _ = mosaico.centro_celda(lat, lon)
+    celda_y = math.radians(mosaico.resolucion) * RADIO_TIERRA
+    celda_x = celda_y * math.cos(math.radians(lat0))
+    radio_filas = int(math.ceil(distancia_max / celda_y))
+    radio_columnas = int(math.ceil(distancia_max / celda_x))
+
+    # Elevaciones de la ventana completa en una sola lectura del mosaico
+    filas = np.arange(fila0 - radio_filas, fila0 + radio_filas + 1)
+    columnas = np.arange(columna0 - radio_columnas, columna0 + radio_columnas + 1)
+    ventana = mosaico.leer(filas[:, None], columnas[None, :]).astype(np.float32)
+    alto, ancho = ventana.shape
+
+    z_observador = ventana[radio_filas, radio_columnas]
+    if np.isnan(z_observador):
+        raise ValueError("Las coordenadas del observador están fuera del rango de datos disponibles")
+    z_observador = float(z_observador) + altura_observador
+
+    visibilidad = np.zeros(alto * ancho, dtype=np.uint8)
+    visibilidad[radio_filas * ancho + radio_columnas] = VISIBLE
+
+    df, dc = _perimetro(radio_filas, radio_columnas)
+    longitudes = np.maximum(np.abs(df), np.abs(dc))
+    pasos = np.arange(1, longitudes.max() + 1)
+    tamano_bloque = max(1, MUESTRAS_POR_BLOQUE // len(pasos))
+
+    for inicio in range(0, len(df), tamano_bloque):
+        bloque = slice(inicio, inicio + tamano_bloque)
+        fraccion = pasos[None, :] / longitudes[bloque, None]
+        validos = fraccion <= 1.0
+        rf = np.rint(df[bloque, None] * fraccion).astype(np.int64)
+        rc = np.rint(dc[bloque, None] * fraccion).astype(np.int64)
+        rf[~validos] = 0
+        rc[~validos] = 0
+
+        indices = (rf + radio_filas) * ancho + (rc + radio_columnas)
+        z = ventana.ravel()[indices]
+        distancias = np.hypot(rf * celda_y, rc * celda_x)
+        distancias[~validos] = 1.0
+        caida = tabla_caida(distancias, curvatura, refraccion)
+
+        tangentes = (z - caida - z_observador) / distancias
+        tangentes[np.isnan(tangentes) | ~validos] = -np.inf
+
+        # Máximo del terreno anterior a cada muestra del rayo
+        maximo_previo = np.maximum.accumulate(tangentes, axis=1)
+        maximo_previo = np.concatenate([np.full((len(maximo_previo), 1), -np.inf),
+                                        maximo_previo[:, :-1]], axis=1)
+
+        tangentes_objetivo = (z + altura_objetivo - caida - z_observador) / distancias
+        visibles = validos & (tangentes_objetivo >= maximo_previo) & (distancias <= distancia_max)
+        visibilidad[indices[visibles]] = VISIBLE
+
+    visibilidad = visibilidad.reshape(alto, ancho)
+
+    # Fuera del radio o sin datos
+    dy = (np.arange(alto) - radio_filas) * celda_y
+    dx = (np.arange(ancho) - radio_columnas) * celda_x
+    fuera = (dy[:, None] ** 2 + dx[None, :] ** 2) > distancia_max ** 2
+    visibilidad[fuera | np.isnan(ventana)] = SIN_DATOS
+
+    from affine import Affine
+    res = mosaico.resolucion
+    transform = Affine(res, 0.0, mosaico.lon_min + (columnas[0] - 0.5) * res,
+                       0.0, -res, mosaico.lat_max - (filas[0] - 0.5) * res)
+    return visibilidad, transform
+
+
+def guardar_geotiff(ruta, visibilidad, transform):
+    """
+    Guarda un raster de visibilidad como GeoTIFF (EPSG:4326).
+
+    Args:
+        ruta (str): Ruta del archivo .tif
+        visibilidad (numpy.array): Raster uint8 de calcular_cuenca_visual
+        transform (affine.Affine): Transformación de la ventana
+    """
+    import rasterio
+
+    try:
+        with rasterio.open(ruta, 'w', driver='GTiff', height=visibilidad.shape[0],
+                           width=visibilidad.shape[1], count=1, dtype='uint8',
+                           crs='EPSG:4326', transform=transform, nodata=SIN_DATOS,
+                           compress='deflate') as destino:
+            destino.write(visibilidad, 1)
+    except Exception as e:
+        raise Exception(f"Error al guardar el archivo {ruta}: {str(e)}")
@@ -0,0 +1,217 @@
+"""
+Formato binario compacto para resultados de horizonte (.hzn).
+
+Un archivo .hzn tiene una cabecera fija de 64 bytes seguida de registros de
+tamaño fijo, uno por observador:
+
+    Cabecera (little-endian)
+        firma            4 bytes  b'HZN1'
+        version          uint16
+        curvatura        uint16   1 si se corrigió por curvatura/refracción
+        pasos_azimut     uint32   direcciones por panorama
+        registros        uint64   número de registros (se fija al cerrar)
+        distancia_max    float64  metros
+        refraccion       float64  coeficiente k
+        escala_distancia float64  metros por unidad de distancia empaquetada
+
+    Registro
+        indice       uint32            posición del observador en la entrada
+        lat, lon     float64
+        altura       float32           altura del observador sobre el terreno
+        elevacion    float32           elevación del terreno en el observador
+        angulos      float16[n]        ángulo del horizonte por azimut (grados)
+        distancias   uint16[n]         distancia al horizonte / escala
+                                       (SIN_DISTANCIA si no hay datos)
+
+Como los registros tienen tamaño fijo, el lector accede a cualquier
+observador en O(1) mediante np.memmap sin leer el archivo completo.
+"""
+
+import os
+
+import numpy as np
+
+FIRMA = b'HZN1'
+VERSION = 1
+TAMANO_CABECERA = 64
+SIN_DISTANCIA = 0xFFFF
+
+DTYPE_CABECERA = np.dtype([
+    ('firma', 'S4'),
+    ('version', '<u2'),
+    ('curvatura', '<u2'),
+    ('pasos_azimut', '<u4'),
+    ('registros', '<u8'),
+    ('distancia_max', '<f8'),
+    ('refraccion', '<f8'),
+    ('escala_distancia', '<f8'),
+    ('reservado', 'V20'),
+])
+
+
+def dtype_registro(pasos_azimut):
+    """
+    Devuelve el tipo estructurado de un registro para n direcciones.
+
+    Args:
+        pasos_azimut (int): Direcciones por panorama
+
+    Returns:
+        numpy.dtype: Tipo del registro
+    """
+    return np.dtype([
+        ('indice', '<u4'),
+        ('lat', '<f8'),
+        ('lon', '<f8'),
+        ('altura', '<f4'),
+        ('elevacion', '<f4'),
+        ('angulos', '<f2', (pasos_azimut,)),
+        ('distancias', '<u2', (pasos_azimut,)),
+    ])
+
+
+class EscritorHorizontes:
+    """
+    Escritor en flujo de archivos .hzn.
+
+    Cada registro se escribe en cuanto se agrega, así que el lote no necesita
+    conservar los resultados en memoria. El número de registros de la
+    cabecera se actualiza al cerrar.
+    """
+
+    def __init__(self, ruta, pasos_azimut, distancia_max, curvatura=True, refraccion=0.0):
+        self.ruta = ruta
+        self.pasos_azimut = int(pasos_azimut)
+        self.dtype = dtype_registro(self.pasos_azimut)
+        self.escala_distancia = max(float(distancia_max), 1.0) / (SIN_DISTANCIA - 1)
+        self.registros = 0
+
+        self._cabecera = np.zeros(1, dtype=DTYPE_CABECERA)
+        self._cabecera['firma'] = FIRMA
+        self._cabecera['version'] = VERSION
+        self._cabecera['curvatura'] = int(bool(curvatura))
+        self._cabecera['pasos_azimut'] = self.pasos_azimut
+        self._cabecera['distancia_max'] = distancia_max
+        self._cabecera['refraccion'] = refraccion
+        self._cabecera['escala_distancia'] = self.escala_distancia
+
+        try:
+            self._archivo = open(ruta, 'wb')
+            self._archivo.write(self._cabecera.tobytes())
+        except Exception as e:
+            raise Exception(f"Error al crear el archivo {ruta}: {str(e)}")
+
+    def agregar(self, lat, lon, panorama, altura=0.0, elevacion=np.nan, indice=None):
+        """
+        Agrega el panorama de un observador al final del archivo.
+
+        Args:
+            lat (float): Latitud del observador
+            lon (float): Longitud del observador
+            panorama (Panorama): Resultado de calcular_panorama
+            altura (float): Altura del observador sobre el terreno
+            elevacion (float): Elevación del terreno en el observador
+            indice (int): Posición del observador en la entrada (por defecto,
+                          el orden de escritura)
+        """
+        if len(panorama.angulos) != self.pasos_azimut:
+            raise ValueError(f"El panorama tiene {len(panorama.angulos)} azimuts; "
+                             f"el archivo espera {self.pasos_azimut}")
+
+        registro = np.zeros(1, dtype=self.dtype)
+        registro['indice'] = self.registros if indice is None else indice
+        registro['lat'] = lat
+        registro['lon'] = lon
+        registro['altura'] = altura
+        registro['elevacion'] = elevacion
+        registro['angulos'] = panorama.angulos
+
+        distancias = np.asarray(panorama.distancias, dtype=np.float64)
+        empaquetadas = np.full(distancias.shape, SIN_DISTANCIA, dtype=np.uint16)
+        con_datos = np.isfinite(distancias)
+        empaquetadas[con_datos] = np.clip(np.round(distancias[con_datos] / self.escala_distancia),
+                                          0, SIN_DISTANCIA - 1)
+        registro['distancias'] = empaquetadas
+
+        self._archivo.write(registro.tobytes())
+        self.registros += 1
+
+    def close(self):
+        """Escribe el número final de registros y cierra el archivo"""
+        if self._archivo.closed:
+            return
+        self._cabecera['registros'] = self.registros
+        self._archivo.seek(0)
+        self._archivo.write(self._cabecera.tobytes())
+        self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LectorHorizontes:
+    """
+    Lector de archivos .hzn con acceso aleatorio mediante np.memmap.
+
+    El número de registros se deduce del tamaño del archivo, de modo que
+    también puede leerse un archivo que todavía se está escribiendo.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        try:
+            cabecera = np.fromfile(ruta, dtype=DTYPE_CABECERA, count=1)
+        except Exception as e:
+            raise Exception(f"Error al leer el archivo {ruta}: {str(e)}")
+        if len(cabecera) != 1 or cabecera['firma'][0] != FIRMA:
+            raise Exception(f"El archivo {ruta} no es un archivo de horizontes .hzn")
+        if cabecera['version'][0] != VERSION:
+            raise Exception(f"Versión de archivo .hzn no soportada: {cabecera['version'][0]}")
+
+        self.pasos_azimut = int(cabecera['pasos_azimut'][0])
+        self.distancia_max = float(cabecera['distancia_max'][0])
+        self.curvatura = bool(cabecera['curvatura'][0])
+        self.refraccion = float(cabecera['refraccion'][0])
+        self.escala_distancia = float(cabecera['escala_distancia'][0])
+        self.dtype = dtype_registro(self.pasos_azimut)
+        self.azimuts = np.linspace(0, 360, self.pasos_azimut, endpoint=False)
+
+        registros = (os.path.getsize(ruta) - TAMANO_CABECERA) // self.dtype.itemsize
+        if registros > 0:
+            self.registros = np.memmap(ruta, dtype=self.dtype, mode='r',
+                                       offset=TAMANO_CABECERA, shape=(registros,))
+        else:
+            self.registros = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.registros)
+
+    def __getitem__(self, i):
+        """
+        Devuelve el panorama del registro i.
+
+        Returns:
+            dict: indice, lat, lon, altura, elevacion, azimuts, angulos y
+                  distancias (en metros, NaN donde no hubo datos)
+        """
+        registro = self.registros[i]
+        empaquetadas = registro['distancias']
+        distancias = empaquetadas.astype(np.float64) * self.escala_distancia
+        distancias[empaquetadas == SIN_DISTANCIA] = np.nan
+        return {
+            'indice': int(registro['indice']),
+            'lat': float(registro['lat']),
+            'lon': float(registro['lon']),
+            'altura': float(registro['altura']),
+            'elevacion': float(registro['elevacion']),
+            'azimuts': self.azimuts,
+            'angulos': registro['angulos'].astype(np.float32),
+            'distancias': distancias,
+        }
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,218 @@
+"""
+Actualización incremental del panorama 360° para observadores en movimiento.
+
+PanoramaIncremental conserva, para un observador de origen, las posiciones y
+elevaciones del terreno de todas las muestras (azimuts x distancias) y, para
+el último cálculo, el máximo acumulado de la pendiente a lo largo de cada
+rayo. Así, la consulta siguiente sólo lee lo que cambió:
+
+    - Aumentar distancia_max extiende cada rayo desde el extremo anterior.
+    - Reducir distancia_max (mismo observador y modelo) es una consulta al
+      máximo acumulado: no se lee ni se calcula ninguna muestra.
+    - Cambiar la altura del observador, la curvatura o la refracción
+      recalcula las pendientes con las elevaciones guardadas.
+    - Mover el observador traslada las muestras del origen en grados (sin
+      llamar al geodésico) y vuelve a leer sólo las que caen en otra celda
+      del DEM; las demás conservan su elevación. Si cambian de celda más de
+      FRACCION_REBASE de las muestras se reconstruye todo desde el nuevo
+      observador.
+
+Salvo por la traslación, cada muestra queda donde la pondría un cálculo
+desde cero sobre la misma grilla de distancias y lee la misma celda, así que
+el resultado es el de ese cálculo. La traslación en longitud es exacta (una
+rotación alrededor del eje polar conserva geodésicas y azimuts); la de
+latitud desplaza las muestras del orden de desplazamiento x distancia / R,
+menos de un par de metros a 100 km con los desplazamientos que admite
+FRACCION_REBASE (menos de una celda), y sólo cambia el horizonte si eso
+lleva alguna muestra a la celda vecina.
+
+Las distancias forman una grilla de paso fijo (el de linspace(100,
+distancia_max, pasos) de la construcción), de modo que al extender o recortar
+los rayos las muestras existentes siguen siendo válidas; con otra
+distancia_max el resultado es el de calcular_panorama con el mismo paso, no
+con pasos muestras. Sólo se usa el muestreo uniforme con la celda más
+cercana (el de calcular_panorama por defecto), sin poda por bloques: la poda
+depende del observador y dejaría huecos en el terreno reutilizado.
+"""
+
+import math
+
+import numpy as np
+
+from horizonte import (Panorama, COEFICIENTE_REFRACCION, celdas_cercanas, elevacion_observador,
+                       muestrear_elevaciones, puntos_en_rayos, tabla_caida)
+from instrumentacion import instrumentacion
+
+# Si al mover el observador cambia de celda más de esta fracción de las
+# muestras, se reconstruye (releerlas cuesta casi lo mismo que empezar de cero)
+FRACCION_REBASE = 0.75
+
+# Distancia de la primera muestra (igual que calcular_panorama)
+DISTANCIA_MINIMA = 100.0
+
+
+class PanoramaIncremental:
+    """
+    Panorama 360° que se actualiza reutilizando las muestras de cálculos anteriores.
+
+    Los contadores reconstrucciones, extensiones, recortes, desplazamientos
+    y recalculos indican cómo se resolvió cada consulta (ver estadisticas()).
+    """
+
+    def __init__(self, elevacion, transform, bounds, pasos_azimut=360, pasos=200, distancia_max=100000):
+        """
+        Args:
+            elevacion (numpy.array | MosaicoDEM): Matriz de elevaciones o mosaico
+            transform (rasterio.transform): Transformación geográfica
+            bounds (rasterio.coords.BoundingBox): Límites del dataset
+            pasos_azimut (int): Número de direcciones
+            pasos (int): Muestras por dirección para distancia_max (fija el paso)
+            distancia_max (float): Distancia que define el paso de la grilla
+        """
+        self.elevacion = elevacion
+        self.transform = transform
+        self.bounds = bounds
+        self.azimuts = np.linspace(0, 360, pasos_azimut, endpoint=False)
+        self.pasos = pasos
+        self.distancia_grilla = distancia_max
+        self.paso = (distancia_max - DISTANCIA_MINIMA) / (pasos - 1)
+
+        self.origen = None       # (lat, lon) desde donde se muestrearon los rayos
+        self.distancias = None   # Distancias de la grilla desde el origen
+        self.lats = self.lons = self.alturas = None
+        self._celdas = None      # (filas, columnas) que leyeron las muestras del origen
+        self._vigente = None     # Parámetros del último cálculo de pendientes
+        self._muestras = None    # (distancias, lats, lons, alturas) de ese cálculo
+        self._prefijo = None     # Máximo acumulado de la pendiente por rayo
+        self._indice = None      # Columna donde se alcanza ese máximo
+
+        self.reconstrucciones = 0
+        self.extensiones = 0
+        self.recortes = 0
+        self.desplazamientos = 0
+        self.recalculos = 0
+
+    def estadisticas(self):
+        """Devuelve los contadores como diccionario"""
+        return {
+            'reconstrucciones': self.reconstrucciones,
+            'extensiones': self.extensiones,
+            'recortes': self.recortes,
+            'desplazamientos': self.desplazamientos,
+            'recalculos': self.recalculos,
+        }
+
+    def _muestrear(self, lat, lon, distancias):
+        """Posiciones y elevaciones de las muestras de todos los azimuts a esas distancias"""
+        lats, lons = puntos_en_rayos(lat, lon, self.azimuts, distancias)
+        return lats, lons, muestrear_elevaciones(lats, lons, self.elevacion, self.transform)
+
+    def _reconstruir(self, lat, lon, distancia_max):
+        """Muestrea todos los rayos desde un nuevo origen"""
+        self.reconstrucciones += 1
+        instrumentacion.contar('incremental_reconstrucciones')
+        self.origen = (lat, lon)
+        self.distancias = DISTANCIA_MINIMA + self.paso * np.arange(self._cantidad(distancia_max))
+        self.lats, self.lons, self.alturas = self._muestrear(lat, lon, self.distancias)
+        self._celdas = celdas_cercanas(self.lats, self.lons, self.elevacion, self.transform)
+        self._vigente = None
+
+    def _extender(self, distancia_max):
+        """Agrega al final de cada rayo del origen las muestras hasta distancia_max"""
+        self.extensiones += 1
+        instrumentacion.contar('incremental_extensiones')
+        nuevas = DISTANCIA_MINIMA + self.paso * np.arange(len(self.distancias), self._cantidad(distancia_max))
+        lats, lons, alturas = self._muestrear(*self.origen, nuevas)
+        self.distancias = np.concatenate([self.distancias, nuevas])
+        self.lats = np.hstack([self.lats, lats])
+        self.lons = np.hstack([self.lons, lons])
+        self.alturas = np.hstack([self.alturas, alturas])
+        self._celdas = tuple(np.hstack([previas, nuevas]) for previas, nuevas in
+                             zip(self._celdas, celdas_cercanas(lats, lons, self.elevacion, self.transform)))
+        self._vigente = None
+
+    def _cantidad(self, distancia_max):
+        """Muestras de la grilla hasta distancia_max (la última puede quedar un paso antes)"""
+        return max(1, int(math.floor((distancia_max - DISTANCIA_MINIMA) / self.paso + 1e-9)) + 1)
+
+    def _trasladar(self, lat, lon):
+        """
+        Muestras del origen trasladadas al observador (lat, lon).
+
+        Returns:
+            tuple: (lats, lons, cambian) con cambian True en las muestras que
+                   caen en otra celda que desde el origen
+        """
+        lats = self.lats + (lat - self.origen[0])
+        lons = self.lons + (lon - self.origen[1])
+        filas, columnas = celdas_cercanas(lats, lons, self.elevacion, self.transform)
+        return lats, lons, (filas != self._celdas[0]) | (columnas != self._celdas[1])
+
+    def _pendientes(self, alt_observador, curvatura, refraccion, traslado=None):
+        """Calcula pendientes y su máximo acumulado (traslado: resultado de _trasladar)"""
+        lats, lons, alturas = self.lats, self.lons, self.alturas
+        if traslado is not None:
+            self.desplazamientos += 1
+            instrumentacion.contar('incremental_desplazamientos')
+            lats, lons, cambian = traslado
+            alturas = alturas.copy()
+            alturas[cambian] = muestrear_elevaciones(lats[cambian], lons[cambian], self.elevacion, self.transform)
+            instrumentacion.contar('incremental_releidas', np.count_nonzero(cambian))
+        else:
+            self.recalculos += 1
+
+        pendientes = (alturas - tabla_caida(self.distancias, curvatura, refraccion) - alt_observador) / self.distancias
+        pendientes[np.isnan(pendientes)] = -np.inf
+        self._prefijo = np.maximum.accumulate(pendientes, axis=1)
+        columnas = np.broadcast_to(np.arange(pendientes.shape[1]), pendientes.shape)
+        self._indice = np.maximum.accumulate(np.where(pendientes == self._prefijo, columnas, 0), axis=1)
+        self._muestras = (np.broadcast_to(self.distancias, pendientes.shape), lats, lons, alturas)
+
+    def calcular(self, lat, lon, distancia_max=100000, altura_observador=0.0, curvatura=True,
+                 refraccion=COEFICIENTE_REFRACCION):
+        """
+        Panorama 360° del observador, reutilizando lo posible del estado anterior.
+
+        Args:
+            lat (float): Latitud del observador
+            lon (float): Longitud del observador
+            distancia_max (float): Distancia máxima en metros
+            altura_observador (float): Altura del observador sobre el terreno
+            curvatura (bool): Corregir por curvatura terrestre y refracción
+            refraccion (float): Coeficiente de refracción atmosférica
+
+        Returns:
+            Panorama: Igual que calcular_panorama
+        """
+        alt_observador = elevacion_observador(lat, lon, self.elevacion, self.transform,
+                                              self.bounds) + altura_observador
+        cantidad = self._cantidad(distancia_max)
+
+        if self.origen is None:
+            self._reconstruir(lat, lon, distancia_max)
+        if cantidad > len(self.distancias):
+            self._extender(distancia_max)
+
+        vigente = (lat, lon, alt_observador, bool(curvatura), float(refraccion) if curvatura else 0.0)
+        if vigente == self._vigente:
+            self.recortes += 1
+            instrumentacion.contar('incremental_recortes')
+        else:
+            traslado = None
+            if (lat, lon) != self.origen:
+                traslado = self._trasladar(lat, lon)
+                if np.count_nonzero(traslado[2]) > FRACCION_REBASE * traslado[2].size:
+                    self._reconstruir(lat, lon, self.distancias[-1])
+                    traslado = None
+            self._pendientes(alt_observador, curvatura, refraccion, traslado)
+            self._vigente = vigente
+
+        # El horizonte hasta distancia_max es el máximo acumulado en su última columna
+        filas = np.arange(len(self.azimuts))
+        k = self._indice[:, cantidad - 1]
+        maximas = self._prefijo[:, cantidad - 1]
+        con_datos = np.isfinite(maximas)
+        distancias, lats, lons, alturas = (np.where(con_datos, valores[filas, k], np.nan)
+                                           for valores in self._muestras)
+        angulos = np.where(con_datos, np.degrees(np.arctan(maximas)), -90.0)
+        return Panorama(self.azimuts.copy(), angulos, distancias, lats, lons, alturas)
@@ -0,0 +1,186 @@
+"""
+Instrumentación del cálculo del horizonte.
+
+Recolector de tiempos por etapa y contadores (muestras leídas, teselas
+tocadas, aciertos de caché, muestras fuera de los datos, excepciones
+silenciadas) que usan horizonte.py, mosaico.py y cache.py. Está apagado
+por defecto: apagado, etapa() devuelve siempre el mismo contexto vacío y
+contar() retorna de inmediato, así que el costo es una consulta de atributo
+por llamada (las llamadas están por bloque de muestras, no por muestra).
+
+Se enciende con activar() o con la variable de entorno
+HORIZONTE_INSTRUMENTACION=1 (útil para la interfaz gráfica). Los tiempos
+de las etapas son inclusivos: 'panorama' contiene a 'geodesico' (o a
+'proyeccion_local'), 'lectura', etc.
+
+Uso:
+    from instrumentacion import instrumentacion
+    instrumentacion.activar()
+    calcular_panorama(...)
+    print(instrumentacion.formatear())
+"""
+
+import functools
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Contexto reutilizable que devuelve etapa() con la instrumentación apagada
+_NULO = nullcontext()
+
+
+class _Cronometro:
+    """Contexto que suma la duración de una etapa al recolector"""
+
+    __slots__ = ('recolector', 'nombre', 'inicio')
+
+    def __init__(self, recolector, nombre):
+        self.recolector = recolector
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        self.recolector.sumar_tiempo(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+class Instrumentacion:
+    """
+    Recolector de tiempos por etapa y contadores.
+
+    Seguro entre hilos: la interfaz calcula en un hilo de fondo y dibuja en
+    el principal, y ambos registran en el mismo recolector.
+    """
+
+    def __init__(self, activa=False):
+        self.activa = activa
+        self._bloqueo = threading.Lock()
+        self.reiniciar()
+
+    def activar(self):
+        """Empieza a registrar (sin borrar lo acumulado)"""
+        self.activa = True
+
+    def desactivar(self):
+        """Deja de registrar (lo acumulado se conserva hasta reiniciar)"""
+        self.activa = False
+
+    def reiniciar(self):
+        """Borra los tiempos y contadores acumulados"""
+        with self._bloqueo:
+            self._tiempos = {}    # etapa -> [llamadas, segundos]
+            self._contadores = {}
+
+    def etapa(self, nombre):
+        """
+        Contexto que mide una etapa.
+
+        Args:
+            nombre (str): Nombre de la etapa (p. ej. 'geodesico', 'lectura')
+
+        Returns:
+            Contexto para usar con with
+        """
+        if not self.activa:
+            return _NULO
+        return _Cronometro(self, nombre)
+
+    def medir(self, nombre):
+        """
+        Decorador que mide cada llamada de una función como una etapa.
+
+        Args:
+            nombre (str): Nombre de la etapa
+
+        Returns:
+            function: Decorador
+        """
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                if not self.activa:
+                    return funcion(*args, **kwargs)
+                with _Cronometro(self, nombre):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+
+    def sumar_tiempo(self, nombre, segundos, llamadas=1):
+        """Acumula una duración medida fuera de etapa()"""
+        with self._bloqueo:
+            acumulado = self._tiempos.setdefault(nombre, [0, 0.0])
+            acumulado[0] += llamadas
+            acumulado[1] += segundos
+
+    def contar(self, nombre, cantidad=1):
+        """
+        Incrementa un contador si la instrumentación está activa.
+
+        Args:
+            nombre (str): Nombre del contador
+            cantidad (int): Incremento
+        """
+        if not self.activa:
+            return
+        with self._bloqueo:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + int(cantidad)
+
+    def resumen(self):
+        """
+        Devuelve lo acumulado como diccionario.
+
+        Returns:
+            dict: {'etapas': {nombre: {'llamadas', 'total_ms', 'medio_ms'}},
+                   'contadores': {nombre: valor}}
+        """
+        with self._bloqueo:
+            etapas = {
+                nombre: {
+                    'llamadas': llamadas,
+                    'total_ms': round(segundos * 1000.0, 3),
+                    'medio_ms': round(segundos * 1000.0 / llamadas, 3) if llamadas else 0.0,
+                }
+                for nombre, (llamadas, segundos) in self._tiempos.items()
+            }
+            return {'etapas': etapas, 'contadores': dict(self._contadores)}
+
+    def combinar(self, resumen):
+        """
+        Suma un resumen de otro recolector (p. ej. de un proceso trabajador).
+
+        Args:
+            resumen (dict): Resultado de resumen()
+        """
+        for nombre, etapa in resumen['etapas'].items():
+            self.sumar_tiempo(nombre, etapa['total_ms'] / 1000.0, etapa['llamadas'])
+        with self._bloqueo:
+            for nombre, valor in resumen['contadores'].items():
+                self._contadores[nombre] = self._contadores.get(nombre, 0) + valor
+
+    def formatear(self):
+        """Texto de varias líneas con las etapas (de mayor a menor tiempo) y los contadores"""
+        resumen = self.resumen()
+        lineas = [f"{'etapa':<24}{'llamadas':>10}{'total (ms)':>14}{'medio (ms)':>14}"]
+        for nombre, etapa in sorted(resumen['etapas'].items(), key=lambda par: -par[1]['total_ms']):
+            lineas.append(f"{nombre:<24}{etapa['llamadas']:>10}{etapa['total_ms']:>14.1f}{etapa['medio_ms']:>14.3f}")
+        for nombre, valor in sorted(resumen['contadores'].items()):
+            lineas.append(f"{nombre:<24}{valor:>10}")
+        return '\n'.join(lineas)
+
+    def linea_estado(self, etapas=3):
+        """Resumen de una línea para la barra de estado: las etapas más costosas y las muestras leídas"""
+        resumen = self.resumen()
+        mayores = sorted(resumen['etapas'].items(), key=lambda par: -par[1]['total_ms'])[:etapas]
+        partes = [f"{nombre} {etapa['total_ms']:.0f} ms" for nombre, etapa in mayores]
+        muestras = resumen['contadores'].get('muestras')
+        if muestras is not None:
+            partes.append(f"{muestras} muestras")
+        return ", ".join(partes)
+
+
+# Recolector compartido por todo el proceso
+instrumentacion = Instrumentacion(os.environ.get('HORIZONTE_INSTRUMENTACION', '') not in ('', '0'))
@@ -1,10 +1,28 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 import os
-from horizonte import cargar_elevacion, calcular_horizonte, calcular_horizonte_360
+import queue
+import threading
+from horizonte import cargar_elevacion, cargar_mosaico, calcular_horizonte, calcular_panorama
+from mosaico import parsear_nombre_tesela
+from cache import CacheHorizonte
+from instrumentacion import instrumentacion
+from incremental import PanoramaIncremental
+
+# Directorio de la caché persistente de panoramas
+DIRECTORIO_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "proyecto-horizonte")
+
+# Resoluciones azimutales de la vista 360°: primero un esbozo grueso y al final
+# la resolución completa (que es la que pasa por la caché)
+ETAPAS_360 = (24, 72, 360)
+
+# Intervalo (ms) con que la interfaz revisa los resultados del hilo de cálculo
+INTERVALO_SONDEO = 50
+
+# Retardo (ms) tras mostrar la ventana para crear el gráfico; matplotlib es
+# la dependencia más lenta de importar y no hace falta para el primer cuadro
+RETARDO_GRAFICO = 100
 
 class InterfazHorizonte:
     def __init__(self, root):
@@ -17,16 +35,27 @@ class InterfazHorizonte:
         self.transform = None
         self.bounds = None
         self.ruta_archivo = None
+        self.cache = CacheHorizonte(DIRECTORIO_CACHE)
+        self.incremental = None  # PanoramaIncremental de los datos cargados
+        
+        # Cálculo en segundo plano: cada pedido nuevo incrementa la generación
+        # y los resultados de generaciones anteriores se descartan
+        self.generacion = 0
+        self.cola_resultados = queue.Queue()
+        self.bloqueo_calculo = threading.Lock()
+        self.sondeando = False
         
         # Crear la interfaz
         self.crear_interfaz()
         
-        # Intentar cargar un archivo por defecto
-        self.cargar_archivo_por_defecto()
+        # Intentar cargar un archivo por defecto y crear el gráfico una vez
+        # que la ventana ya está visible
+        self.root.after_idle(self.cargar_archivo_por_defecto)
+        self.root.after(RETARDO_GRAFICO, self.crear_grafico)
     
     def crear_interfaz(self):
         # Frame principal
-        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame = self.main_frame = ttk.Frame(self.root, padding="10")
         main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
         # Configurar el grid
@@ -79,6 +108,12 @@ class InterfazHorizonte:
         self.entry_dist.grid(row=1, column=3, padx=5, pady=5)
         self.entry_dist.insert(0, "100")  # 100 km por defecto
         
+        # Altura del observador sobre el terreno
+        ttk.Label(params_frame, text="Altura obs. (m):").grid(row=2, column=0, padx=5, pady=5, sticky="e")
+        self.entry_altura = ttk.Entry(params_frame, width=15)
+        self.entry_altura.grid(row=2, column=1, padx=5, pady=5)
+        self.entry_altura.insert(0, "0")  # A ras del suelo por defecto
+        
         # Botones
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=5, column=0, columnspan=2, pady=10)
@@ -86,17 +121,34 @@ class InterfazHorizonte:
         ttk.Button(button_frame, text="Calcular Horizonte", command=self.calcular_horizonte).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Vista 360°", command=self.calcular_horizonte_360).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Limpiar Gráfico", command=self.limpiar_grafico).pack(side=tk.LEFT, padx=5)
+        self.boton_cancelar = ttk.Button(button_frame, text="Descartar", command=self.cancelar_calculo, state="disabled")
+        self.boton_cancelar.pack(side=tk.LEFT, padx=5)
+        self.progreso = ttk.Progressbar(button_frame, length=150, mode="determinate")
+        self.progreso.pack(side=tk.LEFT, padx=5)
+        self.incremental_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame, text="360° incremental", variable=self.incremental_var).pack(side=tk.LEFT, padx=5)
         
-        # Área de gráfico
-        self.fig, self.ax = plt.subplots(figsize=(10, 6))
-        self.canvas = FigureCanvasTkAgg(self.fig, main_frame)
-        self.canvas.get_tk_widget().grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        # Área de gráfico (se crea en crear_grafico)
+        self.fig = self.ax = self.canvas = None
         
         # Barra de estado
         self.status_var = tk.StringVar()
         self.status_var.set("Listo - Seleccione un archivo .hgt para comenzar")
         ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W).grid(row=7, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
     
+    def crear_grafico(self):
+        """Crea la figura de matplotlib la primera vez que se necesita"""
+        if self.canvas is not None:
+            return
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        
+        self.fig = Figure(figsize=(10, 6))
+        self.ax = self.fig.add_subplot(111)
+        self.canvas = FigureCanvasTkAgg(self.fig, self.main_frame)
+        self.canvas.get_tk_widget().grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        self.canvas.draw()
+    
     def cargar_archivo_por_defecto(self):
         """Intenta cargar un archivo por defecto si existe"""
         rutas_posibles = [
@@ -122,14 +174,22 @@ class InterfazHorizonte:
     def cargar_archivo(self, ruta):
         """Carga el archivo de elevación seleccionado"""
         try:
+            self.cancelar_calculo()
             self.status_var.set("Cargando archivo...")
             self.root.update()
             
-            self.elevacion, self.transform, self.bounds = cargar_elevacion(ruta)
+            # Las teselas SRTM se usan junto con sus vecinas del mismo directorio
+            if parsear_nombre_tesela(os.path.basename(ruta)) is not None:
+                self.elevacion, self.transform, self.bounds = cargar_mosaico(os.path.dirname(ruta) or ".")
+                descripcion = f"mosaico de {len(self.elevacion.rutas)} teselas"
+            else:
+                self.elevacion, self.transform, self.bounds = cargar_elevacion(ruta)
+                descripcion = "archivo único"
             self.ruta_archivo = ruta
-            self.archivo_var.set(os.path.basename(ruta))
+            self.incremental = None
+            self.archivo_var.set(f"{os.path.basename(ruta)} ({descripcion})")
             
-            self.status_var.set(f"Archivo cargado: {os.path.basename(ruta)} - Dimensiones: {self.elevacion.shape}")
+            self.status_var.set(f"Archivo cargado: {os.path.basename(ruta)} ({descripcion}) - Dimensiones: {self.elevacion.shape}")
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar el archivo:\n{str(e)}")
@@ -145,6 +205,7 @@ class InterfazHorizonte:
             lon = float(self.entry_lon.get())
             azimut = float(self.entry_az.get())
             dist_max = float(self.entry_dist.get()) * 1000  # convertir a metros
+            altura = float(self.entry_altura.get())
             
             if not (-90 <= lat <= 90):
                 raise ValueError("La latitud debe estar entre -90 y 90 grados")
@@ -154,8 +215,10 @@ class InterfazHorizonte:
                 raise ValueError("El azimut debe estar entre 0 y 360 grados")
             if dist_max <= 0:
                 raise ValueError("La distancia máxima debe ser mayor que 0")
+            if altura < 0:
+                raise ValueError("La altura del observador no puede ser negativa")
             
-            return lat, lon, azimut, dist_max
+            return lat, lon, azimut, dist_max, altura
             
         except ValueError as e:
             if "could not convert" in str(e):
@@ -163,22 +226,104 @@ class InterfazHorizonte:
             else:
                 raise e
     
+    def iniciar_calculo(self, etapas, mensaje_error):
+        """
+        Ejecuta un cálculo en un hilo de fondo, reemplazando al que esté en curso.
+        
+        Args:
+            etapas (list): Tuplas (calcular, dibujar, peso) que se ejecutan en
+                           orden; calcular corre en el hilo de fondo y dibujar
+                           recibe su resultado en el hilo de la interfaz
+            mensaje_error (str): Encabezado del mensaje si el cálculo falla
+        """
+        self.generacion += 1
+        instrumentacion.reiniciar()
+        self.progreso.configure(maximum=sum(peso for _, _, peso in etapas), value=0)
+        self.boton_cancelar.configure(state="normal")
+        hilo = threading.Thread(target=self._ejecutar_etapas,
+                                args=(self.generacion, etapas, mensaje_error), daemon=True)
+        hilo.start()
+        if not self.sondeando:
+            self.sondeando = True
+            self.root.after(INTERVALO_SONDEO, self._sondear_resultados)
+    
+    def _ejecutar_etapas(self, generacion, etapas, mensaje_error):
+        """Cuerpo del hilo de fondo: nunca toca widgets, sólo la cola de resultados"""
+        for calcular, dibujar, peso in etapas:
+            # Un cálculo a la vez; el reemplazado termina su etapa actual y se retira
+            with self.bloqueo_calculo:
+                if generacion != self.generacion:
+                    return
+                try:
+                    resultado = calcular()
+                except Exception as e:
+                    self.cola_resultados.put((generacion, None, (mensaje_error, e), 0))
+                    return
+            self.cola_resultados.put((generacion, dibujar, resultado, peso))
+        self.cola_resultados.put((generacion, None, None, 0))
+    
+    def _sondear_resultados(self):
+        """Dibuja en el hilo de la interfaz los resultados que llegaron a la cola"""
+        while True:
+            try:
+                generacion, dibujar, resultado, peso = self.cola_resultados.get_nowait()
+            except queue.Empty:
+                break
+            if generacion != self.generacion:
+                continue  # Resultado de un cálculo reemplazado o cancelado
+            if dibujar is not None:
+                with instrumentacion.etapa('dibujo'):
+                    dibujar(resultado)
+                self.progreso.step(peso)
+            else:
+                self.boton_cancelar.configure(state="disabled")
+                self.progreso.configure(value=0)
+                if resultado is not None:
+                    mensaje_error, e = resultado
+                    messagebox.showerror("Error", f"{mensaje_error}:\n{str(e)}")
+                    self.status_var.set("Error en el cálculo")
+                elif instrumentacion.activa:
+                    # HORIZONTE_INSTRUMENTACION=1: dónde se fue el tiempo del cálculo
+                    self.status_var.set(f"{self.status_var.get()} | {instrumentacion.linea_estado()}")
+        
+        if self.boton_cancelar.instate(["disabled"]):
+            self.sondeando = False
+        else:
+            self.root.after(INTERVALO_SONDEO, self._sondear_resultados)
+    
+    def cancelar_calculo(self):
+        """
+        Descarta el cálculo en curso (si lo hay).
+        
+        La etapa que ya está corriendo en el hilo de fondo termina, pero su
+        resultado no se dibuja y las etapas siguientes no empiezan.
+        """
+        if self.boton_cancelar.instate(["disabled"]):
+            return
+        self.generacion += 1
+        self.boton_cancelar.configure(state="disabled")
+        self.progreso.configure(value=0)
+        self.status_var.set("Cálculo descartado")
+    
     def calcular_horizonte(self):
         """Calcula y dibuja la línea de horizonte para una dirección específica"""
         try:
-            lat, lon, azimut, dist_max = self.validar_parametros()
-            
-            self.status_var.set("Calculando horizonte...")
-            self.root.update()
-            
-            # Calcular horizonte
-            distancias, angulos = calcular_horizonte(
-                lat, lon, self.elevacion, self.transform, self.bounds, 
-                azimut, pasos=1000, distancia_max=dist_max
+            lat, lon, azimut, dist_max, altura = self.validar_parametros()
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al calcular el horizonte:\n{str(e)}")
+            return
+        
+        elevacion, transform, bounds = self.elevacion, self.transform, self.bounds
+        
+        def calcular():
+            return calcular_horizonte(
+                lat, lon, elevacion, transform, bounds, 
+                azimut, pasos=1000, distancia_max=dist_max, altura_observador=altura
             )
-            
-            # Dibujar gráfico
-            self.ax.clear()
+        
+        def dibujar(resultado):
+            distancias, angulos = resultado
+            self.usar_ejes_cartesianos()
             self.ax.plot(np.array(distancias)/1000, angulos, 'b-', linewidth=2, label=f'Azimut {azimut}°')
             self.ax.set_xlabel('Distancia (km)')
             self.ax.set_ylabel('Ángulo de elevación (°)')
@@ -191,74 +336,101 @@ class InterfazHorizonte:
             
             self.canvas.draw()
             self.status_var.set(f"Horizonte calculado - Ángulo máximo: {max(angulos):.2f}°")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al calcular el horizonte:\n{str(e)}")
-            self.status_var.set("Error en el cálculo")
+        
+        self.status_var.set("Calculando horizonte...")
+        self.iniciar_calculo([(calcular, dibujar, 1)], "Error al calcular el horizonte")
     
     def calcular_horizonte_360(self):
         """Calcula y dibuja la línea de horizonte para todas las direcciones (360°)"""
         try:
-            lat, lon, azimut, dist_max = self.validar_parametros()
-            
-            self.status_var.set("Calculando horizonte 360°...")
-            self.root.update()
-            
-            # Calcular horizonte 360°
-            azimuts, angulos = calcular_horizonte_360(
-                lat, lon, self.elevacion, self.transform, self.bounds, 
-                pasos_azimut=360, distancia_max=dist_max
-            )
-            
-            # Dibujar gráfico polar
-            self.ax.clear()
+            lat, lon, azimut, dist_max, altura = self.validar_parametros()
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al calcular el horizonte 360°:\n{str(e)}")
+            return
+        
+        elevacion, transform, bounds = self.elevacion, self.transform, self.bounds
+        incremental = self.incremental_var.get()
+        
+        def etapa(pasos_azimut):
+            final = pasos_azimut == ETAPAS_360[-1]
             
-            # Convertir a radianes para el gráfico polar
-            theta = np.radians(azimuts)
+            def calcular():
+                if incremental:
+                    # Reutiliza las muestras del cálculo anterior (mismo hilo de fondo, uno a la vez).
+                    # La grilla de distancias sigue la de calcular_panorama para esta distancia.
+                    if (self.incremental is None or self.incremental.elevacion is not elevacion
+                            or self.incremental.distancia_grilla != dist_max):
+                        self.incremental = PanoramaIncremental(elevacion, transform, bounds, pasos_azimut,
+                                                               distancia_max=dist_max)
+                    return self.incremental.calcular(lat, lon, distancia_max=dist_max,
+                                                     altura_observador=altura)[:2], "incremental"
+                if not final:
+                    return calcular_panorama(lat, lon, elevacion, transform, bounds, pasos_azimut=pasos_azimut,
+                                             distancia_max=dist_max, altura_observador=altura)[:2], None
+                # Resolución completa, reutilizando resultados anteriores
+                fallos_previos = self.cache.fallos
+                resultado = self.cache.calcular_horizonte_360(
+                    lat, lon, elevacion, transform, bounds, 
+                    pasos_azimut=pasos_azimut, distancia_max=dist_max, altura_observador=altura
+                )
+                return resultado, "calculado" if self.cache.fallos > fallos_previos else "desde caché"
             
-            # Crear gráfico polar
-            self.ax = plt.subplot(111, projection='polar')
-            self.ax.plot(theta, angulos, 'b-', linewidth=2)
-            self.ax.fill(theta, angulos, alpha=0.3)
-            self.ax.set_theta_zero_location('N')
-            self.ax.set_theta_direction(-1)
-            self.ax.set_title(f'Horizonte 360° - Lat: {lat:.4f}, Lon: {lon:.4f}')
-            self.ax.set_ylim(0, max(angulos) * 1.1)
+            def dibujar(resultado):
+                (azimuts, angulos), origen = resultado
+                self.dibujar_polar(azimuts, angulos, lat, lon)
+                if final:
+                    self.status_var.set(f"Horizonte 360° {origen} - Ángulo máximo: {max(angulos):.2f}°")
+                else:
+                    self.status_var.set(f"Calculando horizonte 360°... ({pasos_azimut} direcciones)")
             
-            # Actualizar el canvas
+            return calcular, dibujar, pasos_azimut
+        
+        self.status_var.set("Calculando horizonte 360°...")
+        # El modo incremental es rápido: no necesita esbozos previos
+        etapas = ETAPAS_360[-1:] if incremental else ETAPAS_360
+        self.iniciar_calculo([etapa(n) for n in etapas], "Error al calcular el horizonte 360°")
+    
+    def dibujar_polar(self, azimuts, angulos, lat, lon):
+        """Dibuja un panorama en un gráfico polar (norte arriba, sentido horario)"""
+        self.crear_grafico()
+        
+        # Cerrar el contorno uniendo el último azimut con el primero
+        theta = np.radians(np.append(azimuts, azimuts[0]))
+        angulos = np.append(angulos, angulos[0])
+        
+        self.canvas.figure.clear()
+        self.ax = self.canvas.figure.add_subplot(111, projection='polar')
+        self.ax.plot(theta, angulos, 'b-', linewidth=2)
+        self.ax.fill(theta, angulos, alpha=0.3)
+        self.ax.set_theta_zero_location('N')
+        self.ax.set_theta_direction(-1)
+        self.ax.set_title(f'Horizonte 360° - Lat: {lat:.4f}, Lon: {lon:.4f}')
+        # El eje radial incluye horizontes bajo cero (observador en una cima)
+        inferior, superior = min(0.0, np.min(angulos)), max(0.0, np.max(angulos))
+        margen = 0.1 * (superior - inferior) or 1.0
+        self.ax.set_ylim(inferior - margen if inferior < 0 else 0.0, superior + margen)
+        self.canvas.draw()
+    
+    def usar_ejes_cartesianos(self):
+        """Deja en la figura unos ejes cartesianos vacíos (reemplazando el gráfico polar)"""
+        self.crear_grafico()
+        if self.ax.name == 'polar':
             self.canvas.figure.clear()
-            self.ax = self.canvas.figure.add_subplot(111, projection='polar')
-            self.ax.plot(theta, angulos, 'b-', linewidth=2)
-            self.ax.fill(theta, angulos, alpha=0.3)
-            self.ax.set_theta_zero_location('N')
-            self.ax.set_theta_direction(-1)
-            self.ax.set_title(f'Horizonte 360° - Lat: {lat:.4f}, Lon: {lon:.4f}')
-            self.ax.set_ylim(0, max(angulos) * 1.1)
-            
-            self.canvas.draw()
-            self.status_var.set(f"Horizonte 360° calculado - Ángulo máximo: {max(angulos):.2f}°")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al calcular el horizonte 360°:\n{str(e)}")
-            self.status_var.set("Error en el cálculo")
+            self.ax = self.canvas.figure.add_subplot(111)
+        else:
+            self.ax.clear()
     
     def limpiar_grafico(self):
         """Limpia el gráfico actual"""
-        self.ax.clear()
+        self.cancelar_calculo()
+        
+        # Restaurar gráfico normal si estaba en modo polar
+        self.usar_ejes_cartesianos()
         self.ax.set_xlabel('Distancia (km)')
         self.ax.set_ylabel('Ángulo de elevación (°)')
         self.ax.set_title('Línea de Horizonte')
         self.ax.grid(True, alpha=0.3)
         
-        # Restaurar gráfico normal si estaba en modo polar
-        if hasattr(self.ax, 'projection') and self.ax.projection.name == 'polar':
-            self.canvas.figure.clear()
-            self.ax = self.canvas.figure.add_subplot(111)
-            self.ax.set_xlabel('Distancia (km)')
-            self.ax.set_ylabel('Ángulo de elevación (°)')
-            self.ax.set_title('Línea de Horizonte')
-            self.ax.grid(True, alpha=0.3)
-        
         self.canvas.draw()
         self.status_var.set("Gráfico limpiado")
 
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Proyecto Horizonte - Cálculo de horizontes por lotes
+====================================================
+
+Calcula la vista panorámica 360° para muchos observadores sin interfaz
+gráfica. Los puntos se reparten entre procesos de un ProcessPoolExecutor;
+cada proceso abre el mosaico de teselas mapeado en memoria, de modo que
+todos comparten las páginas del sistema operativo en lugar de copiar la
+matriz de elevaciones. Los resultados se escriben a medida que terminan.
+
+Uso:
+    python lote.py puntos.csv -o resultados.jsonl
+    python lote.py sitios.geojson -o resultados.hzn --trabajadores 8
+
+Formato de entrada:
+    - CSV con columnas lat, lon y opcionalmente nombre y altura
+    - GeoJSON con geometrías Point (propiedades nombre/altura opcionales)
+
+Formato de salida (según la extensión):
+    - .hzn: formato binario compacto (ver formato.py)
+    - cualquier otra: JSON lines, un observador por línea
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from horizonte import cargar_mosaico, calcular_panorama, elevacion_observador, COEFICIENTE_REFRACCION
+from formato import EscritorHorizontes
+from instrumentacion import instrumentacion
+
+# Puntos que procesa cada tarea enviada a un trabajador
+PUNTOS_POR_TAREA = 16
+
+# Mosaico abierto en cada proceso trabajador
+_fuente = None
+
+
+def leer_puntos(ruta):
+    """
+    Lee los observadores desde un archivo CSV o GeoJSON.
+
+    Args:
+        ruta (str): Ruta al archivo .csv, .json o .geojson
+
+    Returns:
+        list: Diccionarios con claves nombre, lat, lon y altura
+    """
+    puntos = []
+    try:
+        if ruta.lower().endswith(('.json', '.geojson')):
+            with open(ruta, encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+            entidades = datos.get('features', [datos]) if isinstance(datos, dict) else datos
+            for i, entidad in enumerate(entidades):
+                geometria = entidad.get('geometry') or {}
+                if geometria.get('type') != 'Point':
+                    continue
+                lon, lat = geometria['coordinates'][:2]
+                propiedades = entidad.get('properties') or {}
+                puntos.append({
+                    'nombre': str(propiedades.get('nombre', propiedades.get('name', i))),
+                    'lat': float(lat),
+                    'lon': float(lon),
+                    'altura': float(propiedades.get('altura', 0.0)),
+                })
+        else:
+            with open(ruta, newline='', encoding='utf-8') as archivo:
+                for i, fila in enumerate(csv.DictReader(archivo)):
+                    fila = {clave.strip().lower(): valor for clave, valor in fila.items() if clave}
+                    puntos.append({
+                        'nombre': fila.get('nombre') or fila.get('name') or str(i),
+                        'lat': float(fila['lat']),
+                        'lon': float(fila['lon']),
+                        'altura': float(fila.get('altura') or 0.0),
+                    })
+    except Exception as e:
+        raise Exception(f"Error al leer los puntos de {ruta}: {str(e)}")
+    return puntos
+
+
+def _inicializar_trabajador(directorio, instrumentar=False):
+    """Abre el mosaico una vez por proceso; las teselas se mapean al usarse"""
+    global _fuente
+    if instrumentar:
+        instrumentacion.activar()
+    _fuente = cargar_mosaico(directorio)
+
+
+def _calcular_tarea(tarea, opciones):
+    """
+    Calcula los panoramas de un grupo de puntos dentro de un trabajador.
+
+    Returns:
+        list: Tuplas (indice, panorama, elevacion, error) con panorama None si falló
+    """
+    mosaico, transform, bounds = _fuente
+    resultados = []
+    for indice, punto in tarea:
+        try:
+            elevacion = elevacion_observador(punto['lat'], punto['lon'], mosaico, transform, bounds)
+            panorama = calcular_panorama(punto['lat'], punto['lon'], mosaico, transform, bounds,
+                                         altura_observador=punto['altura'], **opciones)
+            resultados.append((indice, panorama, elevacion, None))
+        except Exception as e:
+            resultados.append((indice, None, None, str(e)))
+    return resultados
+
+
+def _calcular_tarea_trabajador(tarea, opciones):
+    """
+    Igual que _calcular_tarea, pero devuelve también la instrumentación del
+    trabajador acumulada desde la tarea anterior (None si está apagada).
+    """
+    resultados = _calcular_tarea(tarea, opciones)
+    if not instrumentacion.activa:
+        return resultados, None
+    resumen = instrumentacion.resumen()
+    instrumentacion.reiniciar()
+    return resultados, resumen
+
+
+def calcular_lote(puntos, directorio='datos', trabajadores=None, pasos_azimut=360, pasos=200,
+                  distancia_max=100000, curvatura=True, refraccion=COEFICIENTE_REFRACCION,
+                  piramide=False, adaptativo=False, proyeccion_local=False):
+    """
+    Calcula los panoramas de muchos observadores en paralelo.
+
+    Es un generador: entrega cada resultado en cuanto termina (no en el orden
+    de entrada) y mantiene un número acotado de tareas en curso, así que la
+    memoria no crece con el tamaño del lote. Si la instrumentación está
+    activa, la de los trabajadores se suma a la del proceso actual.
+
+    Args:
+        puntos (list): Diccionarios con claves nombre, lat, lon y altura
+        directorio (str): Directorio con las teselas .hgt
+        trabajadores (int): Número de procesos (None = núcleos disponibles,
+                            0 = calcular en el proceso actual)
+        pasos_azimut (int): Número de direcciones por panorama
+        pasos (int): Número de muestras por dirección
+        distancia_max (float): Distancia máxima en metros
+        curvatura (bool): Corregir por curvatura terrestre y refracción
+        refraccion (float): Coeficiente de refracción atmosférica
+        piramide (bool): Usar paso creciente y la pirámide de máximos
+        adaptativo (bool): Usar paso creciente, interpolación bilineal y refinamiento
+        proyeccion_local (bool): Ubicar las muestras con la proyección local
+                                 de cada observador en lugar del geodésico
+
+    Yields:
+        tuple: (punto, panorama, error) con panorama None si el punto falló;
+               punto incluye la clave elevacion (terreno en el observador)
+    """
+    opciones = {
+        'pasos_azimut': pasos_azimut,
+        'pasos': pasos,
+        'distancia_max': distancia_max,
+        'curvatura': curvatura,
+        'refraccion': refraccion,
+        'piramide': piramide,
+        'adaptativo': adaptativo,
+        'proyeccion_local': proyeccion_local,
+    }
+    indexados = list(enumerate(puntos))
+    tareas = [indexados[i:i + PUNTOS_POR_TAREA] for i in range(0, len(indexados), PUNTOS_POR_TAREA)]
+
+    if trabajadores == 0:
+        _inicializar_trabajador(directorio)
+        for tarea in tareas:
+            for indice, panorama, elevacion, error in _calcular_tarea(tarea, opciones):
+                yield dict(puntos[indice], indice=indice, elevacion=elevacion), panorama, error
+        return
+
+    trabajadores = trabajadores or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=trabajadores, initializer=_inicializar_trabajador,
+                             initargs=(directorio, instrumentacion.activa)) as ejecutor:
+        pendientes = iter(tareas)
+        en_curso = set()
+        while True:
+            # Mantener dos tareas por trabajador para que ninguno quede ocioso
+            while len(en_curso) < 2 * trabajadores:
+                tarea = next(pendientes, None)
+                if tarea is None:
+                    break
+                en_curso.add(ejecutor.submit(_calcular_tarea_trabajador, tarea, opciones))
+            if not en_curso:
+                break
+            terminadas, en_curso = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                resultados, resumen = futuro.result()
+                if resumen is not None:
+                    instrumentacion.combinar(resumen)
+                for indice, panorama, elevacion, error in resultados:
+                    yield dict(puntos[indice], indice=indice, elevacion=elevacion), panorama, error
+
+
+def _a_lista(valores):
+    """Convierte un arreglo a lista JSON reemplazando NaN por None"""
+    return [None if v != v else round(float(v), 4) for v in valores]
+
+
+def escribir_jsonl(salida, punto, panorama, error):
+    """Escribe un resultado como una línea JSON"""
+    registro = {'nombre': punto['nombre'], 'lat': punto['lat'], 'lon': punto['lon'],
+                'altura': punto['altura'], 'elevacion': punto['elevacion']}
+    if error is not None:
+        registro['error'] = error
+    else:
+        registro['azimuts'] = _a_lista(panorama.azimuts)
+        registro['angulos'] = _a_lista(panorama.angulos)
+        registro['distancias'] = _a_lista(panorama.distancias)
+    salida.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+
+class SalidaJSONL:
+    """Salida en JSON lines (un observador por línea)"""
+
+    def __init__(self, ruta):
+        self.archivo = sys.stdout if ruta == '-' else open(ruta, 'w', encoding='utf-8')
+
+    def escribir(self, punto, panorama, error):
+        escribir_jsonl(self.archivo, punto, panorama, error)
+
+    def close(self):
+        if self.archivo is not sys.stdout:
+            self.archivo.close()
+
+
+class SalidaBinaria:
+    """Salida en formato .hzn; los observadores con error se omiten"""
+
+    def __init__(self, ruta, pasos_azimut, distancia_max, curvatura, refraccion):
+        self.escritor = EscritorHorizontes(ruta, pasos_azimut, distancia_max, curvatura, refraccion)
+
+    def escribir(self, punto, panorama, error):
+        if error is None:
+            self.escritor.agregar(punto['lat'], punto['lon'], panorama, altura=punto['altura'],
+                                  elevacion=punto['elevacion'], indice=punto['indice'])
+
+    def close(self):
+        self.escritor.close()
+
+
+def main():
+    """Función principal de la línea de comandos"""
+    parser = argparse.ArgumentParser(description="Cálculo de horizontes 360° por lotes")
+    parser.add_argument('entrada', help="Archivo CSV o GeoJSON con los observadores")
+    parser.add_argument('-o', '--salida', default='-', help="Archivo de resultados (.hzn o JSON lines, '-' = stdout)")
+    parser.add_argument('--datos', default='datos', help="Directorio con las teselas .hgt")
+    parser.add_argument('--trabajadores', type=int, default=None, help="Número de procesos")
+    parser.add_argument('--azimuts', type=int, default=360, help="Direcciones por panorama")
+    parser.add_argument('--pasos', type=int, default=200, help="Muestras por dirección")
+    parser.add_argument('--distancia', type=float, default=100, help="Distancia máxima en km")
+    parser.add_argument('--refraccion', type=float, default=COEFICIENTE_REFRACCION, help="Coeficiente de refracción")
+    parser.add_argument('--sin-curvatura', action='store_true', help="Usar el modelo de tierra plana")
+    parser.add_argument('--piramide', action='store_true', help="Paso creciente con la pirámide de máximos")
+    parser.add_argument('--adaptativo', action='store_true',
+                        help="Paso creciente con interpolación bilineal y refinamiento de picos")
+    parser.add_argument('--proyeccion-local', action='store_true',
+                        help="Ubicar las muestras con una proyección local por observador (sin geodésico por rayo)")
+    parser.add_argument('--instrumentar', action='store_true',
+                        help="Mostrar al final los tiempos por etapa y los contadores del cálculo")
+    args = parser.parse_args()
+    if args.instrumentar:
+        instrumentacion.activar()
+
+    try:
+        puntos = leer_puntos(args.entrada)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Observadores a procesar: {len(puntos)}", file=sys.stderr)
+
+    distancia_max = args.distancia * 1000
+    curvatura = not args.sin_curvatura
+    try:
+        if args.salida.lower().endswith('.hzn'):
+            salida = SalidaBinaria(args.salida, args.azimuts, distancia_max, curvatura, args.refraccion)
+        else:
+            salida = SalidaJSONL(args.salida)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    inicio = time.perf_counter()
+    completados = 0
+    errores = 0
+    try:
+        for punto, panorama, error in calcular_lote(
+                puntos, directorio=args.datos, trabajadores=args.trabajadores,
+                pasos_azimut=args.azimuts, pasos=args.pasos, distancia_max=distancia_max,
+                curvatura=curvatura, refraccion=args.refraccion, piramide=args.piramide,
+                adaptativo=args.adaptativo, proyeccion_local=args.proyeccion_local):
+            salida.escribir(punto, panorama, error)
+            completados += 1
+            errores += error is not None
+            if completados % 1000 == 0:
+                transcurrido = time.perf_counter() - inicio
+                print(f"  {completados}/{len(puntos)} ({completados / transcurrido:.1f} puntos/s)", file=sys.stderr)
+    finally:
+        salida.close()
+
+    transcurrido = time.perf_counter() - inicio
+    print(f"Completados {completados} observadores ({errores} con error) en {transcurrido:.2f} s "
+          f"- {completados / max(transcurrido, 1e-9):.1f} puntos/s", file=sys.stderr)
+    if instrumentacion.activa:
+        print(instrumentacion.formatear(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
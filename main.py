@@ -26,11 +26,12 @@ Fecha: [Fecha actual]
 
 import sys
 import os
+import importlib.util
 import tkinter as tk
 from tkinter import messagebox
 
 def verificar_dependencias():
-    """Verifica que todas las dependencias estén instaladas"""
+    """Verifica que todas las dependencias estén instaladas (sin importarlas)"""
     dependencias = {
         'numpy': 'numpy',
         'rasterio': 'rasterio',
@@ -40,9 +41,8 @@ def verificar_dependencias():
     
     faltantes = []
     for nombre, paquete in dependencias.items():
-        try:
-            __import__(paquete)
-        except ImportError:
+        # find_spec sólo localiza el paquete; importarlo aquí costaría casi un segundo
+        if importlib.util.find_spec(nombre) is None:
             faltantes.append(paquete)
     
     if faltantes:
@@ -101,9 +101,9 @@ def main():
     crear_estructura_directorio()
     
     # Verificar si hay archivos .hgt disponibles
-    archivos_hgt = []
+    archivos_hgt = 0
     if os.path.exists('datos'):
-        archivos_hgt = [f for f in os.listdir('datos') if f.endswith('.hgt')]
+        archivos_hgt = sum(1 for f in os.listdir('datos') if f.endswith('.hgt'))
     
     if not archivos_hgt:
         respuesta = input("No se encontraron archivos .hgt en el directorio 'datos'.\n¿Desea continuar de todos modos? (s/n): ")
@@ -111,9 +111,7 @@ def main():
             print("Coloque sus archivos .hgt en el directorio 'datos' y ejecute nuevamente.")
             return
     else:
-        print(f"Archivos .hgt encontrados: {len(archivos_hgt)}")
-        for archivo in archivos_hgt:
-            print(f"  - {archivo}")
+        print(f"Archivos .hgt encontrados: {archivos_hgt}")
         print()
     
     try:
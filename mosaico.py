@@ -0,0 +1,868 @@
+"""
+Mosaico de teselas SRTM (.hgt) mapeadas en memoria.
+
+Indexa todas las teselas de un directorio a partir de su nombre (p. ej.
+S01W079.hgt) y responde consultas de elevación sobre una grilla global
+continua, de modo que los rayos del horizonte pueden cruzar los bordes
+entre teselas. Cada archivo se abre con np.memmap sólo la primera vez que
+se consulta, así que la memoria residente crece con las teselas tocadas y
+no con el tamaño del directorio.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from instrumentacion import instrumentacion
+
+# Patrón de nombre de tesela SRTM: esquina suroeste en grados enteros
+PATRON_TESELA = re.compile(r'^([NS])(\d{2})([EW])(\d{3})\.hgt$', re.IGNORECASE)
+
+# Límites compatibles con rasterio.coords.BoundingBox
+Limites = namedtuple('Limites', ['left', 'bottom', 'right', 'top'])
+
+# Niveles de la pirámide de máximos: el nivel k reduce cada tesela 2**k veces
+# (1200 = 16 x 75, así que el nivel 4 es el último con celdas enteras)
+NIVELES_PIRAMIDE = 4
+
+# Valor de las celdas sin datos (vacíos) en las teselas SRTM
+VACIO = -32768
+
+# Lado en celdas de los bloques del índice de estadísticas (mínimo, máximo y
+# fracción de vacíos por bloque)
+TAMANO_BLOQUE = 64
+
+# Índice de teselas guardado en el directorio de datos: evita recorrer y
+# consultar el tamaño de cada archivo en cada arranque
+NOMBRE_MANIFIESTO = '.manifiesto_teselas.json'
+
+# Subdirectorio del directorio de datos con los .npy calculados de cada
+# tesela: escribirlos no cambia la fecha del directorio de las teselas, de la
+# que depende la vigencia del manifiesto
+DIRECTORIO_DERIVADOS = '.derivados'
+
+
+def parsear_nombre_tesela(nombre):
+    """
+    Obtiene la esquina suroeste de una tesela a partir de su nombre.
+
+    Args:
+        nombre (str): Nombre del archivo, p. ej. 'S01W079.hgt'
+
+    Returns:
+        tuple: (lat_sur, lon_oeste) en grados enteros, o None si el nombre
+               no corresponde a una tesela SRTM
+    """
+    coincidencia = PATRON_TESELA.match(nombre)
+    if coincidencia is None:
+        return None
+    hemisferio, lat, meridiano, lon = coincidencia.groups()
+    lat_sur = int(lat) if hemisferio.upper() == 'N' else -int(lat)
+    lon_oeste = int(lon) if meridiano.upper() == 'E' else -int(lon)
+    return lat_sur, lon_oeste
+
+
+def _base_derivado(ruta):
+    """Ruta sin extensión de los derivados de una tesela, en DIRECTORIO_DERIVADOS"""
+    directorio, nombre = os.path.split(ruta)
+    return os.path.join(directorio, DIRECTORIO_DERIVADOS, os.path.splitext(nombre)[0])
+
+
+def ruta_vista_general(ruta, nivel):
+    """
+    Ruta del archivo de la pirámide de máximos de una tesela .hgt.
+
+    Args:
+        ruta (str): Ruta de la tesela, p. ej. 'datos/S01W079.hgt'
+        nivel (int): Nivel de la pirámide (factor de reducción 2**nivel)
+
+    Returns:
+        str: Ruta del archivo .npy, p. ej. 'datos/.derivados/S01W079.max4.npy'
+    """
+    return f"{_base_derivado(ruta)}.max{2 ** nivel}.npy"
+
+
+def ruta_resumen_bloques(ruta, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Ruta del archivo de estadísticas por bloque junto a la tesela .hgt.
+
+    Args:
+        ruta (str): Ruta de la tesela, p. ej. 'datos/S01W079.hgt'
+        tamano_bloque (int): Lado del bloque en celdas
+
+    Returns:
+        str: Ruta del archivo .npy, p. ej. 'datos/.derivados/S01W079.bloques64.npy'
+    """
+    return f"{_base_derivado(ruta)}.bloques{tamano_bloque}.npy"
+
+
+def firma_tesela(ruta):
+    """Tamaño y fecha de modificación (ns) de un archivo, igual que en MosaicoDEM.huella"""
+    estado = os.stat(ruta)
+    return [estado.st_size, estado.st_mtime_ns]
+
+
+def cargar_derivado(ruta_derivado, firma, mmap_mode=None):
+    """
+    Carga un .npy calculado a partir de una tesela si sigue vigente.
+
+    Junto a cada .npy se guarda en un .firma la firma (tamaño, mtime en ns)
+    de la tesela de la que se calculó. Se exige igualdad y no sólo que el
+    .npy sea más reciente: al reemplazar una tesela con unzip, cp -p o
+    rsync -a el archivo nuevo conserva su fecha original, que puede ser
+    anterior a la del .npy.
+
+    Args:
+        ruta_derivado (str): Ruta del .npy
+        firma (list): Firma actual de la tesela (ver firma_tesela)
+        mmap_mode (str): Modo de np.load (None = leer a memoria)
+
+    Returns:
+        numpy.ndarray: Los datos, o None si faltan o son de otra versión de la tesela
+    """
+    try:
+        with open(f"{ruta_derivado}.firma", encoding='utf-8') as archivo:
+            if json.load(archivo) != list(firma):
+                return None
+        return np.load(ruta_derivado, mmap_mode=mmap_mode)
+    except (OSError, ValueError):
+        return None
+
+
+def guardar_derivado(ruta_derivado, firma, datos):
+    """
+    Guarda un .npy calculado a partir de una tesela junto con su firma.
+
+    Ambos archivos se escriben a un temporal y se reemplazan; la firma va
+    última, así que un lector concurrente nunca acepta un .npy a medio
+    escribir ni uno viejo con la firma nueva.
+
+    Raises:
+        OSError: Si el directorio no admite escritura
+    """
+    os.makedirs(os.path.dirname(ruta_derivado), exist_ok=True)
+    ruta_firma = f"{ruta_derivado}.firma"
+    try:
+        os.remove(ruta_firma)
+    except FileNotFoundError:
+        pass
+    temporal = f"{ruta_derivado}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as archivo:
+        np.save(archivo, datos)
+    os.replace(temporal, ruta_derivado)
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(list(firma), archivo)
+    os.replace(temporal, ruta_firma)
+
+
+def resumir_bloques(datos, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Calcula mínimo, máximo y fracción de vacíos de cada bloque de una tesela.
+
+    El bloque (a, b) cubre las filas locales a*t .. a*t + t - 1 (y lo mismo
+    para las columnas); el último bloque de cada eje queda incompleto. Los
+    vacíos no cuentan para el mínimo ni el máximo.
+
+    Args:
+        datos (numpy.array): Tesela int16
+        tamano_bloque (int): Lado del bloque en celdas (t)
+
+    Returns:
+        numpy.array: Arreglo float32 (3, B, B) con mínimo, máximo (NaN si el
+                     bloque es todo vacío) y fracción de vacíos
+    """
+    t = tamano_bloque
+    b = -(-datos.shape[0] // t)
+    relleno = np.full((b * t, b * t), VACIO, dtype=np.int16)
+    relleno[:datos.shape[0], :datos.shape[1]] = datos
+    relleno = relleno.reshape(b, t, b, t)
+
+    # VACIO es el menor int16: no altera el máximo salvo en bloques todo vacío
+    maximos = relleno.max(axis=(1, 3)).astype(np.float32)
+    vacios = relleno == VACIO
+    minimos = np.where(vacios, np.int16(np.iinfo(np.int16).max), relleno).min(axis=(1, 3)).astype(np.float32)
+
+    # Celdas reales por bloque (el relleno del borde no es vacío)
+    reales = np.minimum(t, datos.shape[0] - np.arange(b) * t)
+    celdas = np.outer(reales, reales)
+    fraccion = (vacios.sum(axis=(1, 3)) - (t * t - celdas)) / celdas
+
+    sin_datos = fraccion >= 1.0
+    maximos[sin_datos] = np.nan
+    minimos[sin_datos] = np.nan
+    return np.stack([minimos, maximos, fraccion.astype(np.float32)])
+
+
+def combinar_bilineal(esquinas, wx, wy):
+    """
+    Interpolación bilineal que ignora las esquinas sin datos.
+
+    Donde falta alguna esquina (NaN) los pesos se renormalizan sobre las
+    restantes, así que un vacío aislado se rellena con sus vecinas; sólo
+    queda NaN si faltan las cuatro (o las que tienen peso).
+
+    Args:
+        esquinas (numpy.array): (4, ...) valores en (f0, c0), (f0, c0 + 1),
+                                (f0 + 1, c0) y (f0 + 1, c0 + 1)
+        wx (numpy.array): Fracción de columna
+        wy (numpy.array): Fracción de fila
+
+    Returns:
+        numpy.array: Valores interpolados
+    """
+    resultado = ((esquinas[0] * (1 - wx) + esquinas[1] * wx) * (1 - wy) +
+                 (esquinas[2] * (1 - wx) + esquinas[3] * wx) * wy)
+    faltantes = np.isnan(resultado)
+    if faltantes.any():
+        # Sólo las muestras afectadas pagan la renormalización
+        x = wx[faltantes]
+        y = wy[faltantes]
+        pesos = np.stack([(1 - x) * (1 - y), x * (1 - y), (1 - x) * y, x * y])
+        valores = esquinas[:, faltantes]
+        validos = ~np.isnan(valores)
+        suma = (pesos * validos).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            resultado[faltantes] = np.where(validos, valores * pesos, 0.0).sum(axis=0) / np.where(suma > 0, suma, np.nan)
+    return resultado
+
+
+def reducir_maximo(datos):
+    """
+    Reduce una tesela a la mitad de resolución tomando el máximo de cada 2x2.
+
+    La tesela tiene (m + 1) x (m + 1) muestras con m par; la última fila y
+    columna (compartidas con la tesela vecina) se reducen por separado, de
+    modo que la celda k del resultado cubre las filas 2k y 2k + 1.
+
+    Args:
+        datos (numpy.array): Tesela de (m + 1) x (m + 1)
+
+    Returns:
+        numpy.array: Tesela reducida de (m/2 + 1) x (m/2 + 1), int16
+    """
+    m = datos.shape[0] - 1
+    h = m // 2
+    reducida = np.empty((h + 1, h + 1), dtype=np.int16)
+    reducida[:h, :h] = datos[:m, :m].reshape(h, 2, h, 2).max(axis=(1, 3))
+    reducida[:h, h] = datos[:m, m].reshape(h, 2).max(axis=1)
+    reducida[h, :h] = datos[m, :m].reshape(h, 2).max(axis=1)
+    reducida[h, h] = datos[m, m]
+    return reducida
+
+
+class MosaicoDEM:
+    """
+    Fuente de elevación formada por todas las teselas .hgt de un directorio.
+
+    La grilla global tiene su fila 0 en el borde norte y su columna 0 en el
+    borde oeste del mosaico. Las teselas comparten la fila/columna del borde,
+    por lo que la fila global f corresponde a la fila f % n de la tesela
+    f // n (n = muestras por grado).
+    """
+
+    def __init__(self, directorio='datos'):
+        self.directorio = directorio
+        self.rutas = {}        # (lat_sur, lon_oeste) -> ruta del archivo
+        self._abiertas = {}    # índice de tesela -> np.memmap
+        self._firmas = {}      # índice de tesela -> (tamaño, mtime) al mapearla
+        self._vistas = {}      # (índice de tesela, nivel) -> tesela reducida
+        self._bloques = {}     # índice de tesela -> estadísticas por bloque
+        self.muestras_leidas = 0
+        self._indexar()
+
+    def _leer_manifiesto(self):
+        """
+        Devuelve (nombres, tamaño en bytes) del manifiesto si sigue vigente.
+
+        El manifiesto es válido mientras el directorio no haya cambiado
+        después de escribirlo (agregar, borrar o renombrar archivos actualiza
+        la fecha de modificación del directorio). Los .npy derivados se
+        escriben en DIRECTORIO_DERIVADOS para no invalidarlo.
+        """
+        ruta = os.path.join(self.directorio, NOMBRE_MANIFIESTO)
+        try:
+            if os.stat(self.directorio).st_mtime_ns > os.stat(ruta).st_mtime_ns:
+                return None
+            with open(ruta, encoding='utf-8') as archivo:
+                manifiesto = json.load(archivo)
+            return manifiesto['teselas'], int(manifiesto['tamano'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _escribir_manifiesto(self, nombres, tamano):
+        """Guarda el manifiesto (silenciosamente si el directorio es de sólo lectura)"""
+        ruta = os.path.join(self.directorio, NOMBRE_MANIFIESTO)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        try:
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                json.dump({'tamano': tamano, 'teselas': nombres}, archivo)
+            os.replace(temporal, ruta)
+            # El reemplazo cambia la fecha del directorio; se marca el manifiesto
+            # como posterior para que siga vigente en el próximo arranque
+            os.utime(ruta)
+        except OSError:
+            instrumentacion.contar('excepciones_silenciadas')
+            try:
+                os.remove(temporal)
+            except OSError:
+                pass
+
+    @instrumentacion.medir('indexar_mosaico')
+    def _indexar(self):
+        """Construye el índice de teselas por nombre, desde el manifiesto si está vigente"""
+        if not os.path.isdir(self.directorio):
+            raise Exception(f"No existe el directorio de datos: {self.directorio}")
+
+        manifiesto = self._leer_manifiesto()
+        if manifiesto is not None:
+            nombres, tamano = manifiesto
+        else:
+            nombres = [nombre for nombre in sorted(os.listdir(self.directorio))
+                       if parsear_nombre_tesela(nombre) is not None]
+            tamanos = {os.path.getsize(os.path.join(self.directorio, nombre)) for nombre in nombres}
+            if not nombres:
+                raise Exception(f"No se encontraron archivos .hgt en {self.directorio}")
+            if len(tamanos) != 1:
+                raise Exception("Las teselas del mosaico tienen resoluciones distintas")
+            tamano = tamanos.pop()
+            self._escribir_manifiesto(nombres, tamano)
+
+        for nombre in nombres:
+            self.rutas[parsear_nombre_tesela(nombre)] = os.path.join(self.directorio, nombre)
+
+        # Una tesela de n x n muestras int16 ocupa 2*n*n bytes (1201 para SRTM3)
+        self.tamano_tesela = int(round(math.sqrt(tamano / 2)))
+        self.muestras_por_grado = self.tamano_tesela - 1
+
+        lats = [lat for lat, _ in self.rutas]
+        lons = [lon for _, lon in self.rutas]
+        self.lat_min = min(lats)
+        self.lat_max = max(lats) + 1
+        self.lon_min = min(lons)
+        self.lon_max = max(lons) + 1
+        self.filas_teselas = self.lat_max - self.lat_min
+        self.columnas_teselas = self.lon_max - self.lon_min
+
+        # Tabla densa índice de tesela -> ruta (None si falta la tesela)
+        self._rutas_por_indice = [None] * (self.filas_teselas * self.columnas_teselas)
+        for (lat_sur, lon_oeste), ruta in self.rutas.items():
+            self._rutas_por_indice[self._indice_tesela(lat_sur, lon_oeste)] = ruta
+
+        # Máximo por bloque en una grilla global de bloques; NaN = tesela
+        # todavía sin resumir (se completa al consultarla)
+        self.bloques_por_tesela = -(-self.tamano_tesela // TAMANO_BLOQUE)
+        self._maximos_bloque = np.full((self.filas_teselas * self.bloques_por_tesela,
+                                        self.columnas_teselas * self.bloques_por_tesela), np.nan, dtype=np.float32)
+        self._fila_bloque = self._tabla_bloques(self.filas_teselas)
+        self._columna_bloque = self._tabla_bloques(self.columnas_teselas)
+
+    def _tabla_bloques(self, teselas):
+        """Bloque global de cada fila (o columna) global, con la misma regla de bordes que leer()"""
+        n = self.muestras_por_grado
+        indices = np.arange(teselas * n + 1)
+        i = np.minimum(indices // n, teselas - 1)
+        return i * self.bloques_por_tesela + (indices - i * n) // TAMANO_BLOQUE
+
+    def _indice_tesela(self, lat_sur, lon_oeste):
+        """Índice plano de la tesela dentro de la grilla de teselas"""
+        i = self.lat_max - 1 - lat_sur
+        j = lon_oeste - self.lon_min
+        return i * self.columnas_teselas + j
+
+    @property
+    def shape(self):
+        """Dimensiones de la grilla global (filas, columnas)"""
+        n = self.muestras_por_grado
+        return (self.filas_teselas * n + 1, self.columnas_teselas * n + 1)
+
+    @property
+    def resolucion(self):
+        """Tamaño de celda en grados"""
+        return 1.0 / self.muestras_por_grado
+
+    @property
+    def bounds(self):
+        """Límites del mosaico (con medio píxel de margen, como rasterio)"""
+        medio = 0.5 * self.resolucion
+        return Limites(self.lon_min - medio, self.lat_min - medio,
+                       self.lon_max + medio, self.lat_max + medio)
+
+    @property
+    def transform(self):
+        """Transformación afín de la grilla global (requiere rasterio/affine)"""
+        from affine import Affine
+        medio = 0.5 * self.resolucion
+        return Affine(self.resolucion, 0.0, self.lon_min - medio,
+                      0.0, -self.resolucion, self.lat_max + medio)
+
+    @property
+    def teselas_abiertas(self):
+        """Número de teselas mapeadas en memoria hasta ahora"""
+        return len(self._abiertas)
+
+    def tesela(self, indice):
+        """
+        Devuelve la tesela mapeada en memoria, abriéndola en el primer acceso.
+
+        Args:
+            indice (int): Índice plano de la tesela
+
+        Returns:
+            numpy.ndarray: Matriz int16 big-endian (mapeada) de la tesela, o None si falta
+        """
+        datos = self._abiertas.get(indice)
+        if datos is None:
+            ruta = self._rutas_por_indice[indice]
+            if ruta is None:
+                return None
+            try:
+                with instrumentacion.etapa('mapear_teselas'):
+                    estado = os.stat(ruta)
+                    # La vista ndarray evita el costo de la subclase memmap al indexar
+                    datos = np.memmap(ruta, dtype='>i2', mode='r',
+                                      shape=(self.tamano_tesela, self.tamano_tesela)).view(np.ndarray)
+            except Exception as e:
+                raise Exception(f"Error al mapear la tesela {ruta}: {str(e)}")
+            instrumentacion.contar('teselas_mapeadas')
+            self._abiertas[indice] = datos
+            self._firmas[indice] = (estado.st_size, estado.st_mtime_ns)
+        return datos
+
+    def vista_general(self, indice, nivel):
+        """
+        Devuelve una tesela de la pirámide de máximos, construyéndola si falta.
+
+        Cada nivel se guarda como .npy en DIRECTORIO_DERIVADOS y se mapea en memoria
+        en los usos siguientes, mientras el tamaño y la fecha del .hgt sigan
+        siendo los de su firma (ver cargar_derivado). Si el directorio no
+        admite escritura la vista queda sólo en memoria.
+
+        Args:
+            indice (int): Índice plano de la tesela
+            nivel (int): Nivel de la pirámide (0 = resolución completa)
+
+        Returns:
+            numpy.ndarray: Tesela reducida 2**nivel veces, o None si falta
+        """
+        if nivel == 0:
+            return self.tesela(indice)
+        datos = self._vistas.get((indice, nivel))
+        if datos is not None:
+            return datos
+
+        ruta = self._rutas_por_indice[indice]
+        if ruta is None:
+            return None
+        ruta_vista = ruta_vista_general(ruta, nivel)
+        try:
+            firma = firma_tesela(ruta)
+        except OSError as e:
+            raise Exception(f"Error al leer la tesela {ruta}: {str(e)}")
+        datos = cargar_derivado(ruta_vista, firma, mmap_mode='r')
+
+        if datos is None:
+            anterior = self.vista_general(indice, nivel - 1)
+            datos = reducir_maximo(anterior)
+            try:
+                guardar_derivado(ruta_vista, firma, datos)
+            except OSError:
+                # Sin permiso de escritura: la vista queda sólo en memoria
+                instrumentacion.contar('excepciones_silenciadas')
+        self._vistas[(indice, nivel)] = datos
+        return datos
+
+    def construir_piramide(self, niveles=NIVELES_PIRAMIDE):
+        """
+        Construye (o valida) la pirámide de máximos de todas las teselas.
+
+        Args:
+            niveles (int): Número de niveles a construir
+
+        Returns:
+            int: Número de teselas procesadas
+        """
+        procesadas = 0
+        for indice, ruta in enumerate(self._rutas_por_indice):
+            if ruta is None:
+                continue
+            for nivel in range(1, niveles + 1):
+                self.vista_general(indice, nivel)
+            procesadas += 1
+        return procesadas
+
+    def resumen_bloques(self, indice):
+        """
+        Devuelve las estadísticas por bloque de una tesela, calculándolas si faltan.
+
+        Igual que la pirámide, se guardan como .npy en DIRECTORIO_DERIVADOS y se
+        recalculan si el tamaño o la fecha del .hgt no son los de su firma
+        (ver cargar_derivado): la poda confía en estos máximos, así que un
+        resumen de otra versión de la tesela haría desaparecer terreno.
+
+        Args:
+            indice (int): Índice plano de la tesela
+
+        Returns:
+            numpy.array: (3, B, B) con mínimo, máximo y fracción de vacíos por
+                         bloque (ver resumir_bloques), o None si falta la tesela
+        """
+        resumen = self._bloques.get(indice)
+        if resumen is not None:
+            return resumen
+
+        ruta = self._rutas_por_indice[indice]
+        if ruta is None:
+            return None
+        ruta_resumen = ruta_resumen_bloques(ruta)
+        try:
+            firma = firma_tesela(ruta)
+        except OSError as e:
+            raise Exception(f"Error al leer la tesela {ruta}: {str(e)}")
+        resumen = cargar_derivado(ruta_resumen, firma)
+
+        if resumen is None:
+            resumen = resumir_bloques(self.tesela(indice))
+            try:
+                guardar_derivado(ruta_resumen, firma, resumen)
+            except OSError:
+                # Sin permiso de escritura: el resumen queda sólo en memoria
+                instrumentacion.contar('excepciones_silenciadas')
+        self._bloques[indice] = resumen
+        return resumen
+
+    def resumen_tesela(self, indice):
+        """
+        Estadísticas de una tesela completa a partir de las de sus bloques.
+
+        Args:
+            indice (int): Índice plano de la tesela
+
+        Returns:
+            tuple: (minimo, maximo, fraccion_vacios); (NaN, NaN, 1.0) si falta
+                   la tesela o es toda vacío
+        """
+        resumen = self.resumen_bloques(indice)
+        if resumen is None or np.isnan(resumen[1]).all():
+            return np.nan, np.nan, 1.0
+        t = TAMANO_BLOQUE
+        reales = np.minimum(t, self.tamano_tesela - np.arange(self.bloques_por_tesela) * t)
+        celdas = np.outer(reales, reales)
+        return (float(np.nanmin(resumen[0])), float(np.nanmax(resumen[1])),
+                float((resumen[2] * celdas).sum() / celdas.sum()))
+
+    def construir_indice_bloques(self):
+        """
+        Calcula (o valida) las estadísticas por bloque de todas las teselas.
+
+        Returns:
+            int: Número de teselas procesadas
+        """
+        procesadas = 0
+        for indice, ruta in enumerate(self._rutas_por_indice):
+            if ruta is not None:
+                self._registrar_bloques(indice)
+                procesadas += 1
+        return procesadas
+
+    def _registrar_bloques(self, indice):
+        """Copia el máximo por bloque de una tesela a la grilla global de bloques"""
+        b = self.bloques_por_tesela
+        i, j = divmod(indice, self.columnas_teselas)
+        resumen = self.resumen_bloques(indice)
+        # Teselas faltantes o bloques todo vacío nunca pueden elevar el horizonte
+        maximos = -np.inf if resumen is None else np.where(np.isnan(resumen[1]), -np.inf, resumen[1])
+        self._maximos_bloque[i * b:(i + 1) * b, j * b:(j + 1) * b] = maximos
+
+    def _maximos_en(self, bf, bc):
+        """Máximo de los bloques globales (bf, bc), resumiendo las teselas que falten"""
+        valores = self._maximos_bloque[bf, bc]
+        faltantes = np.isnan(valores)
+        if faltantes.any():
+            b = self.bloques_por_tesela
+            for indice in np.unique((bf[faltantes] // b) * self.columnas_teselas + bc[faltantes] // b):
+                self._registrar_bloques(int(indice))
+            valores = self._maximos_bloque[bf, bc]
+        return valores
+
+    def cota_bloques(self, lats, lons, interpolacion='cercano'):
+        """
+        Cota superior de la elevación que puede devolver muestrear().
+
+        Es el máximo del bloque del índice que contiene cada coordenada (de
+        los bloques de sus cuatro vecinas con interpolación bilineal). Como un
+        bloque de 64 celdas contiene completas las celdas de todos los niveles
+        de la pirámide, la cota vale también para ellos.
+
+        Args:
+            lats (numpy.array): Latitudes
+            lons (numpy.array): Longitudes
+            interpolacion (str): 'cercano' o 'bilineal'
+
+        Returns:
+            numpy.array: Elevación máxima posible en metros (-inf sin datos)
+        """
+        n = self.muestras_por_grado
+        fy = (self.lat_max - np.asarray(lats, dtype=np.float64)) * n
+        fx = (np.asarray(lons, dtype=np.float64) - self.lon_min) * n
+        if interpolacion == 'cercano':
+            fy += 0.5
+            fx += 0.5
+        filas = np.floor(fy).astype(np.int64)
+        columnas = np.floor(fx).astype(np.int64)
+        alto, ancho = self.shape
+        # Con bilineal también cuentan la fila y columna siguientes; basta con
+        # que alguna esquina caiga dentro de la grilla
+        extra = int(interpolacion == 'bilineal')
+        validos = (filas + extra >= 0) & (filas < alto) & (columnas + extra >= 0) & (columnas < ancho)
+        todos_validos = validos.all()
+        if not todos_validos:
+            filas = filas[validos]
+            columnas = columnas[validos]
+
+        # Tablas fila/columna global -> fila/columna de la grilla de bloques
+        bf = self._fila_bloque[np.clip(filas, 0, alto - 1)]
+        bc = self._columna_bloque[np.clip(columnas, 0, ancho - 1)]
+        valores = self._maximos_en(bf, bc)
+        if extra:
+            bf2 = self._fila_bloque[np.minimum(filas + 1, alto - 1)]
+            bc2 = self._columna_bloque[np.minimum(columnas + 1, ancho - 1)]
+            valores = np.maximum(np.maximum(valores, self._maximos_en(bf2, bc2)),
+                                 np.maximum(self._maximos_en(bf, bc2), self._maximos_en(bf2, bc)))
+        if todos_validos:
+            return valores
+        cota = np.full(validos.shape, -np.inf, dtype=np.float32)
+        cota[validos] = valores
+        return cota
+
+    def huella(self, lat_sur, lat_norte, lon_oeste, lon_este):
+        """
+        Calcula una huella de las teselas que cubren una ventana geográfica.
+
+        La huella combina nombre, tamaño y fecha de modificación de cada
+        archivo, así que cambia si se reemplaza una tesela. Las teselas ya
+        mapeadas cuyo archivo cambió se descartan para volver a mapearlas.
+
+        Args:
+            lat_sur (float): Latitud mínima de la ventana
+            lat_norte (float): Latitud máxima de la ventana
+            lon_oeste (float): Longitud mínima de la ventana
+            lon_este (float): Longitud máxima de la ventana
+
+        Returns:
+            str: Resumen hexadecimal de las teselas de la ventana
+        """
+        resumen = hashlib.blake2b(digest_size=16)
+        for lat in range(max(math.floor(lat_sur), self.lat_min), min(math.floor(lat_norte), self.lat_max - 1) + 1):
+            for lon in range(max(math.floor(lon_oeste), self.lon_min), min(math.floor(lon_este), self.lon_max - 1) + 1):
+                ruta = self.rutas.get((lat, lon))
+                if ruta is None:
+                    continue
+                try:
+                    estado = os.stat(ruta)
+                except OSError:
+                    continue
+                firma = (estado.st_size, estado.st_mtime_ns)
+                indice = self._indice_tesela(lat, lon)
+                if self._firmas.get(indice, firma) != firma:
+                    self._abiertas.pop(indice, None)
+                    self._firmas.pop(indice, None)
+                    for nivel in range(1, NIVELES_PIRAMIDE + 1):
+                        self._vistas.pop((indice, nivel), None)
+                    self._bloques.pop(indice, None)
+                    b = self.bloques_por_tesela
+                    i, j = divmod(indice, self.columnas_teselas)
+                    self._maximos_bloque[i * b:(i + 1) * b, j * b:(j + 1) * b] = np.nan
+                resumen.update(f"{os.path.basename(ruta)}:{firma[0]}:{firma[1]};".encode())
+        return resumen.hexdigest()
+
+    def indices(self, lats, lons):
+        """
+        Convierte coordenadas a índices (fila, columna) de la grilla global.
+
+        Args:
+            lats (numpy.array): Latitudes
+            lons (numpy.array): Longitudes
+
+        Returns:
+            tuple: (filas, columnas) como arreglos int64 (pueden quedar fuera
+                   de la grilla; leer() los marca como NaN)
+        """
+        n = self.muestras_por_grado
+        filas = np.floor((self.lat_max - np.asarray(lats, dtype=np.float64)) * n + 0.5)
+        columnas = np.floor((np.asarray(lons, dtype=np.float64) - self.lon_min) * n + 0.5)
+        return filas.astype(np.int64), columnas.astype(np.int64)
+
+    def centro_celda(self, lat, lon):
+        """
+        Ajusta una coordenada al centro de su celda de la grilla global.
+
+        Args:
+            lat (float): Latitud
+            lon (float): Longitud
+
+        Returns:
+            tuple: (fila, columna, lat_centro, lon_centro)
+        """
+        n = self.muestras_por_grado
+        fila = math.floor((self.lat_max - lat) * n + 0.5)
+        columna = math.floor((lon - self.lon_min) * n + 0.5)
+        return (fila, columna, self.lat_max - fila * self.resolucion,
+                self.lon_min + columna * self.resolucion)
+
+    def leer(self, filas, columnas, nivel=0):
+        """
+        Lee elevaciones por índice global, cruzando bordes entre teselas.
+
+        Args:
+            filas (numpy.array): Filas de la grilla global
+            columnas (numpy.array): Columnas de la grilla global (se difunde
+                                    con filas, p. ej. filas[:, None])
+            nivel (int): Nivel de la pirámide; con nivel > 0 se devuelve el
+                         máximo de la celda reducida que contiene cada índice
+
+        Returns:
+            numpy.array: Elevaciones en metros (float64), NaN donde no hay
+                         datos (fuera de las teselas o vacíos SRTM)
+        """
+        filas, columnas = np.broadcast_arrays(np.asarray(filas, dtype=np.int64),
+                                              np.asarray(columnas, dtype=np.int64))
+        resultado = np.full(filas.shape, np.nan)
+        plano = resultado.reshape(-1)
+        filas = filas.reshape(-1)
+        columnas = columnas.reshape(-1)
+
+        self.muestras_leidas += filas.size
+        alto, ancho = self.shape
+        validos = (filas >= 0) & (filas < alto) & (columnas >= 0) & (columnas < ancho)
+        todos_validos = validos.all()
+        if not todos_validos:
+            if instrumentacion.activa:
+                instrumentacion.contar('muestras_fuera', validos.size - np.count_nonzero(validos))
+            if not validos.any():
+                return resultado
+            posiciones = np.flatnonzero(validos)
+            filas = filas[posiciones]
+            columnas = columnas[posiciones]
+
+        # La última fila/columna global pertenece a la última tesela
+        n = self.muestras_por_grado
+        i = np.minimum(filas // n, self.filas_teselas - 1)
+        j = np.minimum(columnas // n, self.columnas_teselas - 1)
+        tamano = n // (1 << nivel) + 1
+        lineales = ((filas - i * n) >> nivel) * tamano + ((columnas - j * n) >> nivel)
+        indices_tesela = i * self.columnas_teselas + j
+
+        conteos = np.bincount(indices_tesela, minlength=len(self._rutas_por_indice))
+        tocadas = np.flatnonzero(conteos)
+        if instrumentacion.activa:
+            instrumentacion.contar('muestras', filas.size)
+            instrumentacion.contar('teselas_tocadas', len(tocadas))
+        for indice in tocadas:
+            datos = self.vista_general(indice, nivel)
+            if datos is None:
+                continue
+            if len(tocadas) == 1:
+                seleccion = slice(None)
+            else:
+                seleccion = np.flatnonzero(indices_tesela == indice)
+            valores = np.take(datos.reshape(-1), lineales[seleccion])
+            vacios = valores == VACIO
+            if vacios.any():
+                valores = np.where(vacios, np.nan, valores)
+                if instrumentacion.activa:
+                    instrumentacion.contar('muestras_vacias', np.count_nonzero(vacios))
+            if todos_validos:
+                plano[seleccion] = valores
+            else:
+                plano[posiciones[seleccion]] = valores
+        return resultado
+
+    def muestrear(self, lats, lons, nivel=0, interpolacion='cercano'):
+        """
+        Devuelve la elevación en cada coordenada.
+
+        Args:
+            lats (numpy.array): Latitudes
+            lons (numpy.array): Longitudes
+            nivel (int): Nivel de la pirámide de máximos (0 = resolución completa)
+            interpolacion (str): 'cercano' (celda más cercana) o 'bilineal'
+                                 (entre las cuatro celdas vecinas, sólo nivel 0;
+                                 los vacíos se rellenan con las vecinas válidas)
+
+        Returns:
+            numpy.array: Elevaciones en metros, NaN fuera de las teselas o en vacíos
+        """
+        if interpolacion == 'cercano':
+            with instrumentacion.etapa('transformacion'):
+                filas, columnas = self.indices(lats, lons)
+            with instrumentacion.etapa('lectura'):
+                return self.leer(filas, columnas, nivel)
+        if interpolacion != 'bilineal':
+            raise ValueError(f"Interpolación desconocida: {interpolacion}")
+        if nivel:
+            raise ValueError("La interpolación bilineal sólo está disponible a resolución completa")
+
+        # Posición fraccionaria en la grilla global (centros de celda en enteros)
+        with instrumentacion.etapa('transformacion'):
+            n = self.muestras_por_grado
+            fy = (self.lat_max - np.asarray(lats, dtype=np.float64)) * n
+            fx = (np.asarray(lons, dtype=np.float64) - self.lon_min) * n
+            f0 = np.floor(fy)
+            c0 = np.floor(fx)
+            wy = fy - f0
+            wx = fx - c0
+            f0 = f0.astype(np.int64)
+            c0 = c0.astype(np.int64)
+
+        # Las cuatro esquinas en una sola lectura del mosaico
+        with instrumentacion.etapa('lectura'):
+            esquinas = self.leer(np.stack([f0, f0, f0 + 1, f0 + 1]), np.stack([c0, c0 + 1, c0, c0 + 1]))
+        return combinar_bilineal(esquinas, wx, wy)
+
+    def maximo_segmentos(self, lats, lons, nivel=0):
+        """
+        Máximo de las celdas reducidas que cruza cada segmento entre puntos consecutivos.
+
+        Si dos puntos consecutivos quedan a lo sumo a una celda reducida de
+        distancia en cada eje, el segmento que los une sólo puede cruzar las
+        celdas de sus extremos y las dos de las esquinas entre ellas; se leen
+        las cuatro.
+
+        Args:
+            lats (numpy.array): Latitudes (..., k + 1), puntos en el último eje
+            lons (numpy.array): Longitudes de la misma forma
+            nivel (int): Nivel de la pirámide de máximos (0 = resolución completa)
+
+        Returns:
+            numpy.array: (..., k) elevaciones en metros, NaN si no hay datos en
+                         ninguna de las cuatro celdas
+        """
+        with instrumentacion.etapa('transformacion'):
+            filas, columnas = self.indices(lats, lons)
+        f0, f1 = filas[..., :-1], filas[..., 1:]
+        c0, c1 = columnas[..., :-1], columnas[..., 1:]
+        with instrumentacion.etapa('lectura'):
+            celdas = self.leer(np.stack([f0, f1, f0, f1]), np.stack([c0, c1, c1, c0]), nivel)
+        # fmax ignora los NaN (vacíos o fuera de las teselas) salvo en las cuatro
+        return np.fmax.reduce(celdas, axis=0)
+
+    def elevacion(self, lat, lon):
+        """
+        Devuelve la elevación en un punto.
+
+        Args:
+            lat (float): Latitud
+            lon (float): Longitud
+
+        Returns:
+            float: Elevación en metros
+        """
+        valor = float(self.muestrear(np.array([lat]), np.array([lon]))[0])
+        if np.isnan(valor):
+            raise IndexError("Coordenadas fuera del rango de datos o sin datos (vacío SRTM)")
+        return valor
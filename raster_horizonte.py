@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Proyecto Horizonte - Ángulo del horizonte para todas las celdas de una tesela
+============================================================================
+
+Calcula, para cada celda de una tesela .hgt, el ángulo del horizonte en N
+direcciones fijas y el factor de vista del cielo (sky-view factor) derivado.
+
+Cada dirección se resuelve con un barrido de líneas: la grilla se divide en
+las líneas paralelas a la dirección y cada línea se recorre desde su extremo
+lejano hacia atrás manteniendo en una pila la envolvente convexa superior
+del terreno ya visto. El punto del horizonte de cada celda es la tangente
+desde la celda a esa envolvente, y los puntos que quedan bajo la tangente
+se descartan para siempre, así que el costo amortizado es O(celdas) por
+dirección. Todas las líneas de una dirección avanzan a la vez como arreglos
+de NumPy.
+
+Uso:
+    python raster_horizonte.py datos -o salida --direcciones 16
+
+Genera por tesela <nombre>.horizonte.tif (una banda por dirección, en
+grados) y <nombre>.svf.tif (factor de vista del cielo entre 0 y 1).
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from horizonte import RADIO_TIERRA
+from mosaico import MosaicoDEM, parsear_nombre_tesela
+
+# Celdas de terreno alrededor de la tesela que se consideran para el horizonte
+MARGEN_CELDAS = 256
+
+# Líneas que se barren a la vez (acota la memoria de las pilas)
+LINEAS_POR_BLOQUE = 4096
+
+# Componente máxima de los pasos enteros que aproximan cada dirección
+PASO_MAXIMO = 64
+
+# Error admitido entre el azimut pedido y el del paso entero: una fracción de
+# la separación entre direcciones (así dos direcciones nunca comparten paso),
+# y como mucho TOLERANCIA_MAXIMA grados
+TOLERANCIA_DIRECCION = 0.1
+TOLERANCIA_MAXIMA = 0.5
+
+
+def direcciones_barrido(n, celda_y, celda_x):
+    """
+    Aproxima N azimuts equiespaciados con pasos enteros sobre la grilla.
+
+    Para cada azimut se usa el paso más corto (menor componente máxima) cuyo
+    azimut real está dentro de la tolerancia: los pasos largos recorren la
+    línea saltando celdas, así que sólo se usan cuando hacen falta. Con la
+    tolerancia por debajo de media separación las direcciones son distintas.
+
+    Args:
+        n (int): Número de direcciones
+        celda_y (float): Tamaño de celda norte-sur en metros
+        celda_x (float): Tamaño de celda este-oeste en metros
+
+    Returns:
+        list: Tuplas (df, dc, azimut) con el paso en filas y columnas y el
+              azimut real en grados que representa
+
+    Raises:
+        ValueError: Si algún azimut no se puede aproximar con pasos de hasta
+                    PASO_MAXIMO celdas
+    """
+    if n < 1:
+        raise ValueError("El número de direcciones debe ser positivo")
+    tolerancia = min(TOLERANCIA_DIRECCION * 360.0 / n, TOLERANCIA_MAXIMA)
+    componentes = np.arange(-PASO_MAXIMO, PASO_MAXIMO + 1)
+    df, dc = (valores.ravel() for valores in np.meshgrid(componentes, componentes, indexing='ij'))
+    primos = (np.gcd(df, dc) == 1)
+    df, dc = df[primos], dc[primos]
+    azimuts = np.degrees(np.arctan2(dc * celda_x, -df * celda_y)) % 360
+    largos = np.maximum(np.abs(df), np.abs(dc))
+
+    direcciones = []
+    for k in range(n):
+        objetivo = 360.0 * k / n
+        error = np.abs((azimuts - objetivo + 180) % 360 - 180)
+        dentro = np.flatnonzero(error <= tolerancia)
+        if not len(dentro):
+            raise ValueError(f"No hay un paso de hasta {PASO_MAXIMO} celdas para el azimut {objetivo:.3f}° "
+                             f"con tolerancia {tolerancia:.3f}°; use menos direcciones")
+        i = dentro[np.lexsort((error[dentro], largos[dentro]))[0]]
+        direcciones.append((int(df[i]), int(dc[i]), float(azimuts[i])))
+    return direcciones
+
+
+def pesos_direcciones(azimuts):
+    """
+    Fracción del círculo que representa cada dirección.
+
+    Cada azimut cuenta por la mitad del arco hasta cada vecino, de modo que
+    direcciones algo desparejas no sesgan los promedios sobre el horizonte.
+
+    Args:
+        azimuts (numpy.array): Azimuts en grados (distintos)
+
+    Returns:
+        numpy.array: Pesos que suman 1, en el orden de azimuts
+    """
+    azimuts = np.asarray(azimuts, dtype=np.float64) % 360
+    if len(azimuts) == 1:
+        return np.ones(1)
+    orden = np.argsort(azimuts)
+    ordenados = azimuts[orden]
+    arcos = np.diff(np.append(ordenados, ordenados[0] + 360.0))
+    pesos = np.empty(len(azimuts))
+    pesos[orden] = (arcos + np.roll(arcos, 1)) / 720.0
+    return pesos
+
+
+def _lineas(alto, ancho, df, dc):
+    """
+    Agrupa las celdas de la grilla en líneas paralelas al paso (df, dc).
+
+    Returns:
+        numpy.array: Matriz (líneas x longitud máxima) de índices planos, con
+                     cada línea ordenada desde su extremo lejano y -1 como
+                     relleno; las líneas van de la más larga a la más corta
+    """
+    filas, columnas = np.divmod(np.arange(alto * ancho), ancho)
+    # Una línea empieza en la celda cuyo paso hacia atrás sale de la grilla
+    anterior_f = filas - df
+    anterior_c = columnas - dc
+    inicios = np.flatnonzero((anterior_f < 0) | (anterior_f >= alto) |
+                             (anterior_c < 0) | (anterior_c >= ancho))
+    f0, c0 = filas[inicios], columnas[inicios]
+
+    def pasos_disponibles(posicion, paso, limite):
+        if paso > 0:
+            return (limite - 1 - posicion) // paso + 1
+        if paso < 0:
+            return posicion // (-paso) + 1
+        return np.full(len(posicion), np.iinfo(np.int64).max)
+
+    longitudes = np.minimum(pasos_disponibles(f0, df, alto), pasos_disponibles(c0, dc, ancho))
+    orden = np.argsort(-longitudes, kind='stable')
+    f0, c0, longitudes = f0[orden], c0[orden], longitudes[orden]
+
+    k = np.arange(longitudes.max())
+    # Posición desde el extremo lejano: k = 0 es la última celda de la línea
+    desde_inicio = longitudes[:, None] - 1 - k[None, :]
+    validas = desde_inicio >= 0
+    desde_inicio = np.where(validas, desde_inicio, 0)
+    indices = (f0[:, None] + df * desde_inicio) * ancho + (c0[:, None] + dc * desde_inicio)
+    return np.where(validas, indices, -1), longitudes
+
+
+def horizonte_direccion(z, df, dc, paso_metros):
+    """
+    Calcula la tangente del ángulo del horizonte en una dirección para toda la grilla.
+
+    Args:
+        z (numpy.array): Elevaciones (alto x ancho); NaN se trata como muy bajo
+        df (int): Paso en filas de la dirección
+        dc (int): Paso en columnas de la dirección
+        paso_metros (float): Longitud del paso en metros
+
+    Returns:
+        numpy.array: Tangente del horizonte por celda (-inf si no hay terreno
+                     delante dentro de la grilla)
+    """
+    alto, ancho = z.shape
+    plano = np.nan_to_num(z.ravel().astype(np.float64), nan=-1e4)
+    resultado = np.full(alto * ancho, -np.inf)
+
+    todas_lineas, todas_longitudes = _lineas(alto, ancho, df, dc)
+    for inicio in range(0, len(todas_lineas), LINEAS_POR_BLOQUE):
+        lineas = todas_lineas[inicio:inicio + LINEAS_POR_BLOQUE]
+        longitudes = todas_longitudes[inicio:inicio + LINEAS_POR_BLOQUE]
+        n_lineas, largo = lineas.shape
+
+        # Pila de la envolvente por línea (posición en pasos y elevación),
+        # guardada en arreglos planos: la pila de la línea l empieza en l * largo
+        pila_x = np.zeros(n_lineas * largo, dtype=np.float64)
+        pila_z = np.zeros(n_lineas * largo, dtype=np.float64)
+        base = np.arange(n_lineas) * largo
+        tope = np.zeros(n_lineas, dtype=np.int64)
+        # Las líneas están ordenadas por longitud: las activas son un prefijo
+        activas_por_paso = np.searchsorted(-longitudes, -np.arange(largo), side='left')
+
+        for k in range(largo):
+            n = activas_por_paso[k]
+            celdas = lineas[:n, k]
+            zk = plano[celdas]
+            fondo = base[:n] + tope[:n]
+
+            # Descartar el tope mientras quede bajo la recta hacia el anterior
+            candidatas = np.flatnonzero(tope[:n] >= 2)
+            while len(candidatas):
+                f = fondo[candidatas]
+                zc = zk[candidatas]
+                # pendiente(segundo) >= pendiente(tope), sin dividir
+                descartar = ((pila_z[f - 2] - zc) * (k - pila_x[f - 1]) >=
+                             (pila_z[f - 1] - zc) * (k - pila_x[f - 2]))
+                candidatas = candidatas[descartar]
+                fondo[candidatas] -= 1
+                candidatas = candidatas[fondo[candidatas] - base[candidatas] >= 2]
+            tope[:n] = fondo - base[:n]
+
+            con_terreno = np.flatnonzero(tope[:n] >= 1)
+            f = fondo[con_terreno] - 1
+            resultado[celdas[con_terreno]] = ((pila_z[f] - zk[con_terreno]) /
+                                              ((k - pila_x[f]) * paso_metros))
+
+            pila_x[fondo] = k
+            pila_z[fondo] = zk
+            tope[:n] += 1
+
+    resultado[np.isnan(z.ravel())] = np.nan
+    return resultado.reshape(alto, ancho)
+
+
+def factor_vista_cielo(angulos, azimuts=None):
+    """
+    Factor de vista del cielo a partir de los ángulos del horizonte.
+
+    Se usa la aproximación para superficie horizontal
+    SVF = 1 - mean(sin(max(angulo, 0))) sobre las direcciones, con cada
+    dirección pesada por el arco que representa (ver pesos_direcciones).
+
+    Args:
+        angulos (numpy.array): Ángulos en grados, direcciones en el eje 0
+        azimuts (numpy.array): Azimut real de cada dirección (None = equiespaciadas)
+
+    Returns:
+        numpy.array: Factor entre 0 y 1
+    """
+    senos = np.sin(np.radians(np.clip(angulos, 0.0, 90.0)))
+    if azimuts is None:
+        return 1.0 - np.mean(senos, axis=0)
+    return 1.0 - np.tensordot(pesos_direcciones(azimuts), senos, axes=1)
+
+
+def calcular_raster_horizonte(mosaico, lat_sur, lon_oeste, direcciones=16, margen=MARGEN_CELDAS):
+    """
+    Calcula el ángulo del horizonte en N direcciones para todas las celdas de una tesela.
+
+    Se usa el terreno de la tesela más un margen de celdas vecinas del
+    mosaico; el terreno más allá del margen no se considera. El cálculo es
+    plano (sin corrección de curvatura), ya que la envolvente convexa
+    supone distancias invariantes a lo largo de la línea.
+
+    Args:
+        mosaico (MosaicoDEM): Mosaico de teselas
+        lat_sur (int): Latitud del borde sur de la tesela
+        lon_oeste (int): Longitud del borde oeste de la tesela
+        direcciones (int): Número de direcciones
+        margen (int): Celdas de terreno alrededor de la tesela
+
+    Returns:
+        tuple: (angulos, azimuts, svf, transform) con angulos de forma
+               (direcciones, n, n) en grados, los azimuts reales usados, el
+               factor de vista del cielo (n, n) y la transformación de la tesela
+    """
+    if (lat_sur, lon_oeste) not in mosaico.rutas:
+        raise ValueError(f"No existe la tesela con esquina ({lat_sur}, {lon_oeste})")
+
+    n = mosaico.muestras_por_grado
+    fila0 = (mosaico.lat_max - 1 - lat_sur) * n
+    columna0 = (lon_oeste - mosaico.lon_min) * n
+    filas = np.arange(fila0 - margen, fila0 + n + 1 + margen)
+    columnas = np.arange(columna0 - margen, columna0 + n + 1 + margen)
+    z = mosaico.leer(filas[:, None], columnas[None, :])
+
+    celda_y = math.radians(mosaico.resolucion) * RADIO_TIERRA
+    celda_x = celda_y * math.cos(math.radians(lat_sur + 0.5))
+
+    pasos = direcciones_barrido(direcciones, celda_y, celda_x)
+    recorte = (slice(margen, margen + n + 1), slice(margen, margen + n + 1))
+    angulos = np.empty((len(pasos), n + 1, n + 1), dtype=np.float32)
+    for b, (df, dc, _) in enumerate(pasos):
+        tangentes = horizonte_direccion(z, df, dc, math.hypot(df * celda_y, dc * celda_x))
+        angulos[b] = np.degrees(np.arctan(tangentes[recorte]))
+    # Sin terreno delante dentro del margen: horizonte a -90°
+    angulos[np.isneginf(angulos)] = -90.0
+
+    from affine import Affine
+    res = mosaico.resolucion
+    transform = Affine(res, 0.0, lon_oeste - 0.5 * res, 0.0, -res, lat_sur + 1 + 0.5 * res)
+    azimuts = np.array([azimut for _, _, azimut in pasos])
+    return angulos, azimuts, factor_vista_cielo(angulos, azimuts).astype(np.float32), transform
+
+
+def guardar_raster(ruta, bandas, transform, descripciones=None):
+    """
+    Guarda un raster float32 de una o varias bandas como GeoTIFF (EPSG:4326).
+
+    Args:
+        ruta (str): Ruta del archivo .tif
+        bandas (numpy.array): Arreglo (bandas, alto, ancho) o (alto, ancho)
+        transform (affine.Affine): Transformación geográfica
+        descripciones (list): Descripción de cada banda (opcional)
+    """
+    import rasterio
+
+    if bandas.ndim == 2:
+        bandas = bandas[None]
+    try:
+        with rasterio.open(ruta, 'w', driver='GTiff', height=bandas.shape[1], width=bandas.shape[2],
+                           count=bandas.shape[0], dtype='float32', crs='EPSG:4326',
+                           transform=transform, nodata=np.nan, compress='deflate') as destino:
+            destino.write(bandas.astype(np.float32))
+            for b, descripcion in enumerate(descripciones or [], start=1):
+                destino.set_band_description(b, descripcion)
+    except Exception as e:
+        raise Exception(f"Error al guardar el archivo {ruta}: {str(e)}")
+
+
+def _procesar_tesela(directorio, nombre, salida, direcciones, margen):
+    """Calcula y guarda los rasters de una tesela dentro de un trabajador"""
+    mosaico = MosaicoDEM(directorio)
+    lat_sur, lon_oeste = parsear_nombre_tesela(nombre)
+    inicio = time.perf_counter()
+    angulos, azimuts, svf, transform = calcular_raster_horizonte(mosaico, lat_sur, lon_oeste,
+                                                                 direcciones, margen)
+    base = os.path.join(salida, os.path.splitext(nombre)[0])
+    guardar_raster(base + '.horizonte.tif', angulos, transform,
+                   [f"azimut {azimut:.1f}" for azimut in azimuts])
+    guardar_raster(base + '.svf.tif', svf, transform, ["factor de vista del cielo"])
+    return nombre, time.perf_counter() - inicio
+
+
+def procesar_teselas(directorio, salida, nombres=None, direcciones=16, margen=MARGEN_CELDAS,
+                     trabajadores=None):
+    """
+    Calcula los rasters de horizonte de varias teselas en paralelo.
+
+    Args:
+        directorio (str): Directorio con las teselas .hgt
+        salida (str): Directorio donde se escriben los GeoTIFF
+        nombres (list): Nombres de las teselas (None = todas)
+        direcciones (int): Número de direcciones
+        margen (int): Celdas de terreno alrededor de cada tesela
+        trabajadores (int): Número de procesos (None = núcleos disponibles)
+
+    Yields:
+        tuple: (nombre, segundos) por cada tesela terminada
+    """
+    os.makedirs(salida, exist_ok=True)
+    if nombres is None:
+        nombres = sorted(f for f in os.listdir(directorio) if parsear_nombre_tesela(f) is not None)
+    with ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+        futuros = [ejecutor.submit(_procesar_tesela, directorio, nombre, salida, direcciones, margen)
+                   for nombre in nombres]
+        for futuro in futuros:
+            yield futuro.result()
+
+
+def main():
+    """Función principal de la línea de comandos"""
+    parser = argparse.ArgumentParser(description="Ángulo del horizonte y factor de vista del cielo por tesela")
+    parser.add_argument('datos', help="Directorio con las teselas .hgt")
+    parser.add_argument('-o', '--salida', default='salida', help="Directorio de salida")
+    parser.add_argument('--teselas', nargs='*', help="Nombres de teselas a procesar (por defecto, todas)")
+    parser.add_argument('--direcciones', type=int, default=16, help="Número de direcciones")
+    parser.add_argument('--margen', type=int, default=MARGEN_CELDAS, help="Celdas de margen alrededor de la tesela")
+    parser.add_argument('--trabajadores', type=int, default=None, help="Número de procesos")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    try:
+        for nombre, segundos in procesar_teselas(args.datos, args.salida, args.teselas, args.direcciones,
+                                                 args.margen, args.trabajadores):
+            print(f"  {nombre}: {segundos:.1f} s")
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Terminado en {time.perf_counter() - inicio:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Proyecto Horizonte - Imágenes de panoramas sin interfaz gráfica
+===============================================================
+
+Dibuja la silueta del horizonte 360° desenrollada (ángulo de elevación
+frente a azimut, norte a la izquierda y sentido horario) directamente en un
+arreglo RGBA de NumPy y la guarda como PNG, sin Tk ni matplotlib. El
+terreno puede colorearse según la distancia al horizonte y los picos se
+rotulan por prominencia.
+
+RenderizadorPanorama precalcula el cielo, las marcas de azimut y las tablas
+de color para un tamaño de imagen, así que renderizar muchos panoramas sólo
+cuesta unas pocas operaciones vectorizadas por imagen.
+
+Uso:
+    python render.py resultados.hzn -d imagenes/ [--color-distancia 100]
+    python render.py resultados.jsonl -d imagenes/ --ancho 1440 --alto 360
+
+La entrada es la salida de lote.py o ruta.py (.hzn o JSON lines); se escribe
+un PNG por observador, con el nombre (JSON lines) o el índice (.hzn).
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+# Colores RGBA
+COLOR_CIELO_ALTO = (70, 130, 200, 255)
+COLOR_CIELO_BAJO = (190, 215, 235, 255)
+COLOR_TERRENO = (95, 115, 80, 255)
+COLOR_CERCANO = (60, 85, 45, 255)
+COLOR_LEJANO = (165, 175, 195, 255)
+COLOR_SILUETA = (25, 30, 25, 255)
+COLOR_GRILLA = (215, 230, 245, 255)
+COLOR_TEXTO = (20, 20, 20, 255)
+
+# Picos rotulados: prominencia mínima (grados) y máximo de rótulos por imagen
+PROMINENCIA_MINIMA = 1.0
+MAXIMO_ETIQUETAS = 8
+
+# Fuente de mapa de bits de 3x5 píxeles (filas de bits, de arriba abajo)
+FUENTE = {
+    '0': ('111', '101', '101', '101', '111'),
+    '1': ('010', '110', '010', '010', '111'),
+    '2': ('111', '001', '111', '100', '111'),
+    '3': ('111', '001', '111', '001', '111'),
+    '4': ('101', '101', '111', '001', '001'),
+    '5': ('111', '100', '111', '001', '111'),
+    '6': ('111', '100', '111', '101', '111'),
+    '7': ('111', '001', '001', '001', '001'),
+    '8': ('111', '101', '111', '101', '111'),
+    '9': ('111', '101', '111', '001', '111'),
+    '.': ('000', '000', '000', '000', '010'),
+    '-': ('000', '000', '111', '000', '000'),
+    '°': ('010', '101', '010', '000', '000'),
+    'k': ('100', '101', '110', '101', '101'),
+    'm': ('000', '000', '111', '111', '101'),
+    'N': ('101', '111', '111', '101', '101'),
+    'E': ('111', '100', '110', '100', '111'),
+    'S': ('011', '100', '010', '001', '110'),
+    'O': ('010', '101', '101', '101', '010'),
+    ' ': ('000', '000', '000', '000', '000'),
+}
+
+
+def prominencias(valores):
+    """
+    Picos de un perfil circular y su prominencia.
+
+    La prominencia de un pico es lo que hay que descender desde él, como
+    mínimo, para llegar a un punto más alto del perfil (la del pico más alto
+    es su altura sobre el mínimo). El perfil se rota para empezar en el
+    máximo, de modo que todos los demás picos tienen uno más alto a cada
+    lado; los collados se buscan para todos los picos a la vez en una matriz
+    picos x perfil.
+
+    Args:
+        valores (numpy.array): Perfil circular (por ejemplo ángulos por azimut)
+
+    Returns:
+        tuple: (indices, prominencias) arreglos, ordenados por índice
+    """
+    valores = np.nan_to_num(np.asarray(valores, dtype=np.float64), nan=-90.0)
+    n = len(valores)
+    inicio = int(np.argmax(valores))
+    perfil = np.append(np.roll(valores, -inicio), valores[inicio])
+    # Máximos locales (en una meseta, su primer punto)
+    picos = np.flatnonzero((perfil[1:-1] > perfil[:-2]) & (perfil[1:-1] >= perfil[2:])) + 1
+    alturas = perfil[picos][:, None]
+    posiciones = np.arange(n + 1)
+    antes = posiciones < picos[:, None]
+    # Tramo izquierdo: desde el último punto no más bajo que el pico; tramo
+    # derecho: hasta el primero más alto (o el final del perfil)
+    izquierda = np.where(antes & (perfil >= alturas), posiciones, 0).max(axis=1)
+    derecha = np.where(~antes & (perfil > alturas), posiciones, n).min(axis=1)
+    en_izquierda = (posiciones > izquierda[:, None]) & antes
+    en_derecha = (posiciones > picos[:, None]) & (posiciones <= derecha[:, None])
+    collados = np.maximum(np.where(en_izquierda, perfil, np.inf).min(axis=1),
+                          np.where(en_derecha, perfil, np.inf).min(axis=1))
+    indices = np.append(inicio, (picos + inicio) % n)
+    resultado = np.append(perfil[0] - perfil.min(), perfil[picos] - collados)
+    orden = np.argsort(indices)
+    return indices[orden], resultado[orden]
+
+
+def escribir_png(ruta, imagen, compresion=1):
+    """
+    Guarda una imagen RGBA (o RGB) de 8 bits como PNG.
+
+    Cada fila se guarda como diferencia con la anterior (filtro Up): el cielo
+    y el terreno de los panoramas varían poco de una fila a otra, así que
+    los datos quedan casi en cero y zlib los comprime rápido incluso con el
+    nivel más bajo.
+
+    Args:
+        ruta (str): Archivo de salida
+        imagen (numpy.array): Arreglo uint8 de forma (alto, ancho, 4) o (alto, ancho, 3)
+        compresion (int): Nivel de zlib (0-9)
+    """
+    alto, ancho, canales = imagen.shape
+    tipo_color = {3: 2, 4: 6}[canales]
+    # Cada fila va precedida de su tipo de filtro (2 = Up)
+    pixeles = imagen.reshape(alto, -1)
+    filas = np.empty((alto, 1 + ancho * canales), dtype=np.uint8)
+    filas[:, 0] = 2
+    filas[0, 1:] = pixeles[0]
+    np.subtract(pixeles[1:], pixeles[:-1], out=filas[1:, 1:])
+
+    def bloque(tipo, datos):
+        return struct.pack('>I', len(datos)) + tipo + datos + struct.pack('>I', zlib.crc32(tipo + datos))
+
+    try:
+        with open(ruta, 'wb') as archivo:
+            archivo.write(b'\x89PNG\r\n\x1a\n')
+            archivo.write(bloque(b'IHDR', struct.pack('>IIBBBBB', ancho, alto, 8, tipo_color, 0, 0, 0)))
+            archivo.write(bloque(b'IDAT', zlib.compress(filas.tobytes(), compresion)))
+            archivo.write(bloque(b'IEND', b''))
+    except Exception as e:
+        raise Exception(f"Error al escribir la imagen {ruta}: {str(e)}")
+
+
+def _pixel(color):
+    """Color RGBA como un uint32 con el mismo orden de bytes que la imagen"""
+    return np.array(color, dtype=np.uint8).view(np.uint32)[0]
+
+
+class RenderizadorPanorama:
+    """
+    Dibuja panoramas 360° desenrollados en un arreglo RGBA de tamaño fijo.
+
+    Una instancia sirve para cualquier número de imágenes del mismo tamaño:
+    el cielo, las marcas de azimut, los puntos cardinales y los glifos se
+    preparan una sola vez.
+    """
+
+    def __init__(self, ancho=720, alto=240, angulo_min=-5.0, angulo_max=None, distancia_max=None,
+                 prominencia_minima=PROMINENCIA_MINIMA, maximo_etiquetas=MAXIMO_ETIQUETAS, escala_texto=2):
+        """
+        Args:
+            ancho (int): Ancho en píxeles (360° de azimut)
+            alto (int): Alto en píxeles
+            angulo_min (float): Ángulo de elevación del borde inferior (grados)
+            angulo_max (float): Ángulo del borde superior (None = según cada
+                                panorama, redondeado a 5° por encima del máximo)
+            distancia_max (float): Distancia (m) del color más lejano; None
+                                   dibuja el terreno de un solo color
+            prominencia_minima (float): Prominencia mínima (grados) de los picos rotulados
+            maximo_etiquetas (int): Máximo de picos rotulados por imagen
+            escala_texto (int): Píxeles por punto de la fuente
+        """
+        self.ancho = ancho
+        self.alto = alto
+        self.angulo_min = angulo_min
+        self.angulo_max = angulo_max
+        self.distancia_max = distancia_max
+        self.prominencia_minima = prominencia_minima
+        self.maximo_etiquetas = maximo_etiquetas
+        self.escala_texto = escala_texto
+
+        # Azimut del centro de cada columna y filas como columna para comparar
+        self.azimuts_columnas = (np.arange(ancho) + 0.5) * 360.0 / ancho
+        self._filas = np.arange(alto)[:, None]
+
+        # Los píxeles se manejan como uint32 (un RGBA por elemento)
+        self._terreno = _pixel(COLOR_TERRENO)
+        self._silueta = _pixel(COLOR_SILUETA)
+        self._grilla = _pixel(COLOR_GRILLA)
+        self._texto = _pixel(COLOR_TEXTO)
+
+        # Cielo: degradado vertical
+        t = np.linspace(0.0, 1.0, alto)[:, None]
+        cielo = ((1 - t) * np.array(COLOR_CIELO_ALTO) + t * np.array(COLOR_CIELO_BAJO)).round().astype(np.uint8)
+        self._cielo = np.repeat(cielo.view(np.uint32), ancho, axis=1)
+
+        # Tabla de colores del terreno según la distancia (256 niveles)
+        t = np.linspace(0.0, 1.0, 256)[:, None]
+        tabla = ((1 - t) * np.array(COLOR_CERCANO) + t * np.array(COLOR_LEJANO)).round().astype(np.uint8)
+        self._tabla_color = tabla.view(np.uint32)[:, 0]
+
+        # Marcas de azimut cada 10° (cada 30° más largas) y puntos cardinales
+        self._glifos = {caracter: np.kron(np.array([[bit == '1' for bit in fila] for fila in filas]),
+                                          np.ones((escala_texto, escala_texto), dtype=bool))
+                        for caracter, filas in FUENTE.items()}
+        marcas = np.zeros((alto, ancho), dtype=np.uint32)
+        for grados in range(0, 360, 10):
+            columna = int(round(grados * ancho / 360.0)) % ancho
+            marcas[alto - (8 if grados % 30 == 0 else 4):, columna] = self._texto
+        for grados, letra in ((0, 'N'), (90, 'E'), (180, 'S'), (270, 'O')):
+            x = int(round(grados * ancho / 360.0)) + 2 * escala_texto
+            self._estampar(marcas, letra, x, alto - 8 - 6 * escala_texto)
+        self._marcas = np.flatnonzero(marcas)
+
+    def _ancho_texto(self, texto):
+        return len(texto) * 4 * self.escala_texto - self.escala_texto
+
+    def _estampar(self, imagen, texto, x, y):
+        """Escribe el texto en la imagen (uint32) con la esquina superior izquierda en (x, y)"""
+        for caracter in texto:
+            glifo = self._glifos.get(caracter, self._glifos[' '])
+            alto, ancho = glifo.shape
+            y0, x0 = max(y, 0), max(x, 0)
+            y1, x1 = min(y + alto, imagen.shape[0]), min(x + ancho, imagen.shape[1])
+            if y1 > y0 and x1 > x0:
+                np.putmask(imagen[y0:y1, x0:x1], glifo[y0 - y:y1 - y, x0 - x:x1 - x], self._texto)
+            x += ancho + self.escala_texto
+
+    def perfil_columnas(self, azimuts, angulos, distancias=None):
+        """
+        Ángulo y distancia del horizonte en cada columna de la imagen.
+
+        Entre muestras el ángulo se interpola linealmente; si hay más muestras
+        que columnas, cada columna toma el máximo de las suyas para no perder
+        picos estrechos.
+
+        Returns:
+            tuple: (angulos, distancias) por columna (distancias None si no se dieron)
+        """
+        azimuts = np.asarray(azimuts, dtype=np.float64)
+        angulos = np.nan_to_num(np.asarray(angulos, dtype=np.float64), nan=-90.0)
+        perfil = np.interp(self.azimuts_columnas, azimuts, angulos, period=360.0)
+        columnas = (np.floor(azimuts % 360.0 * self.ancho / 360.0).astype(int)) % self.ancho
+        np.maximum.at(perfil, columnas, angulos)
+        if distancias is None:
+            return perfil, None
+        cercana = np.round((self.azimuts_columnas - azimuts[0]) * len(azimuts) / 360.0).astype(int) % len(azimuts)
+        return perfil, np.asarray(distancias, dtype=np.float64)[cercana]
+
+    def renderizar(self, azimuts, angulos, distancias=None, elevaciones=None):
+        """
+        Dibuja un panorama.
+
+        Args:
+            azimuts (numpy.array): Azimuts equiespaciados en grados
+            angulos (numpy.array): Ángulo del horizonte por azimut (-90 o NaN sin datos)
+            distancias (numpy.array): Distancia (m) al horizonte por azimut, para
+                                      colorear el terreno y rotular los picos
+            elevaciones (numpy.array): Elevación (m) del punto del horizonte, para
+                                       rotular los picos con ella
+
+        Returns:
+            numpy.array: Imagen uint8 de forma (alto, ancho, 4)
+        """
+        colorear = distancias is not None and self.distancia_max is not None
+        perfil, dist_columnas = self.perfil_columnas(azimuts, angulos, distancias if colorear else None)
+        angulo_min = self.angulo_min
+        angulo_max = self.angulo_max
+        if angulo_max is None:
+            angulo_max = max(angulo_min + 5.0, 5.0 * math.ceil((perfil.max() + 1.0) / 5.0))
+        escala = (self.alto - 1) / (angulo_max - angulo_min)
+        filas_silueta = np.clip((angulo_max - perfil) * escala, -1, self.alto).round().astype(int)
+
+        # Terreno: todo lo que está bajo la silueta
+        terreno = self._filas >= filas_silueta
+        if colorear:
+            niveles = np.nan_to_num(dist_columnas / self.distancia_max * 255, nan=255)
+            colores = self._tabla_color[np.clip(niveles, 0, 255).astype(int)]
+        else:
+            colores = self._terreno
+        imagen = np.where(terreno, colores, self._cielo)
+
+        # Grilla de ángulos cada 5° (cada 10° si el rango es grande) sobre el
+        # cielo, con su valor
+        paso = 5 if angulo_max - angulo_min <= 30 else 10
+        for grados in range(paso * math.ceil(angulo_min / paso), int(angulo_max) + 1, paso):
+            fila = int(round((angulo_max - grados) * escala))
+            if 0 <= fila < self.alto:
+                np.putmask(imagen[fila], ~terreno[fila], self._grilla)
+                self._estampar(imagen, f"{grados}°", 2, fila + 2)
+
+        # Silueta: tramo vertical entre la fila de cada columna y la de su vecina
+        anterior = np.roll(filas_silueta, 1)
+        arriba = np.clip(np.minimum(filas_silueta, anterior), 0, self.alto)
+        abajo = np.clip(np.maximum(filas_silueta, anterior) + 1, -1, self.alto - 1)
+        largos = np.maximum(abajo - arriba + 1, 0)
+        inicios = np.cumsum(largos) - largos
+        filas = np.repeat(arriba - inicios, largos) + np.arange(largos.sum())
+        imagen[filas, np.repeat(np.arange(self.ancho), largos)] = self._silueta
+
+        for x, y, texto, columna in self._etiquetas(azimuts, angulos, distancias, elevaciones, filas_silueta):
+            # Rótulo sobre el pico y una línea hasta la silueta
+            self._estampar(imagen, texto, x, y)
+            imagen[y + 6 * self.escala_texto:filas_silueta[columna] - 1, columna] = self._texto
+        imagen.ravel()[self._marcas] = self._texto
+        return imagen.view(np.uint8).reshape(self.alto, self.ancho, 4)
+
+    def _etiquetas(self, azimuts, angulos, distancias, elevaciones, filas_silueta):
+        """Posición y texto de los rótulos de los picos más prominentes, sin superponerse"""
+        if not self.maximo_etiquetas or (distancias is None and elevaciones is None):
+            return []
+        indices, prominencia = prominencias(angulos)
+        elegidos = indices[prominencia >= self.prominencia_minima]
+        elegidos = elegidos[np.argsort(-prominencia[prominencia >= self.prominencia_minima])]
+        ocupados = []
+        etiquetas = []
+        alto_texto = 5 * self.escala_texto
+        for i in elegidos:
+            if elevaciones is not None and np.isfinite(elevaciones[i]):
+                texto = f"{elevaciones[i]:.0f}m"
+            elif distancias is not None and np.isfinite(distancias[i]):
+                texto = f"{distancias[i] / 1000:.1f}km"
+            else:
+                continue
+            columna = int(azimuts[i] % 360.0 * self.ancho / 360.0) % self.ancho
+            ancho = self._ancho_texto(texto)
+            x = min(max(columna - ancho // 2, 0), self.ancho - ancho)
+            if any(x < fin + 2 * self.escala_texto and inicio < x + ancho + 2 * self.escala_texto
+                   for inicio, fin in ocupados):
+                continue
+            y = filas_silueta[columna] - alto_texto - 4 * self.escala_texto
+            if y < 0:
+                continue
+            ocupados.append((x, x + ancho))
+            etiquetas.append((x, y, texto, columna))
+            if len(etiquetas) == self.maximo_etiquetas:
+                break
+        return etiquetas
+
+
+def leer_panoramas(ruta):
+    """
+    Recorre los panoramas de un archivo de resultados de lote.py o ruta.py.
+
+    Args:
+        ruta (str): Archivo .hzn o JSON lines
+
+    Yields:
+        tuple: (nombre, azimuts, angulos, distancias); los observadores con
+               error se omiten
+    """
+    if ruta.lower().endswith('.hzn'):
+        from formato import LectorHorizontes
+        lector = LectorHorizontes(ruta)
+        for registro in lector:
+            yield str(registro['indice']), registro['azimuts'], registro['angulos'], registro['distancias']
+        return
+    try:
+        archivo = sys.stdin if ruta == '-' else open(ruta, encoding='utf-8')
+    except Exception as e:
+        raise Exception(f"Error al leer los panoramas de {ruta}: {str(e)}")
+    with archivo:
+        for linea in archivo:
+            if not linea.strip():
+                continue
+            registro = json.loads(linea)
+            if 'error' in registro:
+                continue
+            valores = [np.array([np.nan if v is None else v for v in registro[clave]], dtype=np.float64)
+                       for clave in ('azimuts', 'angulos', 'distancias')]
+            yield (str(registro['nombre']), *valores)
+
+
+def main():
+    """Función principal de la línea de comandos"""
+    parser = argparse.ArgumentParser(description="Imágenes PNG de panoramas de horizonte")
+    parser.add_argument('entrada', help="Resultados de lote.py o ruta.py (.hzn o JSON lines)")
+    parser.add_argument('-d', '--directorio', default='imagenes', help="Directorio de salida")
+    parser.add_argument('--ancho', type=int, default=720, help="Ancho en píxeles")
+    parser.add_argument('--alto', type=int, default=240, help="Alto en píxeles")
+    parser.add_argument('--angulo-min', type=float, default=-5.0, help="Ángulo del borde inferior (grados)")
+    parser.add_argument('--angulo-max', type=float, default=None,
+                        help="Ángulo del borde superior (por defecto según cada panorama)")
+    parser.add_argument('--color-distancia', type=float, default=None, metavar='KM',
+                        help="Colorear el terreno por distancia hasta KM kilómetros")
+    parser.add_argument('--prominencia', type=float, default=PROMINENCIA_MINIMA,
+                        help="Prominencia mínima (grados) de los picos rotulados")
+    parser.add_argument('--etiquetas', type=int, default=MAXIMO_ETIQUETAS, help="Máximo de picos rotulados")
+    parser.add_argument('--compresion', type=int, default=1, help="Nivel de compresión PNG (0-9)")
+    args = parser.parse_args()
+
+    renderizador = RenderizadorPanorama(
+        args.ancho, args.alto, args.angulo_min, args.angulo_max,
+        distancia_max=args.color_distancia * 1000 if args.color_distancia else None,
+        prominencia_minima=args.prominencia, maximo_etiquetas=args.etiquetas)
+    os.makedirs(args.directorio, exist_ok=True)
+
+    inicio = time.perf_counter()
+    imagenes = 0
+    try:
+        for nombre, azimuts, angulos, distancias in leer_panoramas(args.entrada):
+            imagen = renderizador.renderizar(azimuts, angulos, distancias)
+            archivo = re.sub(r'[^\w.-]', '_', nombre) or str(imagenes)
+            escribir_png(os.path.join(args.directorio, f"{archivo}.png"), imagen, args.compresion)
+            imagenes += 1
+    except Exception as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    transcurrido = time.perf_counter() - inicio
+    print(f"{imagenes} imágenes en {transcurrido:.2f} s - {imagenes / max(transcurrido, 1e-9):.1f} imágenes/s",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
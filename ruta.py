@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Proyecto Horizonte - Horizontes a lo largo de una ruta
+======================================================
+
+Calcula la vista panorámica 360° en puntos equiespaciados de una ruta
+(sendero, carretera) leída de un archivo GPX, de una polilínea GeoJSON o CSV,
+o dada directamente en la línea de comandos.
+
+La ruta se remuestrea sobre el elipsoide cada --espaciado metros y se divide
+en tramos contiguos que se reparten entre procesos. Dentro de cada tramo los
+puntos se calculan en orden con un PanoramaIncremental (ver incremental.py):
+de un punto al siguiente se trasladan las muestras de los rayos y sólo se
+vuelven a leer las que cambian de celda, y como los puntos consecutivos están
+a pocos metros, las teselas que se leen son siempre las mismas. Los resultados se
+escriben en el orden de la ruta a medida que terminan los tramos.
+
+Uso:
+    python ruta.py sendero.gpx -o sendero.jsonl --espaciado 25
+    python ruta.py --polilinea="-1.25,-78.62;-1.30,-78.60" -o ruta.hzn
+
+Formatos de entrada:
+    - .gpx: puntos de track (trkpt) o, si no hay, de ruta (rtept)
+    - .geojson/.json: LineString o MultiLineString (la primera entidad lineal)
+    - cualquier otro: CSV con columnas lat y lon, en el orden de la ruta
+
+Formato de salida: igual que lote.py (.hzn o JSON lines); el nombre de cada
+punto es su distancia a lo largo de la ruta en metros.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import lote
+from horizonte import calcular_panorama, elevacion_observador, obtener_geodesico, COEFICIENTE_REFRACCION
+from incremental import PanoramaIncremental
+from lote import SalidaBinaria, SalidaJSONL, _inicializar_trabajador
+
+# Puntos consecutivos de la ruta que calcula cada tarea con un mismo estado incremental
+PUNTOS_POR_TRAMO = 256
+
+
+def leer_gpx(ruta):
+    """Vértices (lat, lon) de los tracks de un GPX o, si no tiene, de sus rutas"""
+    raiz = ET.parse(ruta).getroot()
+    # Se ignora el espacio de nombres (GPX 1.0 y 1.1 usan distintos)
+    etiquetas = {}
+    for elemento in raiz.iter():
+        etiquetas.setdefault(elemento.tag.rsplit('}', 1)[-1], []).append(elemento)
+    puntos = etiquetas.get('trkpt') or etiquetas.get('rtept') or []
+    return [(float(p.get('lat')), float(p.get('lon'))) for p in puntos]
+
+
+def leer_geojson(ruta):
+    """Vértices (lat, lon) de la primera LineString o MultiLineString de un GeoJSON"""
+    with open(ruta, encoding='utf-8') as archivo:
+        datos = json.load(archivo)
+    entidades = datos.get('features', [datos]) if isinstance(datos, dict) else datos
+    for entidad in entidades:
+        geometria = entidad.get('geometry', entidad) or {}
+        if geometria.get('type') == 'LineString':
+            lineas = [geometria['coordinates']]
+        elif geometria.get('type') == 'MultiLineString':
+            lineas = geometria['coordinates']
+        else:
+            continue
+        return [(float(lat), float(lon)) for linea in lineas for lon, lat, *_ in linea]
+    return []
+
+
+def leer_polilinea(texto):
+    """Vértices de una polilínea escrita como 'lat,lon;lat,lon;...'"""
+    vertices = []
+    for par in texto.replace('\n', ';').split(';'):
+        if par.strip():
+            lat, lon = par.split(',')
+            vertices.append((float(lat), float(lon)))
+    return vertices
+
+
+def leer_ruta(ruta):
+    """
+    Lee los vértices de una ruta.
+
+    Args:
+        ruta (str): Archivo .gpx, .geojson/.json o CSV con columnas lat y lon
+
+    Returns:
+        list: Vértices (lat, lon) en el orden de la ruta
+    """
+    try:
+        extension = os.path.splitext(ruta)[1].lower()
+        if extension == '.gpx':
+            vertices = leer_gpx(ruta)
+        elif extension in ('.json', '.geojson'):
+            vertices = leer_geojson(ruta)
+        else:
+            with open(ruta, newline='', encoding='utf-8') as archivo:
+                vertices = []
+                for fila in csv.DictReader(archivo):
+                    fila = {clave.strip().lower(): valor for clave, valor in fila.items() if clave}
+                    vertices.append((float(fila['lat']), float(fila['lon'])))
+    except Exception as e:
+        raise Exception(f"Error al leer la ruta de {ruta}: {str(e)}")
+    if len(vertices) < 1:
+        raise Exception(f"La ruta {ruta} no tiene puntos")
+    return vertices
+
+
+def remuestrear_ruta(vertices, espaciado):
+    """
+    Puntos cada `espaciado` metros a lo largo de la ruta (geodésicas entre vértices).
+
+    Args:
+        vertices (list): Vértices (lat, lon)
+        espaciado (float): Distancia entre puntos en metros
+
+    Returns:
+        tuple: (lats, lons, distancias) arreglos; el primer y el último
+               vértice siempre se incluyen
+    """
+    if espaciado <= 0:
+        raise ValueError("El espaciado debe ser positivo")
+    lats = np.array([v[0] for v in vertices], dtype=np.float64)
+    lons = np.array([v[1] for v in vertices], dtype=np.float64)
+    if len(vertices) == 1:
+        return lats, lons, np.zeros(1)
+
+    geod = obtener_geodesico()
+    azimuts, _, longitudes = geod.inv(lons[:-1], lats[:-1], lons[1:], lats[1:])
+    acumulada = np.concatenate([[0.0], np.cumsum(longitudes)])
+    total = acumulada[-1]
+    if total == 0:
+        # Todos los vértices coinciden: la ruta es un solo punto
+        return lats[:1], lons[:1], np.zeros(1)
+    distancias = np.arange(0.0, total, espaciado)
+    if total - distancias[-1] > 1e-6 or len(distancias) == 1:
+        distancias = np.append(distancias, total)
+
+    # Cada punto avanza desde el vértice anterior por la geodésica de su segmento
+    segmento = np.clip(np.searchsorted(acumulada, distancias, side='right') - 1, 0, len(longitudes) - 1)
+    lons_r, lats_r, _ = geod.fwd(lons[segmento], lats[segmento], azimuts[segmento],
+                                 distancias - acumulada[segmento])
+    return np.asarray(lats_r), np.asarray(lons_r), distancias
+
+
+def _calcular_tramo(tramo, opciones):
+    """
+    Calcula en orden los panoramas de un tramo contiguo de la ruta.
+
+    Returns:
+        list: Tuplas (indice, panorama, elevacion, error) con panorama None si falló
+    """
+    mosaico, transform, bounds = lote._fuente
+    opciones = dict(opciones)
+    exacto = opciones.pop('exacto')
+    pasos_azimut = opciones.pop('pasos_azimut')
+    pasos = opciones.pop('pasos')
+    incremental = PanoramaIncremental(mosaico, transform, bounds, pasos_azimut, pasos, opciones['distancia_max'])
+    resultados = []
+    for indice, punto in tramo:
+        try:
+            elevacion = elevacion_observador(punto['lat'], punto['lon'], mosaico, transform, bounds)
+            if exacto:
+                panorama = calcular_panorama(punto['lat'], punto['lon'], mosaico, transform, bounds,
+                                             pasos_azimut=pasos_azimut, pasos=pasos,
+                                             altura_observador=punto['altura'], **opciones)
+            else:
+                panorama = incremental.calcular(punto['lat'], punto['lon'],
+                                                altura_observador=punto['altura'], **opciones)
+            resultados.append((indice, panorama, elevacion, None))
+        except Exception as e:
+            resultados.append((indice, None, None, str(e)))
+    return resultados
+
+
+def calcular_ruta(puntos, directorio='datos', trabajadores=None, pasos_azimut=360, pasos=200,
+                  distancia_max=100000, curvatura=True, refraccion=COEFICIENTE_REFRACCION, exacto=False):
+    """
+    Calcula los panoramas de los puntos de una ruta, en orden.
+
+    Es un generador: entrega los resultados en el orden de la ruta, tramo a
+    tramo, con un número acotado de tramos en curso.
+
+    Args:
+        puntos (list): Diccionarios con claves nombre, lat, lon y altura, en orden
+        directorio (str): Directorio con las teselas .hgt
+        trabajadores (int): Número de procesos (None = núcleos disponibles,
+                            0 = calcular en el proceso actual)
+        pasos_azimut (int): Número de direcciones por panorama
+        pasos (int): Número de muestras por dirección
+        distancia_max (float): Distancia máxima en metros
+        curvatura (bool): Corregir por curvatura terrestre y refracción
+        refraccion (float): Coeficiente de refracción atmosférica
+        exacto (bool): Calcular cada punto desde cero con calcular_panorama
+
+    Yields:
+        tuple: (punto, panorama, error) igual que lote.calcular_lote
+    """
+    opciones = {
+        'pasos_azimut': pasos_azimut,
+        'pasos': pasos,
+        'distancia_max': distancia_max,
+        'curvatura': curvatura,
+        'refraccion': refraccion,
+        'exacto': exacto,
+    }
+    indexados = list(enumerate(puntos))
+    tramos = [indexados[i:i + PUNTOS_POR_TRAMO] for i in range(0, len(indexados), PUNTOS_POR_TRAMO)]
+
+    def entregar(resultados):
+        for indice, panorama, elevacion, error in resultados:
+            yield dict(puntos[indice], indice=indice, elevacion=elevacion), panorama, error
+
+    if trabajadores == 0 or len(tramos) == 1:
+        _inicializar_trabajador(directorio)
+        for tramo in tramos:
+            yield from entregar(_calcular_tramo(tramo, opciones))
+        return
+
+    trabajadores = trabajadores or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=trabajadores, initializer=_inicializar_trabajador,
+                             initargs=(directorio,)) as ejecutor:
+        pendientes = iter(tramos)
+        en_curso = deque()
+        while True:
+            while len(en_curso) < 2 * trabajadores:
+                tramo = next(pendientes, None)
+                if tramo is None:
+                    break
+                en_curso.append(ejecutor.submit(_calcular_tramo, tramo, opciones))
+            if not en_curso:
+                break
+            # El más antiguo primero, para escribir en el orden de la ruta
+            yield from entregar(en_curso.popleft().result())
+
+
+def main():
+    """Función principal de la línea de comandos"""
+    parser = argparse.ArgumentParser(description="Horizontes 360° a lo largo de una ruta")
+    parser.add_argument('entrada', nargs='?', help="Archivo GPX, GeoJSON (LineString) o CSV con la ruta")
+    parser.add_argument('--polilinea', help="Ruta como --polilinea=\"lat,lon;lat,lon;...\" en lugar de un archivo")
+    parser.add_argument('-o', '--salida', default='-', help="Archivo de resultados (.hzn o JSON lines, '-' = stdout)")
+    parser.add_argument('--espaciado', type=float, default=50.0, help="Metros entre puntos de la ruta")
+    parser.add_argument('--altura', type=float, default=0.0, help="Altura del observador sobre el terreno (m)")
+    parser.add_argument('--datos', default='datos', help="Directorio con las teselas .hgt")
+    parser.add_argument('--trabajadores', type=int, default=None, help="Número de procesos")
+    parser.add_argument('--azimuts', type=int, default=360, help="Direcciones por panorama")
+    parser.add_argument('--pasos', type=int, default=200, help="Muestras por dirección")
+    parser.add_argument('--distancia', type=float, default=100, help="Distancia máxima en km")
+    parser.add_argument('--refraccion', type=float, default=COEFICIENTE_REFRACCION, help="Coeficiente de refracción")
+    parser.add_argument('--sin-curvatura', action='store_true', help="Usar el modelo de tierra plana")
+    parser.add_argument('--exacto', action='store_true',
+                        help="Calcular cada punto desde cero (sin reutilizar muestras)")
+    args = parser.parse_args()
+
+    if (args.entrada is None) == (args.polilinea is None):
+        parser.error("Indique un archivo de ruta o --polilinea (sólo uno)")
+    try:
+        vertices = leer_polilinea(args.polilinea) if args.polilinea else leer_ruta(args.entrada)
+        lats, lons, recorridos = remuestrear_ruta(vertices, args.espaciado)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        return 1
+    puntos = [{'nombre': f"{recorrido:.1f}", 'lat': float(lat), 'lon': float(lon), 'altura': args.altura}
+              for lat, lon, recorrido in zip(lats, lons, recorridos)]
+    print(f"Ruta de {recorridos[-1] / 1000:.2f} km: {len(puntos)} puntos cada {args.espaciado:g} m",
+          file=sys.stderr)
+
+    distancia_max = args.distancia * 1000
+    curvatura = not args.sin_curvatura
+    try:
+        if args.salida.lower().endswith('.hzn'):
+            salida = SalidaBinaria(args.salida, args.azimuts, distancia_max, curvatura, args.refraccion)
+        else:
+            salida = SalidaJSONL(args.salida)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    inicio = time.perf_counter()
+    completados = 0
+    errores = 0
+    try:
+        for punto, panorama, error in calcular_ruta(
+                puntos, directorio=args.datos, trabajadores=args.trabajadores,
+                pasos_azimut=args.azimuts, pasos=args.pasos, distancia_max=distancia_max,
+                curvatura=curvatura, refraccion=args.refraccion, exacto=args.exacto):
+            salida.escribir(punto, panorama, error)
+            completados += 1
+            errores += error is not None
+    finally:
+        salida.close()
+
+    transcurrido = time.perf_counter() - inicio
+    print(f"Completados {completados} puntos ({errores} con error) en {transcurrido:.2f} s "
+          f"- {completados / max(transcurrido, 1e-9):.1f} puntos/s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Proyecto Horizonte - Servidor local de horizontes
+=================================================
+
+Servidor HTTP/JSON (asyncio, sólo biblioteca estándar) que mantiene abiertos
+el mosaico de teselas y la caché de panoramas, para que las herramientas que
+necesitan horizontes no tengan que arrancar un proceso y volver a mapear las
+teselas en cada consulta.
+
+Los cálculos corren en un ProcessPoolExecutor con los mismos trabajadores que
+lote.py. Las consultas idénticas simultáneas (misma celda del DEM y mismas
+opciones, ver CacheHorizonte.clave) se resuelven con un único cálculo, y las
+consultas distintas que llegan en la misma ventana de ESPERA_AGRUPACION se
+envían juntas al trabajador, ordenadas por tesela, en tareas de hasta
+PUNTOS_POR_TAREA observadores (cada uno con su propia llamada a
+calcular_panorama, que ya vectoriza todos sus rayos).
+
+Uso:
+    python servidor.py --puerto 8765
+    python servidor.py --socket /tmp/horizonte.sock --trabajadores 4
+
+Consultas:
+    GET  /panorama?lat=-1.2544&lon=-78.6269[&altura=0&azimuts=360&pasos=200
+                   &distancia=100&modo=uniforme|piramide|adaptativo
+                   &sin_curvatura=1&refraccion=0.13]
+    POST /panorama    cuerpo JSON con las mismas claves, o una lista de ellas
+    GET  /estado      contadores del servidor, de la caché y de la instrumentación
+
+La respuesta de /panorama incluye el centro de la celda del observador (lat,
+lon), azimuts, angulos y distancias (null donde no hay datos) y origen:
+'cache', 'calculado' o 'coalescido' (esperó el cálculo de otra consulta).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from cache import CacheHorizonte
+from horizonte import cargar_mosaico, elevacion_observador, COEFICIENTE_REFRACCION
+from instrumentacion import instrumentacion
+from lote import PUNTOS_POR_TAREA, _a_lista, _inicializar_trabajador, _calcular_tarea, _calcular_tarea_trabajador
+
+# Tiempo (s) que una consulta nueva espera a otras para viajar en la misma tarea
+ESPERA_AGRUPACION = 0.002
+
+# Tamaño máximo del cuerpo de una consulta POST (bytes)
+MAXIMO_CUERPO = 1 << 20
+
+# Modos de muestreo aceptados en el parámetro modo
+MODOS = ('uniforme', 'piramide', 'adaptativo')
+
+MOTIVOS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def _booleano(valor):
+    """Interpreta banderas de la cadena de consulta ('1', 'true', 'si') o de JSON"""
+    if isinstance(valor, str):
+        return valor.strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+    return bool(valor)
+
+
+def leer_consulta(parametros):
+    """
+    Valida los parámetros de una consulta de panorama.
+
+    Args:
+        parametros (dict): Parámetros de la cadena de consulta o del cuerpo JSON
+
+    Returns:
+        tuple: (lat, lon, altura, opciones) con opciones en el formato de
+               calcular_panorama (pasos_azimut, pasos, distancia_max, ...)
+    """
+    if not isinstance(parametros, dict):
+        raise ValueError("Cada consulta debe ser un objeto JSON")
+    try:
+        lat = float(parametros['lat'])
+        lon = float(parametros['lon'])
+        altura = float(parametros.get('altura', 0.0))
+        pasos_azimut = int(parametros.get('azimuts', 360))
+        pasos = int(parametros.get('pasos', 200))
+        distancia = float(parametros.get('distancia', 100))
+        refraccion = float(parametros.get('refraccion', COEFICIENTE_REFRACCION))
+    except KeyError as e:
+        raise ValueError(f"Falta el parámetro {e.args[0]}")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Parámetro inválido: {str(e)}")
+    modo = parametros.get('modo', 'uniforme')
+    if modo not in MODOS:
+        raise ValueError(f"Modo desconocido: {modo} (use {', '.join(MODOS)})")
+    if not (math.isfinite(lat) and math.isfinite(lon) and math.isfinite(altura)):
+        raise ValueError("Coordenadas o altura no finitas")
+    if not 1 <= pasos_azimut <= 36000 or not 2 <= pasos <= 100000 or not 0 < distancia <= 1000:
+        raise ValueError("azimuts debe estar en [1, 36000], pasos en [2, 100000] y distancia en (0, 1000] km")
+
+    opciones = {
+        'pasos_azimut': pasos_azimut,
+        'pasos': pasos,
+        'distancia_max': distancia * 1000,
+        'curvatura': not _booleano(parametros.get('sin_curvatura', False)),
+        'refraccion': refraccion,
+        'piramide': modo == 'piramide',
+        'adaptativo': modo == 'adaptativo',
+    }
+    return lat, lon, altura, opciones
+
+
+class ServidorHorizonte:
+    """
+    Estado del servidor: mosaico, caché, consultas en curso y cola de agrupación.
+
+    Todos los métodos corren en el bucle de eventos salvo los cálculos, que
+    se delegan al ejecutor.
+    """
+
+    def __init__(self, directorio='datos', trabajadores=None, directorio_cache=None, capacidad=4096):
+        """
+        Args:
+            directorio (str): Directorio con las teselas .hgt
+            trabajadores (int): Número de procesos (None = núcleos disponibles,
+                                0 = un hilo en el proceso del servidor)
+            directorio_cache (str): Directorio para la caché en disco (None = sólo memoria)
+            capacidad (int): Panoramas en la caché en memoria
+        """
+        # El mosaico del servidor sólo se usa para validar observadores y para
+        # las claves y huellas de caché
+        self.mosaico, self.transform, self.bounds = cargar_mosaico(directorio)
+        self.cache = CacheHorizonte(directorio_cache, capacidad)
+        # En un hilo la instrumentación ya es la del servidor; los procesos envían la suya
+        self._en_hilo = trabajadores == 0
+        if self._en_hilo:
+            self.ejecutor = ThreadPoolExecutor(max_workers=1, initializer=_inicializar_trabajador,
+                                               initargs=(directorio,))
+        else:
+            self.ejecutor = ProcessPoolExecutor(max_workers=trabajadores or os.cpu_count() or 1,
+                                                initializer=_inicializar_trabajador,
+                                                initargs=(directorio, instrumentacion.activa))
+        self._en_curso = {}      # clave de caché -> asyncio.Future del cálculo
+        self._pendientes = {}    # opciones (tupla) -> [(clave, punto)] aún sin enviar
+        self.solicitudes = 0
+        self.coalescidas = 0
+        self.calculadas = 0
+        self.tareas = 0
+
+    def estado(self):
+        """Contadores del servidor como diccionario"""
+        estado = {
+            'solicitudes': self.solicitudes,
+            'coalescidas': self.coalescidas,
+            'calculadas': self.calculadas,
+            'tareas': self.tareas,
+            'en_curso': len(self._en_curso),
+            'cache': self.cache.estadisticas(),
+        }
+        if instrumentacion.activa:
+            estado['instrumentacion'] = instrumentacion.resumen()
+        return estado
+
+    async def panorama(self, parametros):
+        """
+        Resuelve una consulta de panorama desde la caché, un cálculo en curso o uno nuevo.
+
+        Las consultas inválidas (incluido un observador fuera de las teselas o
+        sobre un vacío) se rechazan antes de encolarlas, así que un error del
+        trabajador es siempre un error del servidor.
+
+        Returns:
+            dict: Respuesta JSON de la consulta
+
+        Raises:
+            ValueError: Si la consulta es inválida (HTTP 400)
+            Exception: Si falló el cálculo (HTTP 500)
+        """
+        lat, lon, altura, opciones = leer_consulta(parametros)
+        self.solicitudes += 1
+        clave, lat_centro, lon_centro = self.cache.clave(lat, lon, self.mosaico, self.transform,
+                                                         altura_observador=altura, **opciones)
+
+        futuro = self._en_curso.get(clave)
+        if futuro is not None:
+            self.coalescidas += 1
+            origen = 'coalescido'
+        else:
+            panorama = self.cache.buscar(clave)
+            if panorama is not None:
+                return self._respuesta(lat_centro, lon_centro, altura, panorama, 'cache')
+            try:
+                elevacion_observador(lat_centro, lon_centro, self.mosaico, self.transform, self.bounds)
+            except Exception as e:
+                raise ValueError(str(e))
+            futuro = asyncio.get_running_loop().create_future()
+            self._en_curso[clave] = futuro
+            self._encolar(opciones, clave, {'lat': lat_centro, 'lon': lon_centro, 'altura': altura})
+            origen = 'calculado'
+
+        # shield: si el cliente se desconecta, el cálculo sigue para los demás
+        panorama, error = await asyncio.shield(futuro)
+        if error is not None:
+            raise Exception(f"Error del cálculo: {error}")
+        return self._respuesta(lat_centro, lon_centro, altura, panorama, origen)
+
+    def _respuesta(self, lat, lon, altura, panorama, origen):
+        return {
+            'lat': round(lat, 7),
+            'lon': round(lon, 7),
+            'altura': altura,
+            'origen': origen,
+            'azimuts': _a_lista(panorama.azimuts),
+            'angulos': _a_lista(panorama.angulos),
+            'distancias': _a_lista(panorama.distancias),
+        }
+
+    def _encolar(self, opciones, clave, punto):
+        """Agrega un observador a la cola de sus opciones y programa el envío"""
+        grupo = tuple(sorted(opciones.items()))
+        cola = self._pendientes.setdefault(grupo, [])
+        cola.append((clave, punto))
+        if len(cola) >= PUNTOS_POR_TAREA:
+            self._despachar(grupo)
+        elif len(cola) == 1:
+            asyncio.get_running_loop().call_later(ESPERA_AGRUPACION, self._despachar, grupo)
+
+    def _despachar(self, grupo):
+        """Envía al ejecutor los observadores acumulados de un grupo de opciones"""
+        cola = self._pendientes.pop(grupo, None)
+        if not cola:
+            return
+        # Observadores de la misma tesela juntos: el trabajador recorre las mismas páginas
+        cola.sort(key=lambda par: (math.floor(par[1]['lat']), math.floor(par[1]['lon'])))
+        self.tareas += 1
+        asyncio.get_running_loop().create_task(self._calcular(dict(grupo), cola))
+
+    async def _calcular(self, opciones, cola):
+        """Calcula una tarea en el ejecutor y resuelve los futuros de sus observadores"""
+        tarea = [(indice, punto) for indice, (_, punto) in enumerate(cola)]
+        bucle = asyncio.get_running_loop()
+        try:
+            if self._en_hilo:
+                resultados, resumen = await bucle.run_in_executor(self.ejecutor, _calcular_tarea, tarea, opciones), None
+            else:
+                resultados, resumen = await bucle.run_in_executor(self.ejecutor, _calcular_tarea_trabajador,
+                                                                  tarea, opciones)
+        except Exception as e:
+            resultados, resumen = [(indice, None, None, f"Error del trabajador: {str(e)}")
+                                   for indice, _ in tarea], None
+        if resumen is not None:
+            instrumentacion.combinar(resumen)
+        for indice, panorama, _, error in resultados:
+            clave = cola[indice][0]
+            if error is None:
+                self.calculadas += 1
+                self.cache.guardar(clave, panorama)
+            futuro = self._en_curso.pop(clave)
+            if not futuro.done():
+                futuro.set_result((panorama, error))
+
+    async def responder(self, metodo, ruta, cuerpo):
+        """
+        Atiende una consulta HTTP ya leída.
+
+        Returns:
+            tuple: (código de estado, objeto JSON de la respuesta)
+        """
+        url = urllib.parse.urlsplit(ruta)
+        if url.path == '/estado':
+            return (200, self.estado()) if metodo == 'GET' else (405, {'error': "Use GET"})
+        if url.path != '/panorama':
+            return 404, {'error': f"Ruta desconocida: {url.path}"}
+        try:
+            if metodo == 'GET':
+                parametros = dict(urllib.parse.parse_qsl(url.query))
+            elif metodo == 'POST':
+                parametros = json.loads(cuerpo or b'{}')
+            else:
+                return 405, {'error': "Use GET o POST"}
+            if not isinstance(parametros, list):
+                return 200, await self.panorama(parametros)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+
+        # Lista de consultas: todas se encolan a la vez y se agrupan entre sí;
+        # los errores van en el elemento de cada consulta
+        async def una(consulta):
+            try:
+                return await self.panorama(consulta)
+            except Exception as e:
+                return {'error': str(e)}
+        return 200, await asyncio.gather(*(una(consulta) for consulta in parametros))
+
+    async def atender(self, lector, escritor):
+        """Conexión HTTP/1.1 con keep-alive: lee consultas hasta que el cliente cierre"""
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                metodo, ruta, version = linea.decode('latin-1').split()
+                cabeceras = {}
+                while True:
+                    linea = await lector.readline()
+                    if linea in (b'\r\n', b'\n', b''):
+                        break
+                    nombre, _, valor = linea.decode('latin-1').partition(':')
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+                largo = int(cabeceras.get('content-length', 0))
+                mantener = version == 'HTTP/1.1' and cabeceras.get('connection', '').lower() != 'close'
+                if largo > MAXIMO_CUERPO:
+                    estado, respuesta, mantener = 413, {'error': "Cuerpo demasiado grande"}, False
+                else:
+                    cuerpo = await lector.readexactly(largo) if largo else b''
+                    try:
+                        estado, respuesta = await self.responder(metodo, ruta, cuerpo)
+                    except Exception as e:
+                        estado, respuesta = 500, {'error': str(e)}
+                datos = json.dumps(respuesta, ensure_ascii=False).encode('utf-8')
+                escritor.write(f"HTTP/1.1 {estado} {MOTIVOS[estado]}\r\n"
+                               f"Content-Type: application/json; charset=utf-8\r\n"
+                               f"Content-Length: {len(datos)}\r\n"
+                               f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n".encode('latin-1')
+                               + datos)
+                await escritor.drain()
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # Cliente desconectado o consulta mal formada: se cierra la conexión
+        finally:
+            escritor.close()
+
+    async def escuchar(self, host='127.0.0.1', puerto=8765, socket=None):
+        """
+        Abre el servidor (sin bloquear).
+
+        Args:
+            host (str): Dirección de escucha
+            puerto (int): Puerto TCP (0 = uno libre)
+            socket (str): Ruta de un socket Unix (reemplaza host y puerto)
+
+        Returns:
+            asyncio.Server: Servidor abierto
+        """
+        if socket is not None:
+            return await asyncio.start_unix_server(self.atender, path=socket)
+        return await asyncio.start_server(self.atender, host, puerto)
+
+    def cerrar(self):
+        """Detiene los trabajadores"""
+        self.ejecutor.shutdown(cancel_futures=True)
+
+
+async def servir(servidor, host, puerto, socket=None):
+    """Atiende consultas hasta que se interrumpa el proceso"""
+    abierto = await servidor.escuchar(host, puerto, socket)
+    direccion = socket if socket is not None else "http://{}:{}".format(*abierto.sockets[0].getsockname()[:2])
+    print(f"Servidor de horizontes escuchando en {direccion}", file=sys.stderr)
+    async with abierto:
+        await abierto.serve_forever()
+
+
+def main():
+    """Función principal de la línea de comandos"""
+    parser = argparse.ArgumentParser(description="Servidor local de horizontes (HTTP/JSON)")
+    parser.add_argument('--host', default='127.0.0.1', help="Dirección de escucha")
+    parser.add_argument('--puerto', type=int, default=8765, help="Puerto TCP")
+    parser.add_argument('--socket', default=None, help="Escuchar en un socket Unix en lugar de TCP")
+    parser.add_argument('--datos', default='datos', help="Directorio con las teselas .hgt")
+    parser.add_argument('--trabajadores', type=int, default=None,
+                        help="Número de procesos (0 = calcular en un hilo del servidor)")
+    parser.add_argument('--cache', default=None, help="Directorio de la caché en disco")
+    parser.add_argument('--capacidad', type=int, default=4096, help="Panoramas en la caché en memoria")
+    parser.add_argument('--instrumentar', action='store_true', help="Incluir la instrumentación en /estado")
+    args = parser.parse_args()
+    if args.instrumentar:
+        instrumentacion.activar()
+
+    try:
+        servidor = ServidorHorizonte(args.datos, args.trabajadores, args.cache, args.capacidad)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        return 1
+    try:
+        asyncio.run(servir(servidor, args.host, args.puerto, args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.cerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Archivos .hzn: ida y vuelta, acceso aleatorio y límites de la cuantización.
+
+Los ángulos se guardan en float16 (error de a lo sumo medio ulp: 1/64° entre
+32° y 64°) y las distancias en uint16 con escala distancia_max / 65534
+(error de a lo sumo media escala; SIN_DISTANCIA marca la falta de datos).
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from formato import SIN_DISTANCIA, EscritorHorizontes, LectorHorizontes
+from horizonte import Panorama
+
+PASOS_AZIMUT = 72
+DISTANCIA_MAX = 100000.0
+
+
+def panorama_aleatorio(generador):
+    angulos = generador.uniform(-90, 90, PASOS_AZIMUT)
+    distancias = generador.uniform(100, DISTANCIA_MAX, PASOS_AZIMUT)
+    distancias[generador.random(PASOS_AZIMUT) < 0.1] = np.nan
+    vacio = np.full(PASOS_AZIMUT, np.nan)
+    return Panorama(np.linspace(0, 360, PASOS_AZIMUT, endpoint=False), angulos, distancias, vacio, vacio, vacio)
+
+
+@pytest.fixture
+def escritos(tmp_path):
+    """Archivo con 50 observadores aleatorios; devuelve (ruta, [(lat, lon, altura, elevación, panorama)])"""
+    generador = np.random.default_rng(6)
+    ruta = str(tmp_path / 'prueba.hzn')
+    observadores = [(generador.uniform(-5, 2), generador.uniform(-81, -75), float(i % 3), generador.uniform(0, 6000),
+                     panorama_aleatorio(generador)) for i in range(50)]
+    with EscritorHorizontes(ruta, PASOS_AZIMUT, DISTANCIA_MAX, curvatura=True, refraccion=0.13) as escritor:
+        for lat, lon, altura, elevacion, panorama in observadores:
+            escritor.agregar(lat, lon, panorama, altura=altura, elevacion=elevacion)
+    return ruta, observadores
+
+
+def comprobar(leido, esperado, escala):
+    lat, lon, altura, elevacion, panorama = esperado
+    assert (leido['lat'], leido['lon'], leido['altura']) == (lat, lon, altura)
+    assert leido['elevacion'] == np.float32(elevacion)
+    np.testing.assert_array_equal(leido['azimuts'], panorama.azimuts)
+
+    medio_ulp = np.spacing(np.abs(panorama.angulos).astype(np.float16)).astype(np.float64) / 2
+    assert np.all(np.abs(leido['angulos'] - panorama.angulos) <= medio_ulp)
+
+    sin_datos = np.isnan(panorama.distancias)
+    np.testing.assert_array_equal(np.isnan(leido['distancias']), sin_datos)
+    assert np.all(np.abs(leido['distancias'] - panorama.distancias)[~sin_datos] <= escala / 2 + 1e-9)
+
+
+def test_ida_y_vuelta(escritos):
+    ruta, observadores = escritos
+    lector = LectorHorizontes(ruta)
+    assert len(lector) == len(observadores)
+    assert (lector.pasos_azimut, lector.distancia_max, lector.curvatura, lector.refraccion) == \
+        (PASOS_AZIMUT, DISTANCIA_MAX, True, 0.13)
+    for i, leido in enumerate(lector):
+        assert leido['indice'] == i
+        comprobar(leido, observadores[i], lector.escala_distancia)
+
+
+def test_acceso_aleatorio(escritos):
+    ruta, observadores = escritos
+    lector = LectorHorizontes(ruta)
+    for i in np.random.default_rng(7).permutation(len(observadores)):
+        comprobar(lector[i], observadores[i], lector.escala_distancia)
+    comprobar(lector[-1], observadores[-1], lector.escala_distancia)
+
+
+def test_limites_de_cuantizacion(tmp_path):
+    ruta = str(tmp_path / 'limites.hzn')
+    angulos = np.array([90.0, -90.0, 0.0, 1e-5, 45.0 + 1 / 64, 89.99])
+    distancias = np.array([0.0, DISTANCIA_MAX, 2 * DISTANCIA_MAX, np.nan, DISTANCIA_MAX / 3, 100.0])
+    vacio = np.full(len(angulos), np.nan)
+    with EscritorHorizontes(ruta, len(angulos), DISTANCIA_MAX) as escritor:
+        escritor.agregar(0.0, 0.0, Panorama(np.zeros(len(angulos)), angulos, distancias, vacio, vacio, vacio))
+
+    lector = LectorHorizontes(ruta)
+    leido = lector[0]
+    # ±90° y 0 son exactos; el resto cae a menos de medio ulp de float16
+    np.testing.assert_array_equal(leido['angulos'][:3], [90.0, -90.0, 0.0])
+    medio_ulp = np.spacing(np.float16(angulos[3:])).astype(np.float64) / 2
+    assert np.all(np.abs(leido['angulos'][3:] - angulos[3:]) <= medio_ulp)
+    assert medio_ulp.max() == 1 / 32
+
+    # distancia_max es el mayor valor representable; más allá se recorta
+    assert lector.escala_distancia == DISTANCIA_MAX / (SIN_DISTANCIA - 1)
+    assert leido['distancias'][0] == 0.0
+    assert leido['distancias'][1] == pytest.approx(DISTANCIA_MAX, abs=1e-6)
+    assert leido['distancias'][2] == pytest.approx(DISTANCIA_MAX, abs=1e-6)
+    assert np.isnan(leido['distancias'][3])
+    assert abs(leido['distancias'][4] - DISTANCIA_MAX / 3) <= lector.escala_distancia / 2
+    assert abs(leido['distancias'][5] - 100.0) <= lector.escala_distancia / 2
+
+
+def test_lectura_antes_de_cerrar(tmp_path):
+    ruta = str(tmp_path / 'abierto.hzn')
+    generador = np.random.default_rng(8)
+    escritor = EscritorHorizontes(ruta, PASOS_AZIMUT, DISTANCIA_MAX)
+    for _ in range(3):
+        escritor.agregar(-1.0, -78.0, panorama_aleatorio(generador))
+    escritor._archivo.flush()
+    assert len(LectorHorizontes(ruta)) == 3
+    escritor.close()
+
+
+def test_panorama_de_otro_tamano(tmp_path):
+    vacio = np.full(10, np.nan)
+    with EscritorHorizontes(str(tmp_path / 'x.hzn'), PASOS_AZIMUT, DISTANCIA_MAX) as escritor:
+        with pytest.raises(ValueError):
+            escritor.agregar(0.0, 0.0, Panorama(vacio, vacio, vacio, vacio, vacio, vacio))
@@ -0,0 +1,110 @@
+"""
+PanoramaIncremental debe dar lo mismo que un cálculo desde cero.
+
+Cada prueba compara el resultado tras extender, recortar, mover el
+observador o reconstruir con un PanoramaIncremental nuevo para la misma
+consulta (misma grilla de distancias), y éste con calcular_panorama.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from horizonte import calcular_panorama
+from incremental import PanoramaIncremental
+from mosaico import MosaicoDEM
+
+DATOS = os.path.join(RAIZ, 'datos')
+
+# Ambato, la cordillera occidental y el Cajas
+OBSERVADORES = [(-1.2544, -78.6269), (-1.5, -79.35), (-2.9, -78.99)]
+
+
+@pytest.fixture(scope='module')
+def mosaico():
+    if not os.path.isdir(DATOS):
+        pytest.skip("No están las teselas de ejemplo")
+    return MosaicoDEM(DATOS)
+
+
+def nuevo(mosaico, distancia_max=100000):
+    return PanoramaIncremental(mosaico, mosaico.transform, mosaico.bounds, distancia_max=distancia_max)
+
+
+def desde_cero(mosaico, lat, lon, **opciones):
+    return nuevo(mosaico).calcular(lat, lon, **opciones)
+
+
+def comparar(obtenido, esperado, atol=0.0):
+    for campo in ('angulos', 'distancias', 'lats', 'lons', 'elevaciones'):
+        np.testing.assert_allclose(getattr(obtenido, campo), getattr(esperado, campo), rtol=0, atol=atol,
+                                   err_msg=campo)
+
+
+@pytest.mark.parametrize('lat, lon', OBSERVADORES)
+def test_igual_a_calcular_panorama(mosaico, lat, lon):
+    obtenido = desde_cero(mosaico, lat, lon)
+    esperado = calcular_panorama(lat, lon, mosaico, mosaico.transform, mosaico.bounds)
+    np.testing.assert_allclose(obtenido.angulos, esperado.angulos, atol=1e-9)
+
+
+@pytest.mark.parametrize('lat, lon', OBSERVADORES)
+def test_extender_y_recortar(mosaico, lat, lon):
+    incremental = nuevo(mosaico)
+    incremental.calcular(lat, lon, distancia_max=50000)
+    # Con otro largo de rayo las posiciones se interpolan entre otros nodos
+    # geodésicos: difieren en milímetros
+    comparar(incremental.calcular(lat, lon, distancia_max=100000), desde_cero(mosaico, lat, lon), atol=1e-6)
+    comparar(incremental.calcular(lat, lon, distancia_max=30000),
+             desde_cero(mosaico, lat, lon, distancia_max=30000), atol=1e-6)
+    assert incremental.estadisticas()['extensiones'] == 1
+    assert incremental.estadisticas()['recortes'] == 1
+
+
+@pytest.mark.parametrize('desplazamiento', [0.0001, 0.0002, 0.0005])
+@pytest.mark.parametrize('lat, lon', OBSERVADORES)
+def test_mover_observador(mosaico, lat, lon, desplazamiento):
+    incremental = nuevo(mosaico)
+    incremental.calcular(lat, lon)
+    destino = (lat + desplazamiento, lon + desplazamiento / 2)
+    obtenido = incremental.calcular(*destino)
+    assert incremental.estadisticas()['desplazamientos'] == 1
+    assert incremental.estadisticas()['reconstrucciones'] == 1
+
+    # Las posiciones sólo difieren por la traslación en latitud (menos de un metro)
+    esperado = desde_cero(mosaico, *destino)
+    np.testing.assert_array_equal(obtenido.angulos, esperado.angulos)
+    np.testing.assert_array_equal(obtenido.distancias, esperado.distancias)
+    np.testing.assert_allclose(obtenido.lats, esperado.lats, atol=1e-5)
+    np.testing.assert_allclose(obtenido.lons, esperado.lons, atol=1e-5)
+
+
+@pytest.mark.parametrize('lat, lon', OBSERVADORES)
+def test_desplazamiento_grande_reconstruye(mosaico, lat, lon):
+    incremental = nuevo(mosaico)
+    incremental.calcular(lat, lon)
+    comparar(incremental.calcular(lat + 0.01, lon), desde_cero(mosaico, lat + 0.01, lon))
+    assert incremental.estadisticas()['reconstrucciones'] == 2
+    assert incremental.estadisticas()['desplazamientos'] == 0
+
+
+@pytest.mark.parametrize('lat, lon', OBSERVADORES)
+def test_recalcular_altura_y_curvatura(mosaico, lat, lon):
+    incremental = nuevo(mosaico)
+    incremental.calcular(lat, lon)
+    comparar(incremental.calcular(lat, lon, altura_observador=50.0),
+             desde_cero(mosaico, lat, lon, altura_observador=50.0))
+    comparar(incremental.calcular(lat, lon, curvatura=False), desde_cero(mosaico, lat, lon, curvatura=False))
+    assert incremental.estadisticas()['recalculos'] == 3
+
+
+def test_grilla_de_la_distancia_de_construccion(mosaico):
+    lat, lon = OBSERVADORES[0]
+    obtenido = nuevo(mosaico, distancia_max=50000).calcular(lat, lon, distancia_max=50000)
+    esperado = calcular_panorama(lat, lon, mosaico, mosaico.transform, mosaico.bounds, distancia_max=50000)
+    np.testing.assert_allclose(obtenido.angulos, esperado.angulos, atol=1e-9)
@@ -0,0 +1,37 @@
+"""
+Archivos que MosaicoDEM guarda en el directorio de datos.
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from mosaico import DIRECTORIO_DERIVADOS, MosaicoDEM
+
+DATOS = os.path.join(RAIZ, 'datos')
+TESELA = 'S02W079.hgt'
+
+
+@pytest.fixture
+def directorio(tmp_path):
+    if not os.path.isfile(os.path.join(DATOS, TESELA)):
+        pytest.skip("No están las teselas de ejemplo")
+    shutil.copy(os.path.join(DATOS, TESELA), tmp_path)
+    return str(tmp_path)
+
+
+def test_derivados_no_invalidan_el_manifiesto(directorio):
+    mosaico = MosaicoDEM(directorio)
+    assert mosaico._leer_manifiesto() is not None
+
+    mosaico.vista_general(0, 2)
+    mosaico.resumen_bloques(0)
+    assert os.listdir(os.path.join(directorio, DIRECTORIO_DERIVADOS))
+    assert sorted(os.listdir(directorio)) == sorted(['.manifiesto_teselas.json', DIRECTORIO_DERIVADOS, TESELA])
+    assert MosaicoDEM(directorio)._leer_manifiesto() is not None
+
@@ -0,0 +1,52 @@
+"""
+El modo pirámide debe ser conservador: nunca por debajo de un muestreo denso.
+
+Se compara calcular_panorama con piramide=True contra el modo uniforme con
+un paso de 75 m (4000 muestras en 300 km) sobre las teselas de ejemplo.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from horizonte import calcular_panorama, distancias_piramide
+from mosaico import NIVELES_PIRAMIDE, MosaicoDEM
+
+DATOS = os.path.join(RAIZ, 'datos')
+
+# Quito, Ambato y dos puntos donde el piso de log2 dejaba el horizonte bajo
+OBSERVADORES = [(-0.22, -78.512), (-1.2544, -78.6269), (-1.5, -79.35), (-2.9, -78.99)]
+
+
+@pytest.fixture(scope='module')
+def mosaico():
+    if not os.path.isdir(DATOS):
+        pytest.skip("No están las teselas de ejemplo")
+    return MosaicoDEM(DATOS)
+
+
+@pytest.mark.parametrize('curvatura', [True, False])
+@pytest.mark.parametrize('lat, lon', OBSERVADORES)
+def test_piramide_nunca_bajo_referencia_densa(mosaico, lat, lon, curvatura):
+    opciones = {'distancia_max': 300000, 'curvatura': curvatura}
+    densa = calcular_panorama(lat, lon, mosaico, mosaico.transform, mosaico.bounds, pasos=4000, **opciones)
+    piramide = calcular_panorama(lat, lon, mosaico, mosaico.transform, mosaico.bounds, piramide=True,
+                                 **opciones)
+    assert np.all(piramide.angulos >= densa.angulos - 1e-9), \
+        f"{np.mean(piramide.angulos < densa.angulos):.1%} de los azimuts bajo la referencia"
+
+
+@pytest.mark.parametrize('lat', [-1.5, 45.0, 70.0])
+def test_celda_reducida_cubre_el_paso(lat):
+    resolucion = 1.0 / 1200
+    distancias, niveles = distancias_piramide(300000, resolucion, lat)
+    celda_x = np.radians(resolucion * np.cos(np.radians(lat))) * 6371000.0
+    assert np.all(np.diff(distancias) > 0)
+    assert distancias[-1] == 300000
+    assert niveles.max() <= NIVELES_PIRAMIDE
+    assert np.all(np.diff(distancias) <= (1 << niveles[:-1]) * celda_x * (1 + 1e-9))
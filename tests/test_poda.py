@@ -0,0 +1,77 @@
+"""
+La poda por bloques no debe cambiar el horizonte.
+
+Se compara el modo uniforme (el único que poda) con y sin poda
+(TRAMO_PODA = 0) sobre las teselas de ejemplo, comprobando además que la
+poda descartó muestras de verdad. El modo adaptativo no debe podar:
+refinar_picos elige varios candidatos por rayo entre todas las muestras.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import horizonte
+from horizonte import calcular_horizonte, calcular_panorama
+from instrumentacion import instrumentacion
+from mosaico import MosaicoDEM
+
+DATOS = os.path.join(RAIZ, 'datos')
+
+# Selva baja (casi todo se poda), Cajas, Ambato y la cordillera occidental
+OBSERVADORES = [(-3.66, -73.671), (-2.932, -79.526), (-1.2544, -78.6269), (-1.5, -79.35)]
+
+
+@pytest.fixture(scope='module')
+def mosaico():
+    if not os.path.isdir(DATOS):
+        pytest.skip("No están las teselas de ejemplo")
+    return MosaicoDEM(DATOS)
+
+
+@pytest.fixture
+def contadores():
+    """Instrumentación activa y en cero; devuelve una función que lee los contadores"""
+    activa = instrumentacion.activa
+    instrumentacion.reiniciar()
+    instrumentacion.activar()
+    yield lambda: instrumentacion.resumen()['contadores']
+    instrumentacion.activa = activa
+    instrumentacion.reiniciar()
+
+
+@pytest.mark.parametrize('lat, lon', OBSERVADORES)
+def test_panorama_igual_con_y_sin_poda(mosaico, contadores, monkeypatch, lat, lon):
+    leidas = mosaico.muestras_leidas
+    con_poda = calcular_panorama(lat, lon, mosaico, mosaico.transform, mosaico.bounds)
+    leidas_con_poda = mosaico.muestras_leidas - leidas
+    assert contadores().get('muestras_podadas', 0) > 0
+
+    monkeypatch.setattr(horizonte, 'TRAMO_PODA', 0)
+    leidas = mosaico.muestras_leidas
+    sin_poda = calcular_panorama(lat, lon, mosaico, mosaico.transform, mosaico.bounds)
+    assert mosaico.muestras_leidas - leidas > leidas_con_poda
+
+    for campo in ('angulos', 'distancias', 'lats', 'lons', 'elevaciones'):
+        np.testing.assert_array_equal(getattr(con_poda, campo), getattr(sin_poda, campo), err_msg=campo)
+
+
+@pytest.mark.parametrize('lat, lon', OBSERVADORES)
+def test_perfil_igual_con_y_sin_poda(mosaico, contadores, monkeypatch, lat, lon):
+    _, con_poda = calcular_horizonte(lat, lon, mosaico, mosaico.transform, mosaico.bounds, 270)
+    assert contadores().get('muestras_podadas', 0) > 0
+    monkeypatch.setattr(horizonte, 'TRAMO_PODA', 0)
+    _, sin_poda = calcular_horizonte(lat, lon, mosaico, mosaico.transform, mosaico.bounds, 270)
+    np.testing.assert_array_equal(con_poda, sin_poda)
+
+
+@pytest.mark.parametrize('lat, lon', OBSERVADORES)
+def test_adaptativo_no_poda(mosaico, contadores, lat, lon):
+    calcular_panorama(lat, lon, mosaico, mosaico.transform, mosaico.bounds, adaptativo=True)
+    calcular_horizonte(lat, lon, mosaico, mosaico.transform, mosaico.bounds, 270, adaptativo=True)
+    assert contadores().get('muestras_podadas', 0) == 0
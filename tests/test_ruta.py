@@ -0,0 +1,28 @@
+"""
+Remuestreo de rutas: puntos equiespaciados y casos degenerados.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from ruta import remuestrear_ruta
+
+
+def test_vertices_identicos_dan_un_punto():
+    lats, lons, distancias = remuestrear_ruta([(-1.25, -78.62)] * 3, 25)
+    np.testing.assert_array_equal(lats, [-1.25])
+    np.testing.assert_array_equal(lons, [-78.62])
+    np.testing.assert_array_equal(distancias, [0.0])
+
+
+def test_incluye_extremos_y_respeta_espaciado():
+    lats, lons, distancias = remuestrear_ruta([(-1.25, -78.62), (-1.25, -78.62), (-1.26, -78.61)], 100)
+    assert (lats[0], lons[0]) == (-1.25, -78.62)
+    np.testing.assert_allclose((lats[-1], lons[-1]), (-1.26, -78.61), atol=1e-9)
+    np.testing.assert_allclose(np.diff(distancias[:-1]), 100)
+    assert 0 < distancias[-1] - distancias[-2] <= 100
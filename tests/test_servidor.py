@@ -0,0 +1,111 @@
+"""
+Servidor de horizontes en localhost: coalescencia, agrupación y códigos de error.
+
+Cada prueba levanta servidor.ServidorHorizonte en un puerto libre, con los
+cálculos en un hilo del mismo proceso, y lo consulta por HTTP/1.1.
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import servidor as modulo_servidor
+from servidor import ServidorHorizonte
+
+DATOS = os.path.join(RAIZ, 'datos')
+
+AMBATO = {'lat': -1.2544, 'lon': -78.6269}
+
+
+@pytest.fixture
+def servidor():
+    if not os.path.isdir(DATOS):
+        pytest.skip("No están las teselas de ejemplo")
+    servidor = ServidorHorizonte(DATOS, trabajadores=0)
+    yield servidor
+    servidor.cerrar()
+
+
+async def consultar(puerto, metodo, ruta, cuerpo=b''):
+    """Envía una consulta por una conexión nueva y devuelve (estado, JSON)"""
+    lector, escritor = await asyncio.open_connection('127.0.0.1', puerto)
+    try:
+        escritor.write(f"{metodo} {ruta} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                       f"Content-Length: {len(cuerpo)}\r\n\r\n".encode('latin-1') + cuerpo)
+        await escritor.drain()
+        estado = int((await lector.readline()).split()[1])
+        largo = 0
+        while True:
+            linea = await lector.readline()
+            if linea in (b'\r\n', b''):
+                break
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            if nombre.lower() == 'content-length':
+                largo = int(valor)
+        return estado, json.loads(await lector.readexactly(largo))
+    finally:
+        escritor.close()
+        await escritor.wait_closed()
+
+
+def en_localhost(servidor, *consultas):
+    """Abre el servidor en un puerto libre y envía las consultas a la vez"""
+    async def correr():
+        abierto = await servidor.escuchar('127.0.0.1', 0)
+        puerto = abierto.sockets[0].getsockname()[1]
+        async with abierto:
+            return await asyncio.gather(*(consultar(puerto, *consulta) for consulta in consultas))
+    return asyncio.run(correr())
+
+
+def test_consultas_identicas_simultaneas_un_solo_calculo(servidor):
+    ruta = f"/panorama?lat={AMBATO['lat']}&lon={AMBATO['lon']}&pasos=1000"
+    respuestas = en_localhost(servidor, *[('GET', ruta)] * 8)
+
+    assert [estado for estado, _ in respuestas] == [200] * 8
+    assert sorted(respuesta['origen'] for _, respuesta in respuestas) == ['calculado'] + ['coalescido'] * 7
+    assert all(respuesta['angulos'] == respuestas[0][1]['angulos'] for _, respuesta in respuestas)
+    assert servidor.calculadas == 1
+    assert servidor.tareas == 1
+    assert servidor.coalescidas == 7
+
+
+def test_lista_de_observadores_en_una_tarea(servidor):
+    consultas = [{'lat': -1.2544 - 0.01 * i, 'lon': -78.6269} for i in range(5)]
+    (estado, respuestas), = en_localhost(servidor, ('POST', '/panorama', json.dumps(consultas).encode()))
+
+    assert estado == 200
+    assert [respuesta['origen'] for respuesta in respuestas] == ['calculado'] * 5
+    assert servidor.calculadas == 5
+    assert servidor.tareas == 1
+
+
+def test_repeticion_desde_cache(servidor):
+    ruta = f"/panorama?lat={AMBATO['lat']}&lon={AMBATO['lon']}"
+    (_, primera), = en_localhost(servidor, ('GET', ruta))
+    (_, segunda), = en_localhost(servidor, ('GET', ruta))
+
+    assert (primera['origen'], segunda['origen']) == ('calculado', 'cache')
+    assert servidor.calculadas == 1
+
+
+def test_consulta_invalida_es_400(servidor):
+    respuestas = en_localhost(servidor, ('GET', '/panorama?lat=40&lon=-3'), ('GET', '/panorama?lon=-78'))
+    assert [estado for estado, _ in respuestas] == [400, 400]
+    assert servidor.tareas == 0
+
+
+def test_error_del_trabajador_es_500(servidor, monkeypatch):
+    def fallar(tarea, opciones):
+        raise RuntimeError("trabajador caído")
+    monkeypatch.setattr(modulo_servidor, '_calcular_tarea', fallar)
+
+    (estado, respuesta), = en_localhost(servidor, ('GET', f"/panorama?lat={AMBATO['lat']}&lon={AMBATO['lon']}"))
+    assert estado == 500
+    assert 'trabajador caído' in respuesta['error']
@@ -0,0 +1,26 @@
+"""
+Interpolación del horizonte en azimuts arbitrarios.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from solar import interpolar_horizonte
+
+
+def test_azimut_360_es_el_norte():
+    angulos = np.array([[10.0, 20.0, 30.0, 40.0]])
+    azimuts = np.array([[0.0, 360.0, 720.0, -90.0]], dtype=np.float32)
+    np.testing.assert_allclose(interpolar_horizonte(angulos, azimuts), [[10.0, 10.0, 10.0, 40.0]])
+
+
+def test_interpola_entre_el_ultimo_y_el_primero():
+    angulos = np.array([[10.0, 20.0, 30.0, 40.0]])
+    azimuts = np.array([[45.0, 315.0, 359.0]], dtype=np.float32)
+    np.testing.assert_allclose(interpolar_horizonte(angulos, azimuts), [[15.0, 25.0, 40.0 - 30.0 * 89 / 90]],
+                               rtol=1e-5)